@@ -0,0 +1,35 @@
+import os
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# create_all() only creates indexes together with new tables, so databases
+# created before the paginated /api/history need this index added once.
+
+def log(msg):
+    print(msg)
+
+def add_history_index():
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    engine = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        log("Creating index ix_quizzes_created_at_id on quizzes (created_at, id)...")
+        try:
+            # CONCURRENTLY avoids locking writes on a live PostgreSQL table
+            concurrently = "CONCURRENTLY " if engine.dialect.name == "postgresql" else ""
+            connection.execute(text(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS ix_quizzes_created_at_id ON quizzes (created_at, id);"
+            ))
+            log("SUCCESS: index created (or already exists).")
+        except Exception as e:
+            log(f"ERROR creating index: {e}")
+
+if __name__ == "__main__":
+    add_history_index()
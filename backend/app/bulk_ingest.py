@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import time
+
+from .database import SessionLocal, AsyncSessionLocal
+from .models import Quiz
+from .services.generation import build_quiz, generate_llm_output_async, store_quizzes_async
+from .services.jobs import enqueue_batch, existing_urls, BATCH_MAX_URLS
+from .services.ratelimit import HostRateLimiter
+from .services.scraper import scrape_wikipedia_async
+from .services.singleflight import normalize_wikipedia_url
+from .services.canonical import canonical_key
+
+# Offline bulk ingest: pre-generate quizzes for a list of Wikipedia URLs.
+#
+#   python -m app.bulk_ingest urls.txt --scrape-concurrency 8 --rate 5 --llm-concurrency 4
+#   python -m app.bulk_ingest urls.txt --enqueue     # hand the list to the job workers instead
+#
+# URLs that already have a quiz are skipped, and results are committed batch by
+# batch, so an interrupted run is resumed by simply running it again. URLs that
+# failed are written to <file>.failed for a later retry.
+
+
+def read_urls(path: str):
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    urls = [normalize_wikipedia_url(line) for line in lines if line and not line.startswith("#")]
+    # One URL per article: variants would collide on the canonical key
+    by_key = {}
+    for url in urls:
+        by_key.setdefault(canonical_key(url), url)
+    return list(by_key.values())
+
+
+async def process_batch(urls, limiter, scrape_slots, llm_slots):
+    """Scrape and generate for one batch; returns (quizzes, failures)."""
+
+    async def one(url):
+        try:
+            async with scrape_slots:
+                await limiter.acquire_async(url)
+                scraped_data = await scrape_wikipedia_async(url)
+            async with llm_slots:
+                llm_output = await generate_llm_output_async(scraped_data)
+            return build_quiz(url, scraped_data, llm_output), None
+        except Exception as e:
+            return None, (url, getattr(e, "detail", None) or str(e))
+
+    results = await asyncio.gather(*(one(u) for u in urls))
+    quizzes = [q for q, _ in results if q is not None]
+    failures = [f for _, f in results if f is not None]
+    return quizzes, failures
+
+
+async def ingest(urls, args):
+    limiter = HostRateLimiter(args.rate, burst=args.scrape_concurrency)
+    scrape_slots = asyncio.Semaphore(args.scrape_concurrency)
+    llm_slots = asyncio.Semaphore(args.llm_concurrency)
+
+    started = time.monotonic()
+    done = failed = 0
+    failures = []
+    batches = [urls[i:i + args.batch_size] for i in range(0, len(urls), args.batch_size)]
+
+    for n, batch in enumerate(batches, start=1):
+        quizzes, batch_failures = await process_batch(batch, limiter, scrape_slots, llm_slots)
+        if quizzes:
+            # One commit per batch; also indexes them for search and caches responses
+            async with AsyncSessionLocal() as db:
+                await store_quizzes_async(db, quizzes)
+        done += len(quizzes)
+        failed += len(batch_failures)
+        failures.extend(batch_failures)
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        remaining = len(urls) - done - failed
+        eta = remaining / rate if rate else float("inf")
+        print(f"[batch {n}/{len(batches)}] {done} done, {failed} failed, {remaining} left "
+              f"({rate:.2f}/s, eta {eta:.0f}s)")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-generate quizzes for a file of Wikipedia URLs")
+    parser.add_argument("file", help="text file with one URL per line")
+    parser.add_argument("--enqueue", action="store_true", help="queue jobs for the workers instead of generating here")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--scrape-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="max requests per second per host")
+    args = parser.parse_args()
+
+    urls = read_urls(args.file)
+
+    if args.enqueue:
+        db = SessionLocal()
+        try:
+            for i in range(0, len(urls), BATCH_MAX_URLS):
+                print(enqueue_batch(db, urls[i:i + BATCH_MAX_URLS]))
+        finally:
+            db.close()
+        return
+
+    db = SessionLocal()
+    try:
+        already = existing_urls(db, Quiz, urls)
+    finally:
+        db.close()
+    todo = [u for u in urls if u not in already]
+    print(f"{len(urls)} unique URLs, {len(already)} already have quizzes, {len(todo)} to generate")
+
+    failures = asyncio.run(ingest(todo, args))
+    if failures:
+        failed_path = args.file + ".failed"
+        with open(failed_path, "w", encoding="utf-8") as f:
+            for url, error in failures:
+                f.write(f"{url}\n")
+                print(f"FAILED {url}: {error}")
+        print(f"{len(failures)} failed URLs written to {failed_path}")
+
+
+if __name__ == "__main__":
+    main()
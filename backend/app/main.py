@@ -1,12 +1,24 @@
+import os
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routers import quiz
-
+from .migrate import migrate
+from .routers import quiz, jobs, diagnostics, search, metrics, health
+from .routers.health import lifecycle
+from .services.jobs import JobWorkerPool, JOB_WORKERS
+from .services.llm import llm_registry
+from .services.prefetch import prefetcher
+from .services.debug_capture import debug_capture
+from .services.embeddings import load_embedding_index
 
-# Automatically create database tables based on SQLAlchemy models 
-# defined in 'Base' when the application starts.
-Base.metadata.create_all(bind=engine)
+# Schema setup runs at startup for `uvicorn app.main:app`. In production run
+# `python -m app.migrate` once per deploy and set DB_AUTO_MIGRATE=false
+# (python -m app.serve does), so workers don't all race to create tables.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+# Import the LangChain stack in the background after startup, so the first
+# generation doesn't pay for it and startup doesn't wait for it
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
 
 # Initialize the FastAPI application instance
 app = FastAPI(title="AI Wikipedia Quiz Generator")
@@ -22,6 +34,45 @@ app.add_middleware(
 
 # Register the quiz router to organize endpoints under separate modules
 app.include_router(quiz.router)
+app.include_router(jobs.router)
+app.include_router(diagnostics.router)
+app.include_router(search.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+
+# In-process generation workers for background jobs. Set JOB_WORKERS=0 to run
+# the API only and scale workers separately with `python -m app.worker`.
+job_workers = JobWorkerPool(workers=JOB_WORKERS, prefetcher=prefetcher)
+
+def warm_up_llm():
+    try:
+        llm_registry.warm_up()
+        lifecycle.warm = True
+    except Exception as e:
+        print(f"LLM warm-up failed: {e}")
+
+@app.on_event("startup")
+def start_job_workers():
+    if DB_AUTO_MIGRATE:
+        migrate()
+    # Before readiness, so no request pays for the first full load
+    load_embedding_index()
+    if LLM_WARMUP:
+        threading.Thread(target=warm_up_llm, name="llm-warmup", daemon=True).start()
+    job_workers.start()
+    # Queues related topics of viewed quizzes (PREFETCH_ENABLED=true only)
+    prefetcher.start()
+    # Sampled payload capture (DEBUG_CAPTURE_ENABLED=true only)
+    debug_capture.start()
+    lifecycle.started = True
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    # Fail readiness first so the load balancer stops sending new requests
+    lifecycle.draining = True
+    prefetcher.stop()
+    job_workers.stop()
+    debug_capture.stop()
 
 # Basic health check or landing endpoint
 @app.get("/")
@@ -0,0 +1,25 @@
+import argparse
+
+from .database import engine, Base
+from .services.search import create_search_index
+
+# Schema setup, run once per deploy rather than by every API process at import:
+#   python -m app.migrate
+# Creates missing tables and the full-text index. Columns added to existing
+# tables still need their own scripts (migrate_quiz_tables.py,
+# migrate_job_priority.py, ...). `uvicorn app.main:app` runs this at startup
+# unless DB_AUTO_MIGRATE=false.
+
+def migrate():
+    # Create database tables based on SQLAlchemy models defined in 'Base'
+    Base.metadata.create_all(bind=engine)
+    # The full-text index is raw DDL (tsvector + GIN, or an FTS5 table)
+    create_search_index(engine)
+
+def main():
+    argparse.ArgumentParser(description="Create missing database tables and indexes").parse_args()
+    migrate()
+    print("Schema is up to date")
+
+if __name__ == "__main__":
+    main()
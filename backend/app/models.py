@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Index, LargeBinary
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -7,9 +8,94 @@ class Quiz(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, unique=False, index=True)
+    canonical_key = Column(String, unique=True, index=True) # "<lang>:<Title>", see services/canonical.py
     title = Column(String)
     summary = Column(Text)
     sections = Column(JSON)
-    quiz_data = Column(JSON) 
-    related_topics = Column(JSON)
+    quiz_data = Column(JSON) # legacy; questions now live in the questions table
+    related_topics = Column(JSON) # legacy; see the related_topics table
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # selectin: loaded with the quiz in one extra query, which also works on AsyncSession
+    questions = relationship("Question", order_by="Question.position", lazy="selectin", cascade="all, delete-orphan")
+    topics = relationship("RelatedTopic", order_by="RelatedTopic.position", lazy="selectin", cascade="all, delete-orphan")
+    # Written with the quiz, read in bulk by services/embeddings.py; never loaded per quiz
+    embedding = relationship("QuizEmbedding", uselist=False, lazy="raise", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Serves the newest-first keyset pagination in /api/history
+        Index("ix_quizzes_created_at_id", "created_at", "id"),
+    )
+
+class Question(Base):
+    __tablename__ = "questions"
+
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    option_a = Column(Text)
+    option_b = Column(Text)
+    option_c = Column(Text)
+    option_d = Column(Text)
+    answer = Column(String(1))
+    difficulty = Column(String, index=True)
+    explanation = Column(Text)
+
+    __table_args__ = (
+        # A quiz's questions in order, and per-quiz difficulty filters
+        Index("ix_questions_quiz_id_position", "quiz_id", "position"),
+        Index("ix_questions_quiz_id_difficulty", "quiz_id", "difficulty"),
+    )
+
+class RelatedTopic(Base):
+    __tablename__ = "related_topics"
+
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    topic = Column(String, nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ix_related_topics_quiz_id_position", "quiz_id", "position"),
+    )
+
+class QuizEmbedding(Base):
+    __tablename__ = "quiz_embeddings"
+
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), primary_key=True)
+    vector = Column(LargeBinary, nullable=False) # float32 unit vector, EMBEDDING_DIM values
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, index=True)
+    batch_id = Column(String, index=True) # set for jobs queued by /api/generate-quizzes
+    status = Column(String, index=True, default="queued") # queued, running, succeeded, failed, cancelled
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    error = Column(Text)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"))
+    # Higher runs first; see PRIORITY_* in services/jobs.py
+    priority = Column(Integer, nullable=False, default=100, server_default="100")
+    served_at = Column(DateTime(timezone=True)) # prefetch jobs: when a user first asked for the quiz
+    heartbeat_at = Column(DateTime(timezone=True)) # running jobs: renewed by the worker, see JOB_LEASE_SECONDS
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Workers claim the highest-priority queued job
+        Index("ix_generation_jobs_status_priority_id", "status", "priority", "id"),
+    )
+
+class ScrapedArticle(Base):
+    __tablename__ = "scraped_articles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True) # "<lang>:<Title>" or "<lang>:<Title>@<oldid>"
+    revision_id = Column(Integer)
+    etag = Column(String)
+    last_modified = Column(String)
+    content = Column(JSON)
+    fetched_at = Column(DateTime(timezone=True))
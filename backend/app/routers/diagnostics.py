@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import engine, async_engine, get_db, POOL_CONFIG, DB_STATEMENT_TIMEOUT_MS
+from ..services.pool_metrics import pool_snapshot
+from ..services.scrape_cache import scrape_cache
+from ..services.llm import model_router
+from ..services import http_client
+from ..services.response_cache import quiz_cache
+from ..services.canonical import lookup_stats
+from ..services.embeddings import embedding_index
+from ..services.prefetch import prefetcher
+from ..services.repair import repair_snapshot
+from ..services.debug_capture import debug_capture
+
+router = APIRouter(
+    prefix="/api/diagnostics",
+    tags=["diagnostics"]
+)
+
+@router.get("/pool")
+def get_pool_metrics():
+    config = dict(POOL_CONFIG, statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS)
+    return {
+        "sync": pool_snapshot(engine, config),
+        "async": pool_snapshot(async_engine.sync_engine, config),
+    }
+
+@router.get("/scrape-cache")
+def get_scrape_cache_metrics():
+    return scrape_cache.snapshot()
+
+@router.get("/response-cache")
+def get_response_cache_metrics():
+    return quiz_cache.snapshot()
+
+@router.get("/canonical")
+def get_canonical_lookup_metrics():
+    return lookup_stats.snapshot()
+
+@router.get("/embeddings")
+def get_embedding_index_state():
+    return embedding_index.snapshot()
+
+@router.get("/prefetch")
+def get_prefetch_state(db: Session = Depends(get_db)):
+    return prefetcher.snapshot(db)
+
+@router.get("/output-repair")
+def get_output_repair_metrics():
+    return repair_snapshot()
+
+@router.get("/debug-captures")
+def list_debug_captures():
+    # Newest first; each worker process holds its own captures
+    if not debug_capture.enabled:
+        raise HTTPException(status_code=404, detail="Debug capture is disabled")
+    return {**debug_capture.snapshot(), "captures": debug_capture.list()}
+
+@router.get("/debug-captures/{capture_id}")
+def get_debug_capture(capture_id: int):
+    capture = debug_capture.get(capture_id) if debug_capture.enabled else None
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return capture
+
+@router.get("/models")
+def get_model_router_state():
+    return model_router.snapshot()
+
+@router.get("/http")
+def get_http_metrics():
+    return {
+        "config": {
+            "connect_timeout": http_client.HTTP_CONNECT_TIMEOUT,
+            "read_timeout": http_client.HTTP_READ_TIMEOUT,
+            "max_retries": http_client.HTTP_MAX_RETRIES,
+            "pool_size": http_client.HTTP_POOL_SIZE,
+            "rate_per_host": http_client.HTTP_RATE_PER_HOST,
+        },
+        "hosts": http_client.stats_snapshot(),
+    }
@@ -0,0 +1,54 @@
+import threading
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect, text
+
+from ..database import engine
+
+# Probes for process managers and load balancers, separate from read_root.
+# Liveness only says the process is serving requests; a failing liveness
+# probe gets the process restarted, so it never touches the database.
+# Readiness says this process should get traffic: startup has finished, it is
+# not shutting down, and the database answers and has been migrated.
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+class Lifecycle:
+    def __init__(self):
+        self.started = False
+        self.draining = False
+        self.schema_ready = False
+        self.warm = False
+        self._lock = threading.Lock()
+
+    def check_schema(self, connection) -> bool:
+        # Tables don't disappear again, so one successful check is enough
+        if not self.schema_ready:
+            with self._lock:
+                self.schema_ready = inspect(connection).has_table("quizzes")
+        return self.schema_ready
+
+
+lifecycle = Lifecycle()
+
+@router.get("/live")
+def liveness():
+    return {"status": "alive"}
+
+@router.get("/ready")
+def readiness():
+    checks = {"started": lifecycle.started, "draining": lifecycle.draining, "llm_warm": lifecycle.warm}
+    ready = lifecycle.started and not lifecycle.draining
+    if ready:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                checks["schema"] = lifecycle.check_schema(connection)
+            checks["database"] = True
+        except Exception as e:
+            checks["database"] = False
+            checks["error"] = str(e)
+        ready = checks["database"] and checks["schema"]
+    return JSONResponse({"status": "ready" if ready else "not ready", **checks}, status_code=200 if ready else 503)
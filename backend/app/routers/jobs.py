@@ -0,0 +1,72 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import get_db, AsyncSessionLocal
+from ..models import GenerationJob
+from ..schemas import JobResponse, BatchRequest, BatchResponse, BatchStatus
+from ..services.jobs import cancel_job, retry_job, enqueue_batch, batch_status, FINISHED_STATUSES
+from ..services.singleflight import normalize_wikipedia_url
+
+router = APIRouter(
+    prefix="/api",
+    tags=["jobs"]
+)
+
+def get_job_or_404(job_id: int, db: Session) -> GenerationJob:
+    job = db.get(GenerationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    return get_job_or_404(job_id, db)
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel(job_id: int, db: Session = Depends(get_db)):
+    return cancel_job(db, get_job_or_404(job_id, db))
+
+@router.post("/jobs/{job_id}/retry", response_model=JobResponse)
+def retry(job_id: int, db: Session = Depends(get_db)):
+    return retry_job(db, get_job_or_404(job_id, db))
+
+@router.post("/generate-quizzes", response_model=BatchResponse, status_code=202)
+def generate_quizzes(request: BatchRequest, db: Session = Depends(get_db)):
+    """Queue a quiz for every URL; track progress with GET /api/batches/{batch_id}."""
+    return enqueue_batch(db, [normalize_wikipedia_url(str(u)) for u in request.urls])
+
+@router.get("/batches/{batch_id}", response_model=BatchStatus)
+def get_batch(batch_id: str, db: Session = Depends(get_db)):
+    status = batch_status(db, batch_id)
+    if not status["total"]:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, poll_interval: float = 1.0):
+    """Server-Sent Events: one 'status' event per change, ending when the job finishes."""
+    async with AsyncSessionLocal() as db:
+        if await db.get(GenerationJob, job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        last_state = None
+        while True:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(GenerationJob, job_id)
+            payload = JobResponse.model_validate(job).model_dump(mode="json")
+            state = (payload["status"], payload["attempts"], payload["quiz_id"])
+            if state != last_state:
+                last_state = state
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            if job.status in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(max(poll_interval, 0.2))
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
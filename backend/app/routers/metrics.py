@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ..database import engine, async_engine
+from ..services import telemetry, http_client
+from ..services.telemetry import counter_lines, register_collector
+from ..services.pool_metrics import pool_snapshot
+from ..services.scrape_cache import scrape_cache
+from ..services.response_cache import quiz_cache
+from ..services.canonical import lookup_stats
+from ..services.llm import model_router
+
+# Prometheus scrape endpoint. Pipeline stage timings, token and fallback
+# counters live in services/telemetry.py; the stats already kept for
+# /api/diagnostics are converted at scrape time by the collectors below.
+
+router = APIRouter(tags=["metrics"])
+
+@register_collector
+def cache_metrics():
+    scrape = scrape_cache.snapshot()
+    responses = quiz_cache.snapshot()
+    lookups = lookup_stats.snapshot()
+    return (
+        counter_lines("quiz_scrape_cache_events_total", "Article cache lookups by outcome", [
+            ({"outcome": name}, scrape[name]) for name in ("hits", "misses", "stale", "revalidated", "evictions")
+        ])
+        + counter_lines("quiz_scrape_cache_entries", "Articles held in memory", [({}, scrape["entries"])], "gauge")
+        + counter_lines("quiz_response_cache_events_total", "Serialized quiz cache lookups by outcome", [
+            ({"outcome": "hit"}, responses["hits"]), ({"outcome": "miss"}, responses["misses"]),
+        ])
+        + counter_lines("quiz_response_cache_bytes", "Bytes of serialized quizzes held", [({}, responses["bytes"])], "gauge")
+        + counter_lines("quiz_lookups_total", "Stored-quiz lookups by article key, by outcome", [
+            ({"outcome": "hit"}, lookups["hits"]),
+            ({"outcome": "miss"}, lookups["lookups"] - lookups["hits"]),
+        ])
+    )
+
+@register_collector
+def http_metrics():
+    hosts = http_client.stats_snapshot()
+    return (
+        counter_lines("quiz_http_requests_total", "Outbound requests by host and status", [
+            ({"host": host, "status": status}, count)
+            for host, s in hosts.items() for status, count in s["statuses"].items()
+        ])
+        + counter_lines("quiz_http_retries_total", "Outbound retries by host", [
+            ({"host": host}, s["retries"]) for host, s in hosts.items()
+        ])
+        + counter_lines("quiz_http_errors_total", "Outbound connection errors and timeouts by host", [
+            ({"host": host}, s["errors"]) for host, s in hosts.items()
+        ])
+    )
+
+@register_collector
+def pool_metrics():
+    pools = {"sync": pool_snapshot(engine), "async": pool_snapshot(async_engine.sync_engine)}
+    return (
+        counter_lines("quiz_db_pool_checked_out", "Connections currently checked out", [
+            ({"pool": name}, p.get("checked_out")) for name, p in pools.items()
+        ], "gauge")
+        + counter_lines("quiz_db_pool_overflow", "Connections open beyond pool_size", [
+            ({"pool": name}, p.get("overflow")) for name, p in pools.items()
+        ], "gauge")
+        + counter_lines("quiz_db_pool_checkouts_total", "Connection checkouts", [
+            ({"pool": name}, p.get("checkouts")) for name, p in pools.items()
+        ])
+        + counter_lines("quiz_db_pool_checkout_failures_total", "Connection checkouts that failed or timed out", [
+            ({"pool": name}, p.get("checkout_failures")) for name, p in pools.items()
+        ])
+    )
+
+@register_collector
+def model_metrics():
+    models = model_router.snapshot()["models"]
+    return counter_lines("quiz_llm_breaker_open", "1 while a model's circuit breaker is not closed", [
+        ({"model": name}, int(m["state"] != "closed")) for name, m in models.items()
+    ], "gauge")
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    if not telemetry.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
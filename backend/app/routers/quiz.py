@@ -1,172 +1,224 @@
+import base64
 import json
-from fastapi import APIRouter, Depends, HTTPException
+from contextlib import AsyncExitStack
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from ..database import get_db
-from ..models import Quiz
-from ..schemas import QuizRequest, QuizResponse
-from ..services.scraper import scrape_wikipedia
-from ..services.llm import generate_quiz_from_text
+from ..database import get_db, get_async_db, async_engine, SessionLocal, AsyncSessionLocal
+from ..models import Quiz, Question
+from ..schemas import QuizRequest, QuizResponse, QuizSummary, JobResponse, HistoryPage, QuizQuestion, RelatedQuiz
+from ..services.generation import generate_and_store_async, stream_generation
+from ..services.jobs import enqueue_job
+from ..services.quiz_format import serialize_question
+from ..services.canonical import find_quiz_async, find_quiz_by_key_async
+from ..services.embeddings import resolve_topics
+from ..services.prefetch import prefetcher
+from ..services.debug_capture import debug_capture
+from ..services.response_cache import quiz_cache, cache_quiz, cached_quiz, json_response, RESPONSE_CACHE_MAX_AGE
+from ..services.streaming import sse_event
+from ..services.telemetry import start_trace, finish_trace
+from ..services.singleflight import AsyncSingleFlight, AsyncKeyLock, async_advisory_lock, normalize_wikipedia_url
 
 router = APIRouter(
     prefix="/api",
     tags=["quiz"]
 )
 
-def fix_quiz_format(quiz_data_list):
-    """
-    Helper to accept old flat format and convert to new nested format.
-    Old: {question, A, B, C, D, ...}
-    New: {question, options: {A, B, C, D}, ...}
-    """
-    fixed = []
-    if not quiz_data_list:
-        return []
-
-    for q in quiz_data_list:
-        if "options" in q:
-            fixed.append(q)
-        else:
-            # Convert old format
-            fixed.append({
-                "question": q.get("question"),
-                "options": {
-                    "A": q.get("A"),
-                    "B": q.get("B"),
-                    "C": q.get("C"),
-                    "D": q.get("D"),
-                },
-                "answer": q.get("answer"),
-                "difficulty": q.get("difficulty"),
-                "explanation": q.get("explanation")
-            })
-    return fixed
+# Concurrent requests for the same article in this worker share one generation
+quiz_flight = AsyncSingleFlight()
+# Streamed generations can't share a result, so they take turns per article
+# (with each other and with quiz_flight leaders) and re-check for a stored quiz
+quiz_keys = AsyncKeyLock()
+# Prefetch jobs wait while any of these are running
+prefetcher.track_busy(quiz_flight.in_flight)
+prefetcher.track_busy(quiz_keys.in_flight)
 
 @router.post("/generate-quiz", response_model=QuizResponse)
-def generate_quiz(request: QuizRequest, db: Session = Depends(get_db)):
-    url_str = str(request.url)
+async def generate_quiz(request: QuizRequest, background: bool = False, db: AsyncSession = Depends(get_async_db)):
+    url_str = normalize_wikipedia_url(str(request.url))
+
+    # ?background=true: queue the work and return a job to poll at /api/jobs/{id}
+    if background:
+        job = await run_in_threadpool(enqueue_url, url_str)
+        return JSONResponse(status_code=202, content=job, headers={"Location": f"/api/jobs/{job['id']}"})
     
-    # Check if quiz already exists for this URL
-    existing_quiz = db.query(Quiz).filter(Quiz.url == url_str).first()
-    if existing_quiz:
-        return {
-            "id": existing_quiz.id,
-            "url": existing_quiz.url,
-            "title": existing_quiz.title,
-            "summary": existing_quiz.summary,
-            "sections": existing_quiz.sections,
-            "quiz": fix_quiz_format(existing_quiz.quiz_data), 
-            "related_topics": existing_quiz.related_topics,
-            "created_at": existing_quiz.created_at
-        }
-
-    # Step 1: Scrape
+    trace = start_trace()
     try:
-        scraped_data = scrape_wikipedia(url_str)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        return await generate_quiz_body(url_str, db)
+    finally:
+        finish_trace(trace, "generate_quiz", url=url_str)
+
+async def generate_quiz_body(url_str: str, db: AsyncSession) -> Response:
+    # Check if quiz already exists for this article, under any URL variant
+    existing_quiz, key = await find_quiz_async(db, url_str)
+    if existing_quiz:
+        prefetcher.viewed(existing_quiz.id)
+        return quiz_body_response(cached_quiz(existing_quiz)[0])
+
+    # Hand the connection back before waiting; run_once doesn't use this session
+    await db.rollback()
+
+    # Only one request per article runs the pipeline; the rest wait for its result.
+    # The advisory lock extends this across workers, and the second lookup picks up
+    # a quiz another worker committed while we were waiting for the lock.
+    # It can outlive the request that started it, so it has its own session.
+    async def run_once():
+        async with AsyncSessionLocal() as db, quiz_keys.hold(key), async_advisory_lock(async_engine, key):
+            existing_quiz = await find_quiz_by_key_async(db, key)
+            if existing_quiz:
+                prefetcher.viewed(existing_quiz.id)
+                return cached_quiz(existing_quiz)[0]
+            new_quiz = await generate_and_store_async(url_str, db, key)
+            prefetcher.viewed(new_quiz.id)
+            body = cached_quiz(new_quiz)[0]
+            debug_capture.capture("generate_quiz", body, url=url_str, quiz_id=new_quiz.id)
+            return body
+
+    # Waiters share the serialized bytes; each gets its own Response
+    return quiz_body_response(await quiz_flight.do(key, run_once))
 
-    # Step 2: Generate Quiz (LLM)
+def quiz_body_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+def enqueue_url(url_str: str):
+    db = SessionLocal()
     try:
-        llm_output = generate_quiz_from_text(scraped_data["content_text"])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM Generation Failed: {str(e)}")
+        job = enqueue_job(db, url_str)
+        return JobResponse.model_validate(job).model_dump(mode="json")
+    finally:
+        db.close()
 
-    # Format quiz data for DB
-    # We need to convert pydantic models to dicts for JSON storage
-    
-    formatted_quiz_data = []
-    for q in llm_output.quiz:
-        q_dict = q.dict()
-        formatted_q = {
-            "question": q_dict["question"],
-            "options": {
-                "A": q_dict["A"],
-                "B": q_dict["B"],
-                "C": q_dict["C"],
-                "D": q_dict["D"],
-            },
-            "answer": q_dict["answer"],
-            "difficulty": q_dict["difficulty"],
-            "explanation": q_dict["explanation"]
-        }
-        formatted_quiz_data.append(formatted_q)
-    
-    # Step 3: Save to DB
-    new_quiz = Quiz(
-        url=url_str,
-        title=scraped_data["title"],
-        summary=scraped_data["summary"],
-        sections=scraped_data["sections"],
-        quiz_data=formatted_quiz_data,
-        related_topics=llm_output.related_topics
-    )
-    
-    db.add(new_quiz)
-    db.commit()
-    db.refresh(new_quiz)
-    
-    response_payload = {
-        "id": new_quiz.id,
-        "url": new_quiz.url,
-        "title": new_quiz.title,
-        "summary": new_quiz.summary,
-        "sections": new_quiz.sections,
-        "quiz": new_quiz.quiz_data, # Mapping quiz_data -> quiz
-        "related_topics": new_quiz.related_topics,
-        "created_at": new_quiz.created_at
-    }
-
-    # DEBUG: Save to file for user inspection
+@router.post("/generate-quiz/stream")
+async def generate_quiz_stream(request: QuizRequest):
+    """
+    Server-Sent Events version of /generate-quiz. Events: article, question
+    (one per question, as soon as the LLM finishes writing it),
+    related_topics, done ({id, url, created_at}) or error ({detail}).
+    """
+    url_str = normalize_wikipedia_url(str(request.url))
+
+    async def events():
+        # Own session: dependency-managed sessions close before a streamed body is sent
+        async with AsyncSessionLocal() as db:
+            try:
+                existing_quiz, key = await find_quiz_async(db, url_str)
+                async with AsyncExitStack() as locks:
+                    if existing_quiz is None:
+                        # Same locking as /generate-quiz: a request that waited here
+                        # streams the quiz the first one stored instead of generating again
+                        await locks.enter_async_context(quiz_keys.hold(key))
+                        await locks.enter_async_context(async_advisory_lock(async_engine, key))
+                        existing_quiz = await find_quiz_by_key_async(db, key)
+                    async for event, data in stream_generation(url_str, db, existing_quiz, key):
+                        if event == "done":
+                            prefetcher.viewed(data["id"])
+                        yield sse_event(event, data)
+            except HTTPException as e:
+                yield sse_event("error", {"detail": e.detail})
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def encode_cursor(created_at: datetime, quiz_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{quiz_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
     try:
-        with open("latest_quiz_output.json", "w", encoding="utf-8") as f:
-            json.dump(response_payload, f, indent=2, default=str)
-    except Exception as e:
-        print(f"Failed to write debug json: {e}")
-
-    return response_payload
-
-@router.get("/history", response_model=List[QuizResponse])
-def get_history(db: Session = Depends(get_db)):
-    quizzes = db.query(Quiz).order_by(Quiz.created_at.desc()).all()
-    # We might need to map 'quiz_data' back to 'quiz' if the schema expects 'quiz'
-    # But Pydantic's from_attributes should handle it if names match.
-    # In model: quiz_data. In schema: quiz.
-    # We rely on an implementation detail or map it manually.
-    # Let's simple map it manually to be safe or update schema alias.
-    # Schema 'quiz' field matches 'quiz' in response.
-    # Model has 'quiz_data'.
-    
-    results = []
-    for q in quizzes:
-        # Create a dict from the model instance
-        q_dict = {
-            "id": q.id,
-            "url": q.url,
-            "title": q.title,
-            "summary": q.summary,
-            "sections": q.sections,
-            "quiz": fix_quiz_format(q.quiz_data), # Mapping quiz_data -> quiz
-            "related_topics": q.related_topics,
-            "created_at": q.created_at
-        }
-        results.append(q_dict)
-    return results
+        created_at, quiz_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(quiz_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/history", response_model=HistoryPage)
+def get_history(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("summary", pattern="^(summary|full)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Newest-first, keyset paginated on (created_at, id). Pass next_cursor back
+    as ?cursor= for the following page. The default 'summary' mode only
+    selects id/url/title/created_at; load the full quiz from /api/quiz/{id}.
+    """
+    query = db.query(Quiz.id, Quiz.url, Quiz.title, Quiz.created_at)
+    if cursor:
+        created_at, quiz_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Quiz.created_at, Quiz.id) < tuple_(created_at, quiz_id))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if fields == "full":
+        items = full_quiz_bodies(db, [r.id for r in rows])
+    else:
+        items = [QuizSummary(id=r.id, url=r.url, title=r.title, created_at=r.created_at).model_dump_json().encode() for r in rows]
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    body = b'{"items":[' + b",".join(items) + b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+    # Pages change as quizzes are added, so clients revalidate each time (a 304 still skips the body)
+    return json_response(request, body, "no-cache")
+
+def full_quiz_bodies(db: Session, quiz_ids):
+    """Serialized quizzes in quiz_ids order, loading only those not already cached."""
+    bodies = {}
+    for quiz_id in quiz_ids:
+        entry = quiz_cache.get(quiz_id)
+        if entry:
+            bodies[quiz_id] = entry[0]
+    missing = [quiz_id for quiz_id in quiz_ids if quiz_id not in bodies]
+    if missing:
+        for q in db.query(Quiz).filter(Quiz.id.in_(missing)):
+            bodies[q.id] = cache_quiz(q)[0]
+    return [bodies[quiz_id] for quiz_id in quiz_ids if quiz_id in bodies]
 
 @router.get("/quiz/{quiz_id}", response_model=QuizResponse)
-def get_quiz_detail(quiz_id: int, db: Session = Depends(get_db)):
+def get_quiz_detail(quiz_id: int, request: Request, db: Session = Depends(get_db)):
+    # Quizzes are immutable, so a cached body is served without touching the DB
+    entry = quiz_cache.get(quiz_id)
+    if entry is None:
+        q = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+        if not q:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        entry = cache_quiz(q)
+    # Only ids that exist feed the prefetcher
+    prefetcher.viewed(quiz_id)
+
+    body, etag = entry
+    return json_response(request, body, f"public, max-age={RESPONSE_CACHE_MAX_AGE}, immutable", etag)
+
+@router.get("/quiz/{quiz_id}/questions", response_model=List[QuizQuestion])
+def get_quiz_questions(
+    quiz_id: int,
+    difficulty: Optional[str] = Query(None, pattern="^(easy|medium|hard)$"),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """A quiz's questions, optionally filtered by difficulty, without loading the rest of the quiz."""
+    query = db.query(Question).filter(Question.quiz_id == quiz_id)
+    if difficulty:
+        query = query.filter(Question.difficulty == difficulty)
+    rows = query.order_by(Question.position).offset(offset).limit(limit).all()
+    if not rows and not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return [serialize_question(row) for row in rows]
+
+@router.get("/quiz/{quiz_id}/related", response_model=List[RelatedQuiz])
+def get_related_quizzes(quiz_id: int, db: Session = Depends(get_db)):
+    """The quiz's related topics, each with the stored quiz that covers it (quiz_id null if none yet)."""
     q = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not q:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    return {
-        "id": q.id,
-        "url": q.url,
-        "title": q.title,
-        "summary": q.summary,
-        "sections": q.sections,
-        "quiz": fix_quiz_format(q.quiz_data), 
-        "related_topics": q.related_topics,
-        "created_at": q.created_at
-    }
+    return resolve_topics(db, q)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..schemas import SearchPage
+from ..services.search import search_quizzes
+
+router = APIRouter(
+    prefix="/api",
+    tags=["search"]
+)
+
+@router.get("/search", response_model=SearchPage)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranked full-text search over quiz titles, summaries, section names and
+    question text. Every word must match (the last one as a prefix). Pass
+    next_offset back as ?offset= for the following page.
+    """
+    return search_quizzes(db, q, limit, offset)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Union
 from datetime import datetime
 
 class QuizRequest(BaseModel):
@@ -30,3 +30,58 @@ class QuizResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class RelatedQuiz(BaseModel):
+    topic: str
+    quiz_id: Optional[int] = None # a stored quiz covering the topic, if any
+    score: Optional[float] = None
+    match: Optional[str] = None # "key" or "embedding"
+
+class QuizSummary(BaseModel):
+    id: int
+    url: str
+    title: str
+    created_at: datetime
+
+class HistoryPage(BaseModel):
+    items: List[Union[QuizResponse, QuizSummary]]
+    next_cursor: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: int
+    url: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    quiz_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchRequest(BaseModel):
+    urls: List[HttpUrl]
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    queued: int
+    existing: int
+    duplicates: int
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    total: int
+    counts: dict
+    done: bool
+
+class SearchResult(BaseModel):
+    id: int
+    url: str
+    title: str
+    created_at: datetime
+    rank: float
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_offset: Optional[int] = None
@@ -0,0 +1,43 @@
+import argparse
+import os
+
+import uvicorn
+
+# Production entry point:
+#   python -m app.migrate
+#   python -m app.serve --workers 4
+# The listening socket is bound once and the worker processes are started up
+# front, each importing the app on its own; a worker that dies is replaced.
+# Schema setup is left to the explicit migration step. Each worker also runs
+# JOB_WORKERS generation threads, so with several web workers consider
+# JOB_WORKERS=0 and `python -m app.worker` instead.
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--migrate", action="store_true",
+                        help="Create missing tables once before starting the workers")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds to let in-flight requests finish on shutdown")
+    args = parser.parse_args()
+
+    if args.migrate:
+        from .migrate import migrate
+        migrate()
+    # Inherited by the worker processes
+    os.environ.setdefault("DB_AUTO_MIGRATE", "false")
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=os.getenv("LOG_LEVEL", "info"),
+    )
+
+if __name__ == "__main__":
+    main()
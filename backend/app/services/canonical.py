@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Quiz
+from . import wiki_api
+from .scrape_cache import article_key, is_pinned
+from .telemetry import span
+
+# Every URL variant of an article (mobile host, %20 vs _, trailing slash,
+# #anchor, query string, lower-case first letter, redirect title) maps to one
+# "<lang>:<Title>" key, stored in the uniquely indexed quizzes.canonical_key
+# column. Lookups go by that key, so variants reuse the stored quiz instead of
+# generating a new one.
+
+# Look redirect titles up with the MediaWiki API when the plain key misses
+CANONICAL_RESOLVE_REDIRECTS = os.getenv("CANONICAL_RESOLVE_REDIRECTS", "true").lower() in ("1", "true", "yes")
+REDIRECT_CACHE_SIZE = int(os.getenv("REDIRECT_CACHE_SIZE", "4096"))
+
+LANG_RE = re.compile(r"^[a-z][a-z0-9-]*$")
+
+
+def canonical_key(url: str) -> str:
+    """Key for a URL without any network lookup (redirects not followed)."""
+    return article_key(url)
+
+
+class LookupStats:
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.variant_hits = 0 # found under a different URL than the one requested
+        self.redirect_hits = 0 # found only after resolving a redirect
+        self.redirects_resolved = 0
+        self._lock = threading.Lock()
+
+    def record(self, quiz, url_str: str, via_redirect: bool):
+        with self._lock:
+            self.lookups += 1
+            if quiz is None:
+                return
+            self.hits += 1
+            self.variant_hits += int(quiz.url != url_str)
+            self.redirect_hits += int(via_redirect)
+
+    def record_redirect(self):
+        with self._lock:
+            self.redirects_resolved += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "variant_hits": self.variant_hits,
+                "redirect_hits": self.redirect_hits,
+                "redirects_resolved": self.redirects_resolved,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            }
+
+
+lookup_stats = LookupStats()
+
+_redirects = OrderedDict() # key -> canonical key
+_redirects_lock = threading.Lock()
+
+
+def _cached_redirect(key: str):
+    with _redirects_lock:
+        target = _redirects.get(key)
+        if target is not None:
+            _redirects.move_to_end(key)
+        return target
+
+
+def _remember_redirect(key: str, target: str):
+    with _redirects_lock:
+        _redirects[key] = target
+        while len(_redirects) > REDIRECT_CACHE_SIZE:
+            _redirects.popitem(last=False)
+    if target != key:
+        lookup_stats.record_redirect()
+
+
+def _resolvable(key: str) -> bool:
+    lang = key.split(":", 1)[0]
+    return CANONICAL_RESOLVE_REDIRECTS and not is_pinned(key) and bool(LANG_RE.match(lang))
+
+
+def _target_key(key: str, resolved):
+    lang, title = key.split(":", 1)
+    if not resolved or title not in resolved:
+        return key
+    return f"{lang}:{resolved[title][0].replace(' ', '_')}"
+
+
+def resolve_redirect(key: str) -> str:
+    """Key of the article a (possibly redirect) key points to; the key itself on any failure."""
+    if not _resolvable(key):
+        return key
+    target = _cached_redirect(key)
+    if target is None:
+        lang, title = key.split(":", 1)
+        try:
+            target = _target_key(key, wiki_api.fetch_revisions(lang, [title]))
+        except Exception as e:
+            print(f"Redirect lookup failed for {key}: {e}")
+            return key
+        _remember_redirect(key, target)
+    return target
+
+
+async def resolve_redirect_async(key: str) -> str:
+    if not _resolvable(key):
+        return key
+    target = _cached_redirect(key)
+    if target is None:
+        lang, title = key.split(":", 1)
+        try:
+            target = _target_key(key, await wiki_api.fetch_revisions_async(lang, [title]))
+        except Exception as e:
+            print(f"Redirect lookup failed for {key}: {e}")
+            return key
+        _remember_redirect(key, target)
+    return target
+
+
+def _by_key(key: str, url_str: str = None):
+    # Rows created before the canonical_key backfill only match by URL
+    condition = Quiz.canonical_key == key
+    if url_str:
+        condition = or_(condition, Quiz.url == url_str)
+    return select(Quiz).where(condition).limit(1)
+
+
+def find_quiz(db: Session, url_str: str, resolve: bool = True):
+    """-> (stored quiz or None, canonical key to store a new quiz under)"""
+    key = canonical_key(url_str)
+    with span("db_lookup"):
+        quiz = db.execute(_by_key(key, url_str)).scalars().first()
+    via_redirect = False
+    if quiz is None and resolve:
+        target = resolve_redirect(key)
+        if target != key:
+            key = target
+            with span("db_lookup"):
+                quiz = db.execute(_by_key(key)).scalars().first()
+            via_redirect = quiz is not None
+    lookup_stats.record(quiz, url_str, via_redirect)
+    return quiz, key
+
+
+async def find_quiz_async(db: AsyncSession, url_str: str, resolve: bool = True):
+    key = canonical_key(url_str)
+    with span("db_lookup"):
+        quiz = (await db.execute(_by_key(key, url_str))).scalars().first()
+    via_redirect = False
+    if quiz is None and resolve:
+        target = await resolve_redirect_async(key)
+        if target != key:
+            key = target
+            with span("db_lookup"):
+                quiz = (await db.execute(_by_key(key))).scalars().first()
+            via_redirect = quiz is not None
+    lookup_stats.record(quiz, url_str, via_redirect)
+    return quiz, key
+
+
+def find_quiz_by_key(db: Session, key: str):
+    return db.execute(_by_key(key)).scalars().first()
+
+
+async def find_quiz_by_key_async(db: AsyncSession, key: str):
+    return (await db.execute(_by_key(key))).scalars().first()
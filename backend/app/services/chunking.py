@@ -0,0 +1,176 @@
+import math
+import os
+import re
+from collections import Counter
+
+try:
+    import tiktoken
+except ImportError: # optional; falls back to a word-based estimate
+    tiktoken = None
+
+# Picks what part of an article the LLM sees. Instead of the first N characters,
+# the article is split along its section headings, each chunk is scored
+# (TF-IDF salience against the rest of the article, weighted by position), and
+# the best chunks are packed into a token budget, then put back in article order.
+
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "3500"))
+MAX_CHUNK_TOKENS = int(os.getenv("MAX_CHUNK_TOKENS", "600"))
+
+# Sections that are references or navigation rather than article content
+SKIP_SECTIONS = {
+    "references", "external links", "see also", "further reading", "notes",
+    "bibliography", "sources", "citations", "footnotes", "notes and references",
+}
+
+STOPWORDS = set("""
+a an and are as at be been but by can for from had has have he her his in into is it its
+of on or she that the their them there these they this to was were which while who will with
+""".split())
+
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]+")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding, tiktoken
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                # Downloads the BPE file on first use, which fails on hosts without egress
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"tiktoken encoding unavailable, estimating tokens from words: {e}")
+                tiktoken = None
+                return count_tokens(text)
+        return len(_encoding.encode(text, disallowed_special=()))
+    # ~1.3 tokens per English word, plus punctuation and digits
+    return int(len(text.split()) * 1.3) + 1
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """The head of text that fits in budget tokens (as counted by count_tokens)."""
+    if count_tokens(text) <= budget:
+        return text
+    if tiktoken is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:budget])
+    return " ".join(text.split()[:max(int((budget - 1) / 1.3), 1)])
+
+
+class Chunk:
+    def __init__(self, heading: str, text: str, position: int):
+        self.heading = heading
+        self.text = text
+        self.position = position
+        self.tokens = count_tokens(text)
+        self.score = 0.0
+
+    def render(self) -> str:
+        return f"## {self.heading}\n{self.text}" if self.heading else self.text
+
+
+def split_chunks(section_texts, max_chunk_tokens: int = MAX_CHUNK_TOKENS):
+    """One chunk per section, with long sections split on paragraph boundaries."""
+    chunks = []
+    for section in section_texts:
+        if section["heading"].lower() in SKIP_SECTIONS:
+            continue
+        paragraphs = section["text"].split("\n")
+        current = []
+        current_tokens = 0
+        for paragraph in paragraphs:
+            tokens = count_tokens(paragraph)
+            if current and current_tokens + tokens > max_chunk_tokens:
+                chunks.append(Chunk(section["heading"], "\n".join(current), len(chunks)))
+                current, current_tokens = [], 0
+            current.append(paragraph)
+            current_tokens += tokens
+        if current:
+            chunks.append(Chunk(section["heading"], "\n".join(current), len(chunks)))
+    return chunks
+
+
+def terms(text: str):
+    return [w for w in (m.lower() for m in WORD_RE.findall(text)) if w not in STOPWORDS]
+
+
+def score_chunks(chunks, title: str = ""):
+    term_counts = [Counter(terms(c.render())) for c in chunks]
+    doc_freq = Counter()
+    for counts in term_counts:
+        doc_freq.update(counts.keys())
+    n = len(chunks)
+    title_terms = set(terms(title))
+
+    for chunk, counts in zip(chunks, term_counts):
+        total = sum(counts.values()) or 1
+        # Mean TF-IDF over the chunk's terms: dense, distinctive content scores high
+        tfidf = sum((c / total) * math.log((1 + n) / (1 + doc_freq[t])) for t, c in counts.items())
+        title_bonus = 0.5 * len(title_terms & counts.keys()) / (len(title_terms) or 1)
+        # The lead summarizes the article; earlier sections tend to be more central
+        position_weight = 2.0 if chunk.position == 0 else 1.0 / (1.0 + 0.05 * chunk.position)
+        chunk.score = (tfidf + title_bonus) * position_weight
+    return chunks
+
+
+def pack_chunks(chunks, budget: int):
+    """Greedy by score; the result is in article order."""
+    selected = []
+    used = 0
+    ranked = sorted(chunks, key=lambda c: c.score, reverse=True)
+    for chunk in ranked:
+        if used + chunk.tokens > budget:
+            continue
+        selected.append(chunk)
+        used += chunk.tokens
+    if not selected and ranked:
+        # Every chunk is over budget (e.g. one huge paragraph): send the head of the best one
+        best = ranked[0]
+        heading_tokens = count_tokens(f"## {best.heading}") if best.heading else 0
+        text = truncate_tokens(best.text, max(budget - heading_tokens, 1))
+        selected.append(Chunk(best.heading, text, best.position))
+    return sorted(selected, key=lambda c: c.position)
+
+
+def select_content(scraped_data, budget: int = LLM_CONTEXT_TOKEN_BUDGET) -> str:
+    """The text to send to the LLM for a scraped article."""
+    section_texts = scraped_data.get("section_texts")
+    if not section_texts:
+        # Articles cached before section-aware parsing
+        return scraped_data["content_text"]
+
+    chunks = split_chunks(section_texts)
+    if not chunks:
+        return scraped_data["content_text"]
+    if sum(c.tokens for c in chunks) <= budget:
+        return "\n\n".join(c.render() for c in chunks)
+
+    score_chunks(chunks, scraped_data.get("title", ""))
+    return "\n\n".join(c.render() for c in pack_chunks(chunks, budget))
+
+
+def plan_parts(scraped_data, part_budget: int, max_parts: int):
+    """
+    For map-reduce generation: the best chunks that fit in max_parts * part_budget
+    tokens, grouped in article order into parts of at most part_budget tokens.
+    Returns [] for articles without section data.
+    """
+    section_texts = scraped_data.get("section_texts")
+    if not section_texts:
+        return []
+
+    chunks = split_chunks(section_texts, max_chunk_tokens=min(MAX_CHUNK_TOKENS, part_budget))
+    score_chunks(chunks, scraped_data.get("title", ""))
+    selected = pack_chunks(chunks, part_budget * max_parts)
+
+    parts = []
+    current, current_tokens = [], 0
+    for chunk in selected:
+        if current and current_tokens + chunk.tokens > part_budget:
+            parts.append("\n\n".join(c.render() for c in current))
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk.tokens
+    if current:
+        parts.append("\n\n".join(c.render() for c in current))
+    return parts
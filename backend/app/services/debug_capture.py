@@ -0,0 +1,135 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from .telemetry import Counter, register_metric
+
+# Sampled capture of generated quiz payloads for debugging, replacing the old
+# latest_quiz_output.json written on the request thread. Off by default. The
+# request path only makes a sampling decision and puts the already serialized
+# response bytes on a bounded queue (dropping them when it is full); one
+# background thread keeps the newest DEBUG_CAPTURE_RING captures in memory for
+# GET /api/diagnostics/debug-captures and, if DEBUG_CAPTURE_DIR is set, writes
+# one file per capture there, keeping the newest DEBUG_CAPTURE_MAX_FILES.
+
+DEBUG_CAPTURE_ENABLED = os.getenv("DEBUG_CAPTURE_ENABLED", "false").lower() in ("1", "true", "yes")
+DEBUG_CAPTURE_SAMPLE_RATE = float(os.getenv("DEBUG_CAPTURE_SAMPLE_RATE", "0.1"))
+DEBUG_CAPTURE_RING = int(os.getenv("DEBUG_CAPTURE_RING", "50"))
+DEBUG_CAPTURE_QUEUE = int(os.getenv("DEBUG_CAPTURE_QUEUE", "100"))
+DEBUG_CAPTURE_DIR = os.getenv("DEBUG_CAPTURE_DIR", "")
+DEBUG_CAPTURE_MAX_FILES = int(os.getenv("DEBUG_CAPTURE_MAX_FILES", "200"))
+
+DEBUG_CAPTURE_EVENTS = register_metric(Counter(
+    "quiz_debug_capture_total", "Debug captures by outcome: captured, dropped (queue full), written, failed", ["event"]
+))
+
+
+class DebugCapture:
+    def __init__(self, enabled: bool = DEBUG_CAPTURE_ENABLED, sample_rate: float = DEBUG_CAPTURE_SAMPLE_RATE,
+                 ring: int = DEBUG_CAPTURE_RING, queue_size: int = DEBUG_CAPTURE_QUEUE,
+                 directory: str = DEBUG_CAPTURE_DIR, max_files: int = DEBUG_CAPTURE_MAX_FILES):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._ring = deque(maxlen=ring)
+        self._files = deque() # paths written by this process, oldest first
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Request path: a sampling decision and a non-blocking put
+
+    def sampled(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def capture(self, kind: str, body: bytes, **meta):
+        if not self.sampled():
+            return
+        entry = {"kind": kind, "captured_at": datetime.now(timezone.utc).isoformat(), **meta}
+        try:
+            self._queue.put_nowait((entry, body))
+            DEBUG_CAPTURE_EVENTS.inc("captured")
+        except queue.Full:
+            DEBUG_CAPTURE_EVENTS.inc("dropped")
+
+    # Background writer
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._loop, name="debug-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            # Captures queued before this are still written
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self.record(*item)
+            except Exception as e:
+                DEBUG_CAPTURE_EVENTS.inc("failed")
+                print(f"Failed to write debug capture: {e}")
+
+    def record(self, entry, body: bytes):
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+        entry["bytes"] = len(body)
+        if self.directory:
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+            path = os.path.join(self.directory, f"{stamp}-{os.getpid()}-{entry['id']}-{entry['kind']}.json")
+            with open(path, "wb") as f:
+                f.write(body)
+            entry["file"] = path
+            self._files.append(path)
+            while len(self._files) > self.max_files:
+                try:
+                    os.remove(self._files.popleft())
+                except OSError:
+                    pass
+            DEBUG_CAPTURE_EVENTS.inc("written")
+        with self._lock:
+            self._ring.append((entry, body))
+
+    # Admin endpoint
+
+    def list(self):
+        with self._lock:
+            return [dict(entry) for entry, _ in reversed(self._ring)]
+
+    def get(self, capture_id: int):
+        with self._lock:
+            for entry, body in self._ring:
+                if entry["id"] == capture_id:
+                    return {**entry, "payload": json.loads(body)}
+        return None
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "directory": self.directory or None,
+            "queued": self._queue.qsize(),
+            "held": len(self._ring),
+            "events": {e: DEBUG_CAPTURE_EVENTS.value(e) for e in ("captured", "dropped", "written", "failed")},
+        }
+
+
+debug_capture = DebugCapture()
@@ -0,0 +1,361 @@
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import quote
+
+import numpy as np
+from sqlalchemy import select
+
+from ..database import SessionLocal
+from ..models import Quiz, QuizEmbedding
+from .quiz_format import quiz_topics
+from .scrape_cache import article_key
+from .telemetry import Counter as MetricCounter, register_metric, span
+
+# Near-duplicate detection over stored quizzes. Each quiz gets a hashed
+# word/bigram vector of its title, summary and question text, written to
+# quiz_embeddings with the quiz and held in memory as one float32 matrix for
+# exact top-k cosine search. Runs offline: no embedding model or API.
+#
+# Related topics are resolved to stored quizzes (by article key, then by
+# vector). With NEAR_DUPLICATE_REUSE=true, an article whose title + summary is
+# close enough to a stored quiz also reuses that quiz's questions instead of
+# calling the LLM. That is off by default: the threshold has only been checked
+# on synthetic text, not on real sibling articles (e.g. two editions of the
+# same tournament), which would wrongly share questions.
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+NEAR_DUPLICATE_REUSE = os.getenv("NEAR_DUPLICATE_REUSE", "false").lower() in ("1", "true", "yes")
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85"))
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.35"))
+# Vectors other workers stored are picked up at most this often (seconds)
+EMBEDDING_SYNC_INTERVAL = float(os.getenv("EMBEDDING_SYNC_INTERVAL", "5"))
+EMBEDDING_LOAD_BATCH = 5000
+# Quizzes stored by several workers can commit out of id order, so each sync
+# also rereads the ids this far below the highest one loaded and fills gaps
+EMBEDDING_SYNC_LOOKBACK = int(os.getenv("EMBEDDING_SYNC_LOOKBACK", "1000"))
+
+TITLE_WEIGHT = 3.0
+SUMMARY_WEIGHT = 1.0
+# Low, so a stored quiz still scores close to 1.0 against its own title + summary
+QUESTION_WEIGHT = 0.3
+
+WORD_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from had has have he her his in is it its of on or she
+that the their they this to was were which who with also after before into than then there
+these those such other more most some can could would will not no one two first
+""".split())
+
+NEAR_DUPLICATES = register_metric(MetricCounter(
+    "quiz_near_duplicate_total", "Generations answered from a near-duplicate quiz, or not", ["outcome"]
+))
+TOPIC_MATCHES = register_metric(MetricCounter(
+    "quiz_related_topic_matches_total", "Related topics resolved to a stored quiz, by how", ["match"]
+))
+
+
+# Vectors
+
+def _add_features(vector, text: str, weight: float):
+    words = [w for w in WORD_RE.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+    counts = Counter(words)
+    counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    dim = vector.shape[0]
+    for token, n in counts.items():
+        # crc32, not hash(): vectors must match across processes and restarts
+        h = zlib.crc32(token.encode())
+        vector[h % dim] += (weight if h & 0x80000000 else -weight) * (1.0 + math.log(n))
+
+
+def embed(fields, dim: int = EMBEDDING_DIM):
+    """Unit vector for [(text, weight)]; all zeros if there are no usable words."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for text, weight in fields:
+        if text:
+            _add_features(vector, text, weight)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def quiz_vector(title: str, summary: str, questions=()):
+    return embed([
+        (title, TITLE_WEIGHT),
+        (summary, SUMMARY_WEIGHT),
+        (" ".join(q.get("question") or "" for q in questions), QUESTION_WEIGHT),
+    ])
+
+
+def article_vector(scraped_data):
+    """What a new article is compared with before it has any questions."""
+    return quiz_vector(scraped_data["title"], scraped_data["summary"])
+
+
+def quiz_embedding(title: str, summary: str, questions) -> QuizEmbedding:
+    return QuizEmbedding(vector=quiz_vector(title, summary, questions).tobytes())
+
+
+def decode(blob: bytes):
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class VectorStore:
+    """Unit vectors as rows of one float32 matrix, with exact top-k cosine search."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._rows = {} # id -> row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, item_id):
+        return item_id in self._rows
+
+    @property
+    def nbytes(self):
+        return self._matrix.nbytes + self._ids.nbytes
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self._rows)] = self._matrix[:len(self._rows)]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:len(self._rows)] = self._ids[:len(self._rows)]
+        self._matrix, self._ids = matrix, ids
+
+    def add_many(self, ids, vectors):
+        with self._lock:
+            self._grow(len(self._rows) + len(ids))
+            for item_id, vector in zip(ids, vectors):
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = self._rows[item_id] = len(self._rows)
+                    self._ids[row] = item_id
+                self._matrix[row] = vector
+
+    def add(self, item_id: int, vector):
+        self.add_many([item_id], [vector])
+
+    def remove(self, item_id: int):
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            # Move the last row into the gap
+            last = len(self._rows)
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+
+    def search(self, vector, k: int, exclude=None):
+        """[(id, cosine)] for the k most similar vectors, best first."""
+        with self._lock:
+            size = len(self._rows)
+            if size == 0:
+                return []
+            scores = self._matrix[:size] @ vector
+            ids = self._ids[:size].copy()
+        if exclude is not None:
+            scores[ids == exclude] = -np.inf
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > -np.inf]
+
+
+class EmbeddingIndex:
+    """A VectorStore kept in step with the quiz_embeddings table."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, sync_interval: float = EMBEDDING_SYNC_INTERVAL, clock=time.monotonic):
+        self.store = VectorStore(dim)
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self.loaded_through = 0 # highest quiz_id read from the table
+        self.synced_at = None
+        self.skipped = set() # quiz ids written with a different EMBEDDING_DIM
+
+    def _due(self) -> bool:
+        return self.synced_at is None or self.clock() - self.synced_at >= self.sync_interval
+
+    def _query(self):
+        return (
+            select(QuizEmbedding.quiz_id, QuizEmbedding.vector)
+            .where(QuizEmbedding.quiz_id > self.loaded_through)
+            .order_by(QuizEmbedding.quiz_id)
+            .limit(EMBEDDING_LOAD_BATCH)
+        )
+
+    def _lookback_query(self):
+        return select(QuizEmbedding.quiz_id).where(
+            QuizEmbedding.quiz_id > self.loaded_through - EMBEDDING_SYNC_LOOKBACK,
+            QuizEmbedding.quiz_id <= self.loaded_through,
+        )
+
+    def _missing(self, ids):
+        """Ids below the high-water mark that committed after it moved past them."""
+        return [i for i in ids if i not in self.store and i not in self.skipped]
+
+    def _rows_query(self, ids):
+        return select(QuizEmbedding.quiz_id, QuizEmbedding.vector).where(QuizEmbedding.quiz_id.in_(ids))
+
+    def _load(self, rows):
+        ids, vectors = [], []
+        for quiz_id, blob in rows:
+            vector = decode(blob)
+            if vector.shape[0] != self.store.dim:
+                self.skipped.add(quiz_id)
+                continue
+            ids.append(quiz_id)
+            vectors.append(vector)
+        self.store.add_many(ids, vectors)
+        if rows:
+            self.loaded_through = max(self.loaded_through, max(row[0] for row in rows))
+        return len(rows) == EMBEDDING_LOAD_BATCH
+
+    def sync(self, db):
+        """Load vectors stored since the last sync (by any worker); all of them the first time."""
+        if not self._due():
+            return
+        if self.synced_at is not None:
+            missing = self._missing(db.execute(self._lookback_query()).scalars())
+            if missing:
+                self._load(db.execute(self._rows_query(missing)).all())
+        while self._load(db.execute(self._query()).all()):
+            pass
+        self.synced_at = self.clock()
+
+    async def sync_async(self, db):
+        if not self._due():
+            return
+        if self.synced_at is not None:
+            missing = self._missing((await db.execute(self._lookback_query())).scalars())
+            if missing:
+                self._load((await db.execute(self._rows_query(missing))).all())
+        while self._load((await db.execute(self._query())).all()):
+            pass
+        self.synced_at = self.clock()
+
+    def add(self, quiz_id: int, blob: bytes):
+        """Make a quiz this worker just stored searchable without waiting for a sync."""
+        self.store.add(quiz_id, decode(blob))
+
+    def near_duplicates(self, vector):
+        return [(i, s) for i, s in self.store.search(vector, 3) if s >= NEAR_DUPLICATE_THRESHOLD]
+
+    def snapshot(self):
+        return {
+            "entries": len(self.store),
+            "dim": self.store.dim,
+            "bytes": self.store.nbytes,
+            "loaded_through_quiz_id": self.loaded_through,
+            "skipped_wrong_dim": len(self.skipped),
+            "near_duplicate_reuse": NEAR_DUPLICATE_REUSE,
+            "near_duplicate_threshold": NEAR_DUPLICATE_THRESHOLD,
+            "topic_match_threshold": TOPIC_MATCH_THRESHOLD,
+            "near_duplicates": {o: NEAR_DUPLICATES.value(o) for o in ("reused", "generated")},
+            "topic_matches": {m: TOPIC_MATCHES.value(m) for m in ("key", "embedding", "none")},
+        }
+
+
+embedding_index = EmbeddingIndex()
+
+
+def load_embedding_index():
+    """Load every stored vector up front (at startup), not inside the first request that needs them."""
+    db = SessionLocal()
+    try:
+        embedding_index.sync(db)
+    finally:
+        db.close()
+
+
+# Near-duplicate reuse
+
+def find_near_duplicate(db, scraped_data):
+    """A stored quiz about (nearly) the same article as scraped_data, or None."""
+    if not NEAR_DUPLICATE_REUSE:
+        return None
+    with span("near_duplicate"):
+        embedding_index.sync(db)
+        for quiz_id, score in embedding_index.near_duplicates(article_vector(scraped_data)):
+            quiz = db.get(Quiz, quiz_id)
+            if quiz is not None:
+                print(f"Reusing quiz {quiz_id} for '{scraped_data['title']}' (similarity {score:.3f})")
+                return quiz
+            embedding_index.store.remove(quiz_id) # deleted since it was loaded
+    return None
+
+
+async def find_near_duplicate_async(db, scraped_data):
+    if not NEAR_DUPLICATE_REUSE:
+        return None
+    with span("near_duplicate"):
+        await embedding_index.sync_async(db)
+        # Vectorizing and the full matrix scan are CPU work; keep them off the event loop
+        matches = await asyncio.to_thread(lambda: embedding_index.near_duplicates(article_vector(scraped_data)))
+        for quiz_id, score in matches:
+            quiz = await db.get(Quiz, quiz_id)
+            if quiz is not None:
+                print(f"Reusing quiz {quiz_id} for '{scraped_data['title']}' (similarity {score:.3f})")
+                return quiz
+            embedding_index.store.remove(quiz_id)
+    return None
+
+
+# Related topics
+
+def topic_key(lang: str, topic: str) -> str:
+    return article_key(f"https://{lang}.wikipedia.org/wiki/{quote(topic.strip().replace(' ', '_'))}")
+
+
+def resolve_topics(db, q: Quiz):
+    """
+    [{topic, quiz_id, score, match}] for a quiz's related topics. A topic
+    matches a stored quiz by article key first, then by vector similarity;
+    quiz_id is None when nothing stored covers it yet.
+    """
+    lang = (q.canonical_key or article_key(q.url or "")).split(":", 1)[0]
+    topics = quiz_topics(q)
+    keys = {topic: topic_key(lang, topic) for topic in topics}
+    by_key = dict(db.query(Quiz.canonical_key, Quiz.id).filter(Quiz.canonical_key.in_(set(keys.values()))).all())
+
+    embedding_index.sync(db)
+    resolved = []
+    for topic in topics:
+        quiz_id = by_key.get(keys[topic])
+        if quiz_id is not None and quiz_id != q.id:
+            resolved.append({"topic": topic, "quiz_id": quiz_id, "score": 1.0, "match": "key"})
+            continue
+        best = embedding_index.store.search(embed([(topic, 1.0)]), 1, exclude=q.id)
+        if best and best[0][1] >= TOPIC_MATCH_THRESHOLD:
+            resolved.append({"topic": topic, "quiz_id": best[0][0], "score": round(best[0][1], 4), "match": "embedding"})
+        else:
+            resolved.append({"topic": topic, "quiz_id": None, "score": None, "match": None})
+
+    # Vectors of since-deleted quizzes may still be loaded
+    matched = {r["quiz_id"] for r in resolved if r["match"] == "embedding"}
+    if matched:
+        existing = {row[0] for row in db.query(Quiz.id).filter(Quiz.id.in_(matched))}
+        for r in resolved:
+            if r["match"] == "embedding" and r["quiz_id"] not in existing:
+                embedding_index.store.remove(r["quiz_id"])
+                r.update(quiz_id=None, score=None, match=None)
+
+    for r in resolved:
+        TOPIC_MATCHES.inc(r["match"] or "none")
+    return resolved
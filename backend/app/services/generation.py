@@ -0,0 +1,268 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Quiz
+from .scraper import scrape_wikipedia, scrape_wikipedia_async
+from .llm import generate_quiz_from_text, generate_quiz_from_text_async, stream_quiz_from_text
+from .model_router import AllModelsFailed
+from .chunking import select_content
+from .mapreduce import plan_map_parts, generate_quiz_map_reduce, generate_quiz_map_reduce_async
+from .quiz_format import question_rows, topic_rows, quiz_questions, quiz_topics
+from .response_cache import cache_quiz
+from .canonical import canonical_key
+from .search import index_quiz, index_quiz_async, index_quizzes_async
+from .telemetry import span
+from .embeddings import (
+    embedding_index, quiz_embedding, find_near_duplicate, find_near_duplicate_async, NEAR_DUPLICATES,
+)
+
+# The scrape -> LLM -> save pipeline, shared by the request handlers and
+# anything else that needs to generate a quiz for a URL.
+
+class GenerationCancelled(Exception):
+    pass
+
+def check_cancelled(cancelled):
+    # Last chance to drop the result of a cancelled job before it is stored
+    if cancelled is not None and cancelled():
+        raise GenerationCancelled("Cancelled before the quiz was stored")
+
+def format_question(q):
+    q_dict = q.dict()
+    return {
+        "question": q_dict["question"],
+        "options": {
+            "A": q_dict["A"],
+            "B": q_dict["B"],
+            "C": q_dict["C"],
+            "D": q_dict["D"],
+        },
+        "answer": q_dict["answer"],
+        "difficulty": q_dict["difficulty"],
+        "explanation": q_dict["explanation"]
+    }
+
+def format_quiz_questions(llm_output):
+    # We need to convert pydantic models to dicts for JSON storage
+    return [format_question(q) for q in llm_output.quiz]
+
+def build_quiz(url_str: str, scraped_data, llm_output, key: str = None) -> Quiz:
+    questions = format_quiz_questions(llm_output)
+    return Quiz(
+        url=url_str,
+        canonical_key=key or canonical_key(url_str),
+        title=scraped_data["title"],
+        summary=scraped_data["summary"],
+        sections=scraped_data["sections"],
+        questions=question_rows(questions),
+        topics=topic_rows(llm_output.related_topics),
+        embedding=quiz_embedding(scraped_data["title"], scraped_data["summary"], questions)
+    )
+
+def derive_quiz(url_str: str, scraped_data, source: Quiz, key: str = None) -> Quiz:
+    """A quiz for a near-duplicate of source's article, reusing its questions instead of calling the LLM."""
+    questions = quiz_questions(source)
+    return Quiz(
+        url=url_str,
+        canonical_key=key or canonical_key(url_str),
+        title=scraped_data["title"],
+        summary=scraped_data["summary"],
+        sections=scraped_data["sections"],
+        questions=question_rows(questions),
+        topics=topic_rows(quiz_topics(source)),
+        embedding=quiz_embedding(scraped_data["title"], scraped_data["summary"], questions)
+    )
+
+def generate_llm_output(scraped_data):
+    # Long articles fan out per part; if the merge comes up short, fall back
+    # to one call over the budgeted content (not when every model failed: the
+    # single call would go through the same models)
+    parts = plan_map_parts(scraped_data)
+    if parts:
+        try:
+            return generate_quiz_map_reduce(parts)
+        except AllModelsFailed:
+            raise
+        except Exception as e:
+            print(f"Map-reduce generation failed, using a single call: {e}")
+    return generate_quiz_from_text(select_content(scraped_data))
+
+async def generate_llm_output_async(scraped_data):
+    parts = plan_map_parts(scraped_data)
+    if parts:
+        try:
+            return await generate_quiz_map_reduce_async(parts)
+        except AllModelsFailed:
+            raise
+        except Exception as e:
+            print(f"Map-reduce generation failed, using a single call: {e}")
+    return await generate_quiz_from_text_async(select_content(scraped_data))
+
+def store_quiz(db: Session, new_quiz: Quiz) -> Quiz:
+    # Read before the commit expires it
+    vector = new_quiz.embedding.vector if new_quiz.embedding is not None else None
+    db.add(new_quiz)
+    try:
+        with span("commit"):
+            db.commit()
+    except IntegrityError:
+        # Another worker stored the same article (maybe under another URL) first
+        db.rollback()
+        existing = db.query(Quiz).filter(Quiz.canonical_key == new_quiz.canonical_key).first()
+        if existing is None:
+            raise
+        return existing
+    with span("commit"):
+        db.refresh(new_quiz)
+    cache_quiz(new_quiz)
+    index_quiz(db, new_quiz)
+    if vector is not None:
+        embedding_index.add(new_quiz.id, vector)
+    return new_quiz
+
+async def store_quiz_async(db: AsyncSession, new_quiz: Quiz) -> Quiz:
+    vector = new_quiz.embedding.vector if new_quiz.embedding is not None else None
+    db.add(new_quiz)
+    try:
+        with span("commit"):
+            await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        result = await db.execute(select(Quiz).where(Quiz.canonical_key == new_quiz.canonical_key))
+        existing = result.scalars().first()
+        if existing is None:
+            raise
+        return existing
+    with span("commit"):
+        await db.refresh(new_quiz)
+    cache_quiz(new_quiz)
+    await index_quiz_async(db, new_quiz)
+    if vector is not None:
+        embedding_index.add(new_quiz.id, vector)
+    return new_quiz
+
+async def store_quizzes_async(db: AsyncSession, quizzes) -> list:
+    """
+    store_quiz_async() for a batch, with one commit. If any article is already
+    stored (the commit fails on its canonical key), the batch is stored one
+    quiz at a time instead, so only the duplicates resolve to existing rows.
+    """
+    vectors = [q.embedding.vector if q.embedding is not None else None for q in quizzes]
+    db.add_all(quizzes)
+    try:
+        with span("commit"):
+            await db.commit()
+    except IntegrityError:
+        # The rollback returns the quizzes to transient, so they can be added again
+        await db.rollback()
+        stored = [await store_quiz_async(db, q) for q in quizzes]
+        # A later duplicate's rollback expired the quizzes stored before it
+        for q in stored:
+            await db.refresh(q)
+        return stored
+    with span("commit"):
+        for q in quizzes:
+            await db.refresh(q)
+    for q, vector in zip(quizzes, vectors):
+        cache_quiz(q)
+        if vector is not None:
+            embedding_index.add(q.id, vector)
+    await index_quizzes_async(db, quizzes)
+    return quizzes
+
+def generate_and_store(url_str: str, db: Session, key: str = None, cancelled=None) -> Quiz:
+    """cancelled: optional callable; when it returns True the quiz is not stored."""
+    # Step 1: Scrape
+    try:
+        scraped_data = scrape_wikipedia(url_str)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # An article we effectively already have a quiz for reuses its questions
+    source = find_near_duplicate(db, scraped_data)
+    if source is not None:
+        NEAR_DUPLICATES.inc("reused")
+        check_cancelled(cancelled)
+        return store_quiz(db, derive_quiz(url_str, scraped_data, source, key))
+    NEAR_DUPLICATES.inc("generated")
+
+    # Step 2: Generate Quiz (LLM)
+    try:
+        llm_output = generate_llm_output(scraped_data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM Generation Failed: {str(e)}")
+
+    # Step 3: Save to DB
+    check_cancelled(cancelled)
+    return store_quiz(db, build_quiz(url_str, scraped_data, llm_output, key))
+
+async def generate_and_store_async(url_str: str, db: AsyncSession, key: str = None) -> Quiz:
+    # Step 1: Scrape
+    try:
+        scraped_data = await scrape_wikipedia_async(url_str)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    source = await find_near_duplicate_async(db, scraped_data)
+    if source is not None:
+        NEAR_DUPLICATES.inc("reused")
+        return await store_quiz_async(db, derive_quiz(url_str, scraped_data, source, key))
+    NEAR_DUPLICATES.inc("generated")
+
+    # Step 2: Generate Quiz (LLM)
+    try:
+        llm_output = await generate_llm_output_async(scraped_data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM Generation Failed: {str(e)}")
+
+    # Step 3: Save to DB
+    return await store_quiz_async(db, build_quiz(url_str, scraped_data, llm_output, key))
+
+async def stream_generation(url_str: str, db: AsyncSession, existing_quiz: Quiz = None, key: str = None):
+    """
+    Async generator of (event, data) for the streaming endpoint: 'article',
+    one 'question' per question as the LLM produces it, 'related_topics',
+    then 'done' with the stored quiz id. Streams from a single LLM call over
+    the budgeted content (no map-reduce), since questions go out as they come.
+    """
+    if existing_quiz is not None:
+        yield "article", {"title": existing_quiz.title, "summary": existing_quiz.summary, "sections": existing_quiz.sections}
+        for question in quiz_questions(existing_quiz):
+            yield "question", question
+        yield "related_topics", quiz_topics(existing_quiz)
+        yield "done", {"id": existing_quiz.id, "url": existing_quiz.url, "created_at": existing_quiz.created_at}
+        return
+
+    try:
+        scraped_data = await scrape_wikipedia_async(url_str)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    yield "article", {"title": scraped_data["title"], "summary": scraped_data["summary"], "sections": scraped_data["sections"]}
+
+    source = await find_near_duplicate_async(db, scraped_data)
+    if source is not None:
+        NEAR_DUPLICATES.inc("reused")
+        new_quiz = await store_quiz_async(db, derive_quiz(url_str, scraped_data, source, key))
+        for question in quiz_questions(new_quiz):
+            yield "question", question
+        yield "related_topics", quiz_topics(new_quiz)
+        yield "done", {"id": new_quiz.id, "url": new_quiz.url, "created_at": new_quiz.created_at}
+        return
+    NEAR_DUPLICATES.inc("generated")
+
+    llm_output = None
+    try:
+        async for kind, payload in stream_quiz_from_text(select_content(scraped_data)):
+            if kind == "question":
+                yield "question", format_question(payload)
+            else:
+                llm_output = payload
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM Generation Failed: {str(e)}")
+
+    new_quiz = await store_quiz_async(db, build_quiz(url_str, scraped_data, llm_output, key))
+    yield "related_topics", quiz_topics(new_quiz)
+    yield "done", {"id": new_quiz.id, "url": new_quiz.url, "created_at": new_quiz.created_at}
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .pool_metrics import LatencyHistogram
+from .ratelimit import HostRateLimiter
+from .telemetry import span
+
+# Shared outbound HTTP clients for talking to Wikipedia: pooled keep-alive
+# connections, connect/read timeouts, retries with exponential backoff on
+# 429/5xx (honouring Retry-After), a token bucket per host, and per-host
+# latency/size stats (exposed on /api/diagnostics/http).
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_RATE_PER_HOST = float(os.getenv("HTTP_RATE_PER_HOST", "10"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+rate_limiter = HostRateLimiter(HTTP_RATE_PER_HOST, burst=max(int(HTTP_RATE_PER_HOST), 1))
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.latency = LatencyHistogram()
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(url: str, elapsed: float, status=None, size: int = 0, retried: bool = False, error: bool = False):
+    host = (urlsplit(url).hostname or "").lower()
+    with _stats_lock:
+        stats = _stats.setdefault(host, HostStats())
+        stats.requests += 1
+        stats.retries += int(retried)
+        stats.errors += int(error)
+        stats.bytes += size
+        if status is not None:
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+    stats.latency.observe(elapsed * 1000)
+
+
+def stats_snapshot():
+    with _stats_lock:
+        return {
+            host: {
+                "requests": s.requests,
+                "retries": s.retries,
+                "errors": s.errors,
+                "bytes": s.bytes,
+                "statuses": dict(s.statuses),
+                "latency": s.latency.snapshot(),
+            }
+            for host, s in _stats.items()
+        }
+
+
+def retry_delay(attempt: int, retry_after=None) -> float:
+    """Seconds to wait before retry number `attempt` (0-based)."""
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            try:
+                wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(max(wait, 0.0), HTTP_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+# Sync (requests)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def http_get(url: str, headers=None, params=None) -> requests.Response:
+    """GET with pooling, timeouts, rate limiting and retries. Returns the last response."""
+    with span("fetch"):
+        return _http_get(url, headers, params)
+
+
+def _http_get(url, headers, params):
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        rate_limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            response = get_session().get(
+                url, headers=headers, params=params,
+                timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            record(url, time.perf_counter() - start, retried=attempt > 0, error=True)
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+            time.sleep(retry_delay(attempt))
+            continue
+
+        record(url, time.perf_counter() - start, response.status_code, len(response.content), retried=attempt > 0)
+        if response.status_code not in RETRY_STATUSES or attempt == HTTP_MAX_RETRIES:
+            return response
+        time.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
+
+
+# Async (httpx)
+
+_async_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        )
+    return _async_client
+
+
+async def http_get_async(url: str, headers=None, params=None) -> httpx.Response:
+    with span("fetch"):
+        return await _http_get_async(url, headers, params)
+
+
+async def _http_get_async(url, headers, params):
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        await rate_limiter.acquire_async(url)
+        start = time.perf_counter()
+        try:
+            response = await get_async_client().get(url, headers=headers, params=params)
+        except httpx.TransportError:
+            record(url, time.perf_counter() - start, retried=attempt > 0, error=True)
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+
+        record(url, time.perf_counter() - start, response.status_code, len(response.content), retried=attempt > 0)
+        if response.status_code not in RETRY_STATUSES or attempt == HTTP_MAX_RETRIES:
+            return response
+        await asyncio.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
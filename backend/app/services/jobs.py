@@ -0,0 +1,400 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import GenerationJob, Quiz
+from .generation import generate_and_store, GenerationCancelled
+from .canonical import canonical_key, find_quiz
+from .telemetry import start_trace, finish_trace
+
+# Persisted job queue for quiz generation. Jobs live in the generation_jobs
+# table so any process can enqueue and any worker process can claim them.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "5000"))
+# A running job holds a lease that its worker renews every JOB_HEARTBEAT_INTERVAL.
+# When the worker dies, the lease runs out after JOB_LEASE_SECONDS and the job
+# counts as stale: it no longer blocks its URL and is put back on the queue.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+
+# Workers claim the highest priority first. Prefetch jobs only run while no
+# other work is waiting (see services/prefetch.py) and don't count towards
+# JOB_QUEUE_DEPTH.
+PRIORITY_USER = 100
+PRIORITY_BATCH = 50
+PRIORITY_PREFETCH = 0
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+def lease_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def is_active():
+    """Filter for queued jobs and running jobs whose lease hasn't run out."""
+    return or_(
+        GenerationJob.status == "queued",
+        (GenerationJob.status == "running") & (GenerationJob.heartbeat_at >= lease_cutoff()),
+    )
+
+
+def active_job(db: Session, url_str: str):
+    return db.query(GenerationJob).filter(GenerationJob.url == url_str, is_active()).first()
+
+
+def enqueue_job(db: Session, url_str: str) -> GenerationJob:
+    # A stale job for this URL goes back on the queue and is reused below
+    recover_stale_jobs(db, url_str)
+    # Reuse an active job for the same URL instead of queueing a duplicate
+    active = active_job(db, url_str)
+    if active:
+        if active.status == "queued" and active.priority < PRIORITY_USER:
+            # A user now wants what was queued as batch or prefetch work,
+            # including the retries a prefetch job doesn't get
+            active.priority = PRIORITY_USER
+            active.max_attempts = max(active.max_attempts, JOB_MAX_ATTEMPTS)
+            db.commit()
+            db.refresh(active)
+        return active
+
+    # Plain key only; redirects are resolved when the job runs
+    existing_quiz, _ = find_quiz(db, url_str, resolve=False)
+    if existing_quiz:
+        job = GenerationJob(url=url_str, status="succeeded", quiz_id=existing_quiz.id)
+    else:
+        # Backpressure: refuse new work instead of letting the queue grow unbounded
+        depth = db.query(func.count(GenerationJob.id)).filter(
+            GenerationJob.status == "queued", GenerationJob.priority > PRIORITY_PREFETCH
+        ).scalar()
+        if depth >= JOB_QUEUE_DEPTH:
+            raise HTTPException(
+                status_code=503,
+                detail="Generation queue is full, try again later",
+                headers={"Retry-After": "30"},
+            )
+        job = GenerationJob(url=url_str, status="queued", max_attempts=JOB_MAX_ATTEMPTS, priority=PRIORITY_USER)
+
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def enqueue_prefetch(db: Session, url_str: str, max_queued: int):
+    """Queue a speculative generation; None if it's already stored, queued, or the prefetch backlog is full."""
+    if active_job(db, url_str) or find_quiz(db, url_str, resolve=False)[0]:
+        return None
+    backlog = db.query(func.count(GenerationJob.id)).filter(
+        GenerationJob.status == "queued", GenerationJob.priority <= PRIORITY_PREFETCH
+    ).scalar()
+    if backlog >= max_queued:
+        return None
+    # One attempt: a failed guess isn't worth retrying
+    job = GenerationJob(url=url_str, status="queued", max_attempts=1, priority=PRIORITY_PREFETCH)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def existing_urls(db: Session, model, urls, chunk_size: int = 500):
+    """
+    The subset of urls that already have a row in model's table (queried in
+    chunks). Quizzes match by canonical key, so any URL variant counts.
+    """
+    found = set()
+    urls = list(urls)
+    for i in range(0, len(urls), chunk_size):
+        chunk = urls[i:i + chunk_size]
+        if model is Quiz:
+            by_key = {}
+            for url in chunk:
+                by_key.setdefault(canonical_key(url), []).append(url)
+            query = db.query(Quiz.canonical_key, Quiz.url).filter(
+                or_(Quiz.canonical_key.in_(list(by_key)), Quiz.url.in_(chunk))
+            )
+            for row in query:
+                found.update(by_key.get(row.canonical_key, []))
+                if row.url in chunk:
+                    found.add(row.url)
+            continue
+        query = db.query(model.url).filter(model.url.in_(chunk))
+        if model is GenerationJob:
+            query = query.filter(is_active())
+        found.update(row.url for row in query)
+    return found
+
+
+def enqueue_batch(db: Session, url_strs):
+    """
+    Queue many URLs at once. Duplicates within the batch, URLs that already
+    have a quiz and URLs already queued are skipped; the rest are inserted in
+    one bulk INSERT tagged with a batch id for progress reporting.
+    """
+    if len(url_strs) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_URLS} URLs per batch")
+
+    unique = list(dict.fromkeys(url_strs))
+    recover_stale_jobs(db)
+    done = existing_urls(db, Quiz, unique)
+    active = existing_urls(db, GenerationJob, unique)
+    to_queue = [u for u in unique if u not in done and u not in active]
+
+    batch_id = uuid.uuid4().hex
+    if to_queue:
+        db.execute(insert(GenerationJob), [
+            {"url": u, "batch_id": batch_id, "status": "queued", "attempts": 0, "max_attempts": JOB_MAX_ATTEMPTS,
+             "priority": PRIORITY_BATCH}
+            for u in to_queue
+        ])
+        db.commit()
+
+    return {
+        "batch_id": batch_id,
+        "queued": len(to_queue),
+        "existing": len(done | active),
+        "duplicates": len(url_strs) - len(unique),
+    }
+
+
+def batch_status(db: Session, batch_id: str):
+    rows = (
+        db.query(GenerationJob.status, func.count(GenerationJob.id))
+        .filter(GenerationJob.batch_id == batch_id)
+        .group_by(GenerationJob.status)
+        .all()
+    )
+    counts = {status: n for status, n in rows}
+    return {
+        "batch_id": batch_id,
+        "total": sum(counts.values()),
+        "counts": counts,
+        "done": not any(counts.get(s) for s in ACTIVE_STATUSES),
+    }
+
+
+def job_cancelled(db: Session, job_id: int) -> bool:
+    return db.query(GenerationJob.status).filter(GenerationJob.id == job_id).scalar() == "cancelled"
+
+
+def cancel_job(db: Session, job: GenerationJob) -> GenerationJob:
+    # A running job can't be interrupted mid-LLM call; marking it cancelled
+    # makes the worker skip storing the quiz (checked right before the save)
+    # and discard the outcome when it finishes.
+    if job.status in ACTIVE_STATUSES:
+        job.status = "cancelled"
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+def retry_job(db: Session, job: GenerationJob) -> GenerationJob:
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Cannot retry a job that is {job.status}")
+    job.status = "queued"
+    job.attempts = 0
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, include_prefetch: bool = True):
+    """(job id, priority) of the highest-priority queued job, now marked running; None if there is none."""
+    # SKIP LOCKED lets several workers poll the same table without handing out
+    # a job twice (PostgreSQL; ignored on SQLite, which serializes writers anyway)
+    query = db.query(GenerationJob).filter(GenerationJob.status == "queued")
+    if not include_prefetch:
+        query = query.filter(GenerationJob.priority > PRIORITY_PREFETCH)
+    job = (
+        query
+        .order_by(GenerationJob.priority.desc(), GenerationJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+    job.status = "running"
+    job.attempts += 1
+    job.heartbeat_at = datetime.now(timezone.utc)
+    db.commit()
+    return job.id, job.priority
+
+
+def run_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(GenerationJob, job_id)
+        trace = start_trace()
+        existing_quiz = None
+        url = job.url
+        try:
+            existing_quiz, key = find_quiz(db, url)
+            quiz = existing_quiz or generate_and_store(url, db, key, cancelled=lambda: job_cancelled(db, job_id))
+            quiz_id, error = quiz.id, None
+        except GenerationCancelled:
+            db.rollback()
+            quiz_id, error = None, "Cancelled"
+        except Exception as e:
+            # A failed statement leaves the session unusable until rolled back
+            db.rollback()
+            quiz_id, error = None, getattr(e, "detail", None) or str(e)
+        finish_trace(trace, "job", job_id=job_id, url=url, error=error)
+
+        try:
+            record_outcome(db, job, existing_quiz, quiz_id, error)
+        except Exception as e:
+            # Still 'running': once the heartbeat stops, the lease runs out and
+            # recover_stale_jobs puts it back on the queue
+            db.rollback()
+            print(f"Could not record the outcome of job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def record_outcome(db: Session, job: GenerationJob, existing_quiz, quiz_id, error):
+    db.refresh(job)
+    if job.status == "cancelled":
+        return
+    if job.priority <= PRIORITY_PREFETCH and existing_quiz is not None:
+        # Someone generated it first; not a prefetch (keeps the hit rate honest)
+        job.status = "cancelled"
+        job.error = "Already stored"
+        db.commit()
+        return
+    if error is None:
+        job.status = "succeeded"
+        job.quiz_id = quiz_id
+        job.error = None
+    elif job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.error = error
+    else:
+        job.status = "failed"
+        job.error = error
+    db.commit()
+
+
+class JobWorkerPool:
+    """
+    Fixed number of threads that claim and run queued jobs until stopped.
+    Prefetch jobs are only claimed when prefetcher.may_run(db) allows it.
+    One more thread renews the leases of the jobs this pool is running and
+    requeues stale jobs left by workers that died (also once at start).
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL, prefetcher=None,
+                 heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.prefetcher = prefetcher
+        self.heartbeat_interval = heartbeat_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = set() # job ids claimed by this pool
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.workers <= 0:
+            return
+        self.heartbeat()
+        thread = threading.Thread(target=self._heartbeat_loop, name="quiz-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"quiz-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                include_prefetch = self.prefetcher is not None and self.prefetcher.may_run(db)
+                claimed = claim_next_job(db, include_prefetch)
+            except Exception as e:
+                print(f"Job claim failed: {e}")
+                claimed = None
+            finally:
+                db.close()
+
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            job_id, priority = claimed
+            if priority <= PRIORITY_PREFETCH:
+                self.prefetcher.started()
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                run_job(job_id)
+            except Exception as e:
+                print(f"Job {job_id} crashed: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def heartbeat(self):
+        with self._lock:
+            running = list(self._running)
+        db = SessionLocal()
+        try:
+            if running:
+                db.query(GenerationJob).filter(
+                    GenerationJob.id.in_(running), GenerationJob.status == "running"
+                ).update({GenerationJob.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False)
+                db.commit()
+            recover_stale_jobs(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Job heartbeat failed: {e}")
+        finally:
+            db.close()
+
+
+def recover_stale_jobs(db: Session, url_str: str = None, force: bool = False) -> int:
+    """
+    Put running jobs whose lease ran out (all running jobs with force=True)
+    back on the queue, or mark them failed once they have used up their
+    attempts. Returns how many were recovered.
+    """
+    query = db.query(GenerationJob).filter(GenerationJob.status == "running")
+    if url_str is not None:
+        query = query.filter(GenerationJob.url == url_str)
+    if not force:
+        query = query.filter(or_(GenerationJob.heartbeat_at.is_(None), GenerationJob.heartbeat_at < lease_cutoff()))
+    stale = query.with_for_update(skip_locked=True).all()
+    for job in stale:
+        if job.attempts < job.max_attempts:
+            job.status = "queued"
+        else:
+            # A job that keeps taking its worker down shouldn't loop forever
+            job.status = "failed"
+            job.error = "Worker stopped while running the job"
+        job.heartbeat_at = None
+    if stale:
+        print(f"Recovered {len(stale)} stale generation job(s)")
+    db.commit()
+    return len(stale)
@@ -1,13 +1,23 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
 from typing import List
 from pydantic import BaseModel, Field
 import os
+import threading
 from dotenv import load_dotenv
 
+from .model_router import ModelRouter, AllModelsFailed, classify_error
+from .streaming import QuizStreamParser
+from .repair import (
+    repair_output, normalize_question, min_questions, OutputRepairFailed,
+    REPAIR_OUTCOMES, REGENERATIONS_AVOIDED,
+)
+from .telemetry import span, record_tokens, record_fallback
+
 load_dotenv()
 
+# LangChain and the Google GenAI client take over a second to import, so they
+# are imported on first use (the first generation, or warm_up() at startup)
+# rather than with this module; health checks and stored-quiz reads don't need them.
+
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 if not GOOGLE_API_KEY:
@@ -32,22 +42,27 @@ class QuizOutputLLM(BaseModel):
     quiz: List[QuizQuestionLLM] = Field(description="List of 5-10 quiz questions")
     related_topics: List[str] = Field(description="List of 3-5 related Wikipedia topics")
 
-def generate_quiz_from_text(text: str):
-    if not GOOGLE_API_KEY:
-         raise Exception("GOOGLE_API_KEY is not set.")
+MODELS_TO_TRY = [
+    "gemini-1.5-flash-latest",
+    "gemini-2.0-flash",
+    "gemini-1.5-flash", 
+    "gemini-1.5-flash-001",
+    "gemini-1.5-pro",
+    "gemini-1.0-pro", 
+    "gemini-pro"
+]
 
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-001", google_api_key=GOOGLE_API_KEY, temperature=0.7)
-    
-    parser = PydanticOutputParser(pydantic_object=QuizOutputLLM)
+def build_prompt(parser):
+    from langchain_core.prompts import PromptTemplate
 
-    prompt = PromptTemplate(
+    return PromptTemplate(
         template="""You are an expert quiz generator. based on the following Wikipedia article content.
         
         Article Content:
         {text}
 
         Generate a quiz with the following requirements:
-        1. Create 5 to 10 multiple-choice questions.
+        1. Create {question_count} multiple-choice questions.
         2. Questions must be strictly grounded in the provided text.
         3. Do not hallucinate facts.
         4. Include a mix of difficulty levels (easy, medium, hard).
@@ -56,41 +71,305 @@ def generate_quiz_from_text(text: str):
         
         {format_instructions}
         """,
-        input_variables=["text"],
+        input_variables=["text", "question_count"],
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+
+def build_reask_prompt(parser):
+    # Follow-up when too few usable questions survived repair; asks only for the missing ones
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate(
+        template="""You are an expert quiz generator. based on the following Wikipedia article content.
+
+        Article Content:
+        {text}
+
+        The quiz already has these questions:
+        {existing}
+
+        Write {count} more multiple-choice questions about other facts from the text.
+        Each needs four distinct options A-D, the correct letter as the answer, a difficulty
+        (easy, medium or hard) and a short explanation grounded in the text.
+        Leave related_topics empty.
+
+        {format_instructions}
+        """,
+        input_variables=["text", "existing", "count"],
         partial_variables={"format_instructions": parser.get_format_instructions()}
     )
 
-    models_to_try = [
-        "gemini-1.5-flash-latest",
-        "gemini-2.0-flash",
-        "gemini-1.5-flash", 
-        "gemini-1.5-flash-001",
-        "gemini-1.5-pro",
-        "gemini-1.0-pro", 
-        "gemini-pro"
-    ]
+def make_parser():
+    from langchain_core.output_parsers import PydanticOutputParser
+
+    return PydanticOutputParser(pydantic_object=QuizOutputLLM)
+
+def make_chat_model(model_name: str):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # Force v1 API version
+    return ChatGoogleGenerativeAI(
+        model=model_name, 
+        google_api_key=GOOGLE_API_KEY, 
+        temperature=0.7,
+        convert_system_message_to_human=True
+    )
+
+class LLMRegistry:
+    """
+    Long-lived prompt | model | parser chains, one per model name, built on
+    first use and shared by all requests (and threads). Reusing the model
+    client keeps its HTTP connections alive instead of reconnecting per quiz.
+    """
+
+    def __init__(self, factory=make_chat_model):
+        self._factory = factory
+        self._chains = {}
+        # Reentrant: building a chain looks up (and may build) its model
+        self._lock = threading.RLock()
+
+    def _get(self, key, build):
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = build()
+                    self._chains[key] = chain
+        return chain
+
+    # Built on first use like the chains; format instructions are rendered
+    # once, not per request
+
+    @property
+    def parser(self):
+        return self._get(("parser",), make_parser)
+
+    @property
+    def prompt(self):
+        return self._get(("prompt",), lambda: build_prompt(self.parser))
+
+    @property
+    def reask_prompt(self):
+        return self._get(("reask_prompt",), lambda: build_reask_prompt(self.parser))
+
+    def get_model(self, model_name: str):
+        return self._get(("model", model_name), lambda: self._factory(model_name))
+
+    def get_chain(self, model_name: str):
+        return self._get(("parsed", model_name), lambda: self.prompt | self.get_model(model_name) | self.parser)
+
+    def get_stream_chain(self, model_name: str):
+        """prompt | model without the parser, for consuming the raw token stream."""
+        return self._get(("raw", model_name), lambda: self.prompt | self.get_model(model_name))
+
+    def warm_up(self):
+        """Import the LangChain stack and build the prompts ahead of the first generation."""
+        import langchain_google_genai # noqa: F401
+        return self.prompt, self.reask_prompt
 
+    def clear(self):
+        with self._lock:
+            self._chains.clear()
+
+llm_registry = LLMRegistry()
+# Health-aware ordering over MODELS_TO_TRY; see model_router.py
+model_router = ModelRouter(MODELS_TO_TRY)
+
+def usage_tokens(message):
+    """(input, output) token counts reported with a model response, if any."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (getattr(message, "response_metadata", None) or {}).get("usage_metadata") or {}
+    return usage.get("prompt_token_count"), usage.get("candidates_token_count")
+
+# Output handling: instead of failing the whole answer (and re-running the
+# full prompt on the next model) when the strict parser rejects it, the answer
+# is repaired question by question (see repair.py). Only when fewer than the
+# requested minimum survive is the same model asked for just the missing ones.
+
+def parse_answer(text: str):
+    """(repaired question dicts, related topics, whether the text needed no repair at all)."""
+    questions, topics, dropped = repair_output(text)
+    try:
+        # The strict parser also passes "Option B" answers through; those count as repaired
+        strict = llm_registry.parser.parse(text)
+        strict_ok = [q.model_dump() for q in strict.quiz] == questions
+    except Exception:
+        strict_ok = False
+    if dropped:
+        print(f"Dropped malformed questions from model output: {dropped}")
+    return questions, topics, strict_ok
+
+def finish_output(questions, topics, strict_ok: bool, reasked: bool, minimum: int) -> QuizOutputLLM:
+    if len(questions) < minimum:
+        REPAIR_OUTCOMES.inc("failed")
+        # "Failed to parse" makes the router classify this as a parse error
+        raise OutputRepairFailed(f"Failed to parse model output: {len(questions)} usable questions, {minimum} needed")
+    REPAIR_OUTCOMES.inc("reasked" if reasked else "clean" if strict_ok else "repaired")
+    if not strict_ok:
+        REGENERATIONS_AVOIDED.inc()
+    return QuizOutputLLM(quiz=[QuizQuestionLLM(**q) for q in questions], related_topics=topics)
+
+def reask_prompt_value(inputs, questions, count: int):
+    with span("prompt"):
+        return llm_registry.reask_prompt.format_prompt(
+            text=inputs["text"],
+            existing="\n".join(f"- {q['question']}" for q in questions),
+            count=count,
+        )
+
+def new_questions(text: str, questions, count: int):
+    extra, _, _ = repair_output(text)
+    seen = {q["question"].lower() for q in questions}
+    return [q for q in extra if q["question"].lower() not in seen][:count]
+
+def reask(model_name: str, inputs, questions, count: int):
+    """Up to count more valid questions from the same model; [] if the re-ask fails."""
+    try:
+        with span("reask"):
+            message = llm_registry.get_model(model_name).invoke(reask_prompt_value(inputs, questions, count))
+        record_tokens(model_name, *usage_tokens(message))
+        with span("output_parse"):
+            return new_questions(message_text(message), questions, count)
+    except Exception as e:
+        print(f"Re-ask on {model_name} failed: {e}")
+        return []
+
+async def areask(model_name: str, inputs, questions, count: int):
+    try:
+        with span("reask"):
+            message = await llm_registry.get_model(model_name).ainvoke(reask_prompt_value(inputs, questions, count))
+        record_tokens(model_name, *usage_tokens(message))
+        with span("output_parse"):
+            return new_questions(message_text(message), questions, count)
+    except Exception as e:
+        print(f"Re-ask on {model_name} failed: {e}")
+        return []
+
+# The prompt | model | parser steps of get_chain(), run one at a time so each
+# gets its own span (prompt, llm, output_parse)
+
+def invoke_model(model_name: str, inputs):
+    with span("prompt"):
+        prompt_value = llm_registry.prompt.format_prompt(**inputs)
+    with span("llm"):
+        message = llm_registry.get_model(model_name).invoke(prompt_value)
+    record_tokens(model_name, *usage_tokens(message))
+    with span("output_parse"):
+        questions, topics, strict_ok = parse_answer(message_text(message))
+
+    minimum = min_questions(inputs["question_count"])
+    reasked = bool(questions) and len(questions) < minimum
+    if reasked:
+        questions += reask(model_name, inputs, questions, minimum - len(questions))
+    return finish_output(questions, topics, strict_ok, reasked, minimum)
+
+async def ainvoke_model(model_name: str, inputs):
+    with span("prompt"):
+        prompt_value = llm_registry.prompt.format_prompt(**inputs)
+    with span("llm"):
+        message = await llm_registry.get_model(model_name).ainvoke(prompt_value)
+    record_tokens(model_name, *usage_tokens(message))
+    with span("output_parse"):
+        questions, topics, strict_ok = parse_answer(message_text(message))
+
+    minimum = min_questions(inputs["question_count"])
+    reasked = bool(questions) and len(questions) < minimum
+    if reasked:
+        questions += await areask(model_name, inputs, questions, minimum - len(questions))
+    return finish_output(questions, topics, strict_ok, reasked, minimum)
+
+def generate_quiz_from_text(text: str, question_count: str = "5 to 10", models=None):
+    if not GOOGLE_API_KEY:
+         raise Exception("GOOGLE_API_KEY is not set.")
+
+    inputs = {"text": text, "question_count": question_count}
+    return model_router.run(lambda model_name: invoke_model(model_name, inputs), models)
+
+async def generate_quiz_from_text_async(text: str, question_count: str = "5 to 10", models=None):
+    """Same routing as generate_quiz_from_text, but awaits ainvoke so the event loop stays free."""
+    if not GOOGLE_API_KEY:
+         raise Exception("GOOGLE_API_KEY is not set.")
+
+    inputs = {"text": text, "question_count": question_count}
+    return await model_router.run_async(lambda model_name: ainvoke_model(model_name, inputs), models)
+
+def message_text(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # Some providers stream a list of content parts
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+async def stream_quiz_from_text(text: str, question_count: str = "5 to 10"):
+    """
+    Async generator: yields ("question", QuizQuestionLLM) as soon as each
+    question object is complete in the model's token stream, then
+    ("result", QuizOutputLLM). Falls back to the next model only while
+    nothing has been yielded yet.
+    """
+    if not GOOGLE_API_KEY:
+         raise Exception("GOOGLE_API_KEY is not set.")
+
+    inputs = {"text": text, "question_count": question_count}
+    candidates = model_router.candidates()
     errors = []
-    
-    for model_name in models_to_try:
-        try:
-            print(f"Attr: Trying model {model_name}...")
-            # Re-initialize LLM with potential model
-            # Force v1 API version
-            llm = ChatGoogleGenerativeAI(
-                model=model_name, 
-                google_api_key=GOOGLE_API_KEY, 
-                temperature=0.7,
-                convert_system_message_to_human=True
-            )
-            chain = prompt | llm | parser
-            result = chain.invoke({"text": text})
-            return result
-        except Exception as e:
-            print(f"Model {model_name} failed: {e}")
-            errors.append(f"{model_name}: {str(e)}")
-            continue
-            
-    error_msg = "All models failed. Details: " + " | ".join(errors)
-    print(error_msg)
-    raise Exception(error_msg)
+    pending = None # picked model with no success or failure recorded yet
+
+    try:
+        while candidates:
+            model_name = pending = candidates.pop(0)
+            stream_parser = QuizStreamParser()
+            emitted = [] # question dicts the client has been sent
+            tokens = [0, 0]
+            start = model_router.clock()
+            try:
+                with span("llm"):
+                    async for chunk in llm_registry.get_stream_chain(model_name).astream(inputs):
+                        for i, count in enumerate(usage_tokens(chunk)):
+                            tokens[i] += count or 0
+                        for raw in stream_parser.feed(message_text(chunk)):
+                            question, _ = normalize_question(raw)
+                            if question is None:
+                                continue # counted when the full answer is repaired
+                            emitted.append(question)
+                            yield "question", QuizQuestionLLM(**question)
+                record_tokens(model_name, *tokens)
+                with span("output_parse"):
+                    questions, topics, strict_ok = parse_answer(stream_parser.text)
+                if emitted:
+                    # Store exactly what the client was shown, even if the tail is broken
+                    questions = list(emitted)
+
+                minimum = min_questions(question_count)
+                reasked = bool(questions) and len(questions) < minimum
+                if reasked:
+                    for question in await areask(model_name, inputs, questions, minimum - len(questions)):
+                        questions.append(question)
+                        emitted.append(question)
+                        yield "question", QuizQuestionLLM(**question)
+                result = finish_output(questions, topics, strict_ok, reasked, minimum)
+            except Exception as e:
+                model_router.record_failure(model_name, e)
+                pending = None
+                if emitted:
+                    raise
+                if candidates:
+                    record_fallback(model_name, classify_error(e))
+                errors.append(f"{model_name}: {str(e)}")
+                continue
+
+            model_router.record_success(model_name, model_router.clock() - start)
+            pending = None
+            yield "result", result
+            return
+    finally:
+        # A client disconnect raises GeneratorExit/CancelledError at a yield,
+        # which skips record_*: free a half-open probe slot it may hold
+        if pending is not None:
+            candidates.append(pending)
+        model_router.release_unused(candidates)
+
+    raise AllModelsFailed("All models failed. Details: " + " | ".join(errors))
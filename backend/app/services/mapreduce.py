@@ -0,0 +1,180 @@
+import asyncio
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .chunking import plan_parts, count_tokens, LLM_CONTEXT_TOKEN_BUDGET
+from .llm import QuizOutputLLM, generate_quiz_from_text, generate_quiz_from_text_async, model_router
+from .model_router import AllModelsFailed
+
+# Map-reduce generation for long articles: each part of the article gets its
+# own, smaller LLM call (run concurrently), and the per-part questions are
+# merged into one quiz. Wall-clock time follows the slowest part rather than
+# one call over the whole article. All parts try the same models in the same
+# order, and once one part has exhausted them the parts not finished yet are
+# dropped, instead of each part walking the whole fallback list again. A
+# recovering (half-open) model is probed by one part only; the others skip it.
+
+LLM_MAP_REDUCE = os.getenv("LLM_MAP_REDUCE", "true").lower() in ("1", "true", "yes")
+LLM_MAP_PART_TOKENS = int(os.getenv("LLM_MAP_PART_TOKENS", "2000"))
+LLM_MAP_MAX_PARTS = int(os.getenv("LLM_MAP_MAX_PARTS", "5"))
+LLM_MAP_CONCURRENCY = int(os.getenv("LLM_MAP_CONCURRENCY", "4"))
+
+MIN_QUESTIONS = 5
+MAX_QUESTIONS = 10
+MAX_RELATED_TOPICS = 5
+DUPLICATE_SIMILARITY = 0.6
+DIFFICULTIES = ("easy", "medium", "hard")
+
+WORD_RE = re.compile(r"\w+")
+
+
+class NotEnoughQuestions(Exception):
+    pass
+
+
+def plan_map_parts(scraped_data):
+    """Article parts to fan out over, or [] when a single call is the better choice."""
+    if not LLM_MAP_REDUCE:
+        return []
+    parts = plan_parts(scraped_data, LLM_MAP_PART_TOKENS, LLM_MAP_MAX_PARTS)
+    # Articles that fit one call's budget gain nothing from fanning out
+    if len(parts) < 2 or sum(count_tokens(p) for p in parts) <= LLM_CONTEXT_TOKEN_BUDGET:
+        return []
+    return parts
+
+
+def questions_per_part(n_parts: int) -> str:
+    # Ask for a little more than the share each part needs, so dedupe and
+    # difficulty balancing have something to choose from
+    share = max(2, -(-MAX_QUESTIONS // n_parts))
+    return f"{share} to {share + 1}"
+
+
+def _word_set(text: str):
+    return set(WORD_RE.findall(text.lower()))
+
+
+def is_near_duplicate(a, b) -> bool:
+    words_a, words_b = _word_set(a.question), _word_set(b.question)
+    if not words_a or not words_b:
+        return False
+    return len(words_a & words_b) / len(words_a | words_b) >= DUPLICATE_SIMILARITY
+
+
+def dedupe_questions(questions):
+    unique = []
+    for q in questions:
+        if not any(is_near_duplicate(q, kept) for kept in unique):
+            unique.append(q)
+    return unique
+
+
+def balance_difficulty(questions, limit: int = MAX_QUESTIONS):
+    """Round-robin across easy/medium/hard (keeping each part's order) up to limit."""
+    buckets = {d: [] for d in DIFFICULTIES}
+    other = []
+    for q in questions:
+        buckets.get(q.difficulty.strip().lower(), other).append(q)
+
+    ordered = []
+    while len(ordered) < limit and any(buckets.values()):
+        for d in DIFFICULTIES:
+            if buckets[d] and len(ordered) < limit:
+                ordered.append(buckets[d].pop(0))
+    for q in other:
+        if len(ordered) >= limit:
+            break
+        ordered.append(q)
+    return ordered
+
+
+def merge_outputs(outputs) -> QuizOutputLLM:
+    # Interleave parts so early sections don't crowd out later ones after dedupe
+    interleaved = []
+    queues = [list(o.quiz) for o in outputs]
+    while any(queues):
+        for queue in queues:
+            if queue:
+                interleaved.append(queue.pop(0))
+
+    questions = balance_difficulty(dedupe_questions(interleaved))
+    if len(questions) < MIN_QUESTIONS:
+        raise NotEnoughQuestions(f"Only {len(questions)} distinct questions from {len(outputs)} parts")
+
+    topic_counts = Counter()
+    display = {}
+    for o in outputs:
+        for topic in o.related_topics:
+            key = topic.strip().lower()
+            topic_counts[key] += 1
+            display.setdefault(key, topic.strip())
+    related_topics = [display[k] for k, _ in topic_counts.most_common(MAX_RELATED_TOPICS)]
+
+    return QuizOutputLLM(quiz=questions, related_topics=related_topics)
+
+
+def _collect(results):
+    # gather(return_exceptions=True) also returns CancelledError, a BaseException
+    outputs = [r for r in results if not isinstance(r, BaseException)]
+    if not outputs:
+        errors = [r for r in results if not isinstance(r, asyncio.CancelledError)]
+        raise (errors or results)[0]
+    return merge_outputs(outputs)
+
+
+def _candidates():
+    models = model_router.candidates()
+    if not models:
+        raise AllModelsFailed("All models are unavailable (circuit breakers open)")
+    return models
+
+
+def generate_quiz_map_reduce(parts) -> QuizOutputLLM:
+    question_count = questions_per_part(len(parts))
+    models = _candidates()
+    exhausted = threading.Event()
+
+    def run(part):
+        if exhausted.is_set():
+            return AllModelsFailed("Skipped: another part already exhausted every model")
+        try:
+            return generate_quiz_from_text(part, question_count, models)
+        except AllModelsFailed as e:
+            exhausted.set()
+            return e
+        except Exception as e:
+            return e
+
+    try:
+        with ThreadPoolExecutor(max_workers=LLM_MAP_CONCURRENCY) as pool:
+            results = list(pool.map(run, parts))
+    finally:
+        model_router.release_unused(models)
+    return _collect(results)
+
+
+async def generate_quiz_map_reduce_async(parts) -> QuizOutputLLM:
+    question_count = questions_per_part(len(parts))
+    semaphore = asyncio.Semaphore(LLM_MAP_CONCURRENCY)
+    models = _candidates()
+    tasks = []
+
+    async def run(part):
+        async with semaphore:
+            try:
+                return await generate_quiz_from_text_async(part, question_count, models)
+            except AllModelsFailed:
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                raise
+
+    tasks.extend(asyncio.ensure_future(run(p)) for p in parts)
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        model_router.release_unused(models)
+    return _collect(results)
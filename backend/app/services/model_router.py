@@ -0,0 +1,350 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .telemetry import record_fallback
+
+# Chooses which Gemini model to call. Each model has a circuit breaker: after
+# repeated failures it is "open" and skipped until its cooldown passes, then a
+# single "half-open" probe decides whether it closes again. This replaces
+# walking the whole fallback list (and waiting on dead models) on every request.
+# Optionally hedges: if the first model hasn't answered by its p95 latency, the
+# next healthy model is started too and the first success wins.
+
+ROUTER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))
+ROUTER_COOLDOWN = float(os.getenv("ROUTER_COOLDOWN", "30"))
+# Models that are gone or unauthorized won't recover in seconds
+ROUTER_HARD_COOLDOWN = float(os.getenv("ROUTER_HARD_COOLDOWN", "600"))
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "false").lower() in ("1", "true", "yes")
+ROUTER_HEDGE_MIN_SAMPLES = int(os.getenv("ROUTER_HEDGE_MIN_SAMPLES", "20"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+HARD_ERRORS = ("not_found", "auth")
+
+
+def classify_error(e: Exception) -> str:
+    name = type(e).__name__
+    message = str(e).lower()
+    if name == "OutputParserException" or "failed to parse" in message:
+        return "parse"
+    if "429" in message or "quota" in message or "resourceexhausted" in name.lower() or "rate limit" in message:
+        return "rate_limited"
+    if "404" in message or "not found" in message or "is not supported" in message:
+        return "not_found"
+    if "401" in message or "403" in message or "api key" in message or "permission" in message:
+        return "auth"
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)) or "timeout" in message or "deadline" in message:
+        return "timeout"
+    return "other"
+
+
+def drop_shared(models, name: str, e: Exception):
+    # Parse errors are about one input, not the model
+    if models is not None and classify_error(e) != "parse":
+        try:
+            models.remove(name)
+        except ValueError:
+            pass
+
+
+class ModelHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.cooldown = ROUTER_COOLDOWN
+        self.probe_in_flight = False
+        self.probe_claimed = False # the probe slot went to one call of a shared list
+        self.successes = 0
+        self.failures = 0
+        self.hedges = 0
+        self.errors = Counter()
+        self.latencies = deque(maxlen=200)
+
+    def p95(self):
+        if len(self.latencies) < ROUTER_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def snapshot(self):
+        total = self.successes + self.failures
+        ordered = sorted(self.latencies)
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": round(self.successes / total, 4) if total else None,
+            "consecutive_failures": self.consecutive_failures,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            "p95_ms": round(self.p95() * 1000, 1) if self.p95() else None,
+            "hedged_requests": self.hedges,
+            "errors": dict(self.errors),
+        }
+
+
+class AllModelsFailed(Exception):
+    pass
+
+
+class ModelRouter:
+    def __init__(self, models, hedge: bool = ROUTER_HEDGE, clock=time.monotonic):
+        self.models = list(models)
+        self.hedge = hedge
+        self.clock = clock
+        self.health = {m: ModelHealth(m) for m in self.models}
+        self.decisions = Counter()
+        self._lock = threading.Lock()
+
+    # Breaker bookkeeping
+
+    def candidates(self):
+        """Models to try, in preference order, skipping open breakers."""
+        now = self.clock()
+        chosen = []
+        with self._lock:
+            for name in self.models:
+                h = self.health[name]
+                if h.state == OPEN and now - h.opened_at >= h.cooldown:
+                    h.state = HALF_OPEN
+                if h.state == CLOSED:
+                    chosen.append(name)
+                elif h.state == HALF_OPEN and not h.probe_in_flight:
+                    # Only one request probes a recovering model
+                    h.probe_in_flight = True
+                    chosen.append(name)
+                    self.decisions["probe"] += 1
+                else:
+                    self.decisions["skipped_open"] += 1
+        return chosen
+
+    def release(self, name: str):
+        """Give back a probe slot that was handed out but never used."""
+        with self._lock:
+            self.health[name].probe_in_flight = False
+            self.health[name].probe_claimed = False
+
+    def release_unused(self, names):
+        """Give back probe slots for candidates this request didn't get to."""
+        for name in names:
+            if self.health[name].state == HALF_OPEN:
+                self.release(name)
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            h = self.health[name]
+            h.successes += 1
+            h.consecutive_failures = 0
+            h.latencies.append(latency)
+            h.probe_in_flight = False
+            h.probe_claimed = False
+            if h.state != CLOSED:
+                self.decisions["closed"] += 1
+            h.state = CLOSED
+
+    def record_failure(self, name: str, e: Exception):
+        kind = classify_error(e)
+        with self._lock:
+            h = self.health[name]
+            h.failures += 1
+            h.errors[kind] += 1
+            h.probe_in_flight = False
+            h.probe_claimed = False
+            if kind == "parse":
+                # Bad output for this input, not an unhealthy model
+                return kind
+            h.consecutive_failures += 1
+            hard = kind in HARD_ERRORS
+            if h.state == HALF_OPEN or hard or h.consecutive_failures >= ROUTER_FAILURE_THRESHOLD:
+                h.state = OPEN
+                h.opened_at = self.clock()
+                h.cooldown = ROUTER_HARD_COOLDOWN if hard else ROUTER_COOLDOWN
+                self.decisions["opened"] += 1
+        return kind
+
+    def hedge_delay(self, name: str):
+        if not self.hedge:
+            return None
+        # record_success() appends to the latencies from other threads
+        with self._lock:
+            return self.health[name].p95()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "hedging": self.hedge,
+                "decisions": dict(self.decisions),
+                "models": {name: self.health[name].snapshot() for name in self.models},
+            }
+
+    def take_shared(self, models, name: str) -> bool:
+        """
+        Whether a call sharing the candidates() list models may try name now.
+        The list holds one probe slot for a half-open model, so only the first
+        call to reach it probes it; the others skip it until that resolves.
+        """
+        if name not in models:
+            return False # already failed for another call sharing the list
+        with self._lock:
+            h = self.health[name]
+            if h.state != HALF_OPEN:
+                return True
+            if h.probe_claimed:
+                return False
+            h.probe_claimed = True
+            return True
+
+    def _next(self, queue, models):
+        """Pop the next model this call may use; None once the queue runs out."""
+        while queue:
+            name = queue.pop(0)
+            if models is None or self.take_shared(models, name):
+                return name
+        return None
+
+    # Calling
+
+    def _attempt(self, name, call):
+        start = self.clock()
+        try:
+            result = call(name)
+        except Exception as e:
+            self.record_failure(name, e)
+            raise
+        self.record_success(name, self.clock() - start)
+        return result
+
+    def run(self, call, models=None):
+        """
+        call(model_name) -> result. Tries healthy models until one succeeds.
+        models: a candidates() list shared by several calls (map-reduce parts);
+        a model that fails for one call is removed from it, so the others skip
+        it. The caller then releases it.
+        """
+        queue = self.candidates() if models is None else list(models)
+        errors = []
+        if not queue:
+            raise AllModelsFailed("All models are unavailable (circuit breakers open)")
+
+        try:
+            while queue:
+                name = self._next(queue, models)
+                if name is None:
+                    break
+                delay = self.hedge_delay(name)
+                try:
+                    if delay is not None and queue:
+                        return self._run_hedged(name, queue, delay, call, models)
+                    return self._attempt(name, call)
+                except _HedgeFailed as e:
+                    errors.extend(e.errors)
+                except Exception as e:
+                    if queue:
+                        record_fallback(name, classify_error(e))
+                    errors.append(f"{name}: {str(e)}")
+                    drop_shared(models, name, e)
+        finally:
+            if models is None:
+                self.release_unused(queue)
+        raise AllModelsFailed("All models failed. Details: " + " | ".join(errors))
+
+    def _run_hedged(self, name, queue, delay, call, models=None):
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            futures = {pool.submit(self._attempt, name, call): name}
+            done, _ = wait(futures, timeout=delay)
+            backup = None if done else self._next(queue, models)
+            if backup is not None:
+                with self._lock:
+                    self.health[name].hedges += 1
+                    self.decisions["hedged"] += 1
+                futures[pool.submit(self._attempt, backup, call)] = backup
+
+            errors = []
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    errors.append(f"{futures[future]}: {future.exception()}")
+            raise _HedgeFailed(errors)
+        finally:
+            # Don't wait for the losing request; it finishes in the background
+            pool.shutdown(wait=False)
+
+    async def _attempt_async(self, name, call):
+        start = self.clock()
+        try:
+            result = await call(name)
+        except asyncio.CancelledError:
+            self.release(name)
+            raise
+        except Exception as e:
+            self.record_failure(name, e)
+            raise
+        self.record_success(name, self.clock() - start)
+        return result
+
+    async def run_async(self, call, models=None):
+        """Async run(): call(model_name) returns an awaitable."""
+        queue = self.candidates() if models is None else list(models)
+        errors = []
+        if not queue:
+            raise AllModelsFailed("All models are unavailable (circuit breakers open)")
+
+        try:
+            while queue:
+                name = self._next(queue, models)
+                if name is None:
+                    break
+                delay = self.hedge_delay(name)
+                try:
+                    if delay is not None and queue:
+                        return await self._run_hedged_async(name, queue, delay, call, models)
+                    return await self._attempt_async(name, call)
+                except _HedgeFailed as e:
+                    errors.extend(e.errors)
+                except Exception as e:
+                    if queue:
+                        record_fallback(name, classify_error(e))
+                    errors.append(f"{name}: {str(e)}")
+                    drop_shared(models, name, e)
+        finally:
+            if models is None:
+                self.release_unused(queue)
+        raise AllModelsFailed("All models failed. Details: " + " | ".join(errors))
+
+    async def _run_hedged_async(self, name, queue, delay, call, models=None):
+        tasks = {asyncio.ensure_future(self._attempt_async(name, call)): name}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        backup = None if done else self._next(queue, models)
+        if backup is not None:
+            with self._lock:
+                self.health[name].hedges += 1
+                self.decisions["hedged"] += 1
+            tasks[asyncio.ensure_future(self._attempt_async(backup, call))] = backup
+
+        errors = []
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{tasks[task]}: {task.exception()}")
+            raise _HedgeFailed(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class _HedgeFailed(Exception):
+    def __init__(self, errors):
+        super().__init__(" | ".join(errors))
+        self.errors = errors
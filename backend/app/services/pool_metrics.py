@@ -0,0 +1,110 @@
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Live connection-pool metrics, so pool size/overflow can be tuned from data
+# rather than guesswork. Exposed on /api/diagnostics/pool.
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=CHECKOUT_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        index = len(self.buckets_ms)
+        for i, bound in enumerate(self.buckets_ms):
+            if ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{b}ms" for b in self.buckets_ms] + ["le_inf"]
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkout_latency = LatencyHistogram()
+        self.checkouts = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, ms: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.checkouts += 1
+            else:
+                self.failures += 1
+        self.checkout_latency.observe(ms)
+
+
+class _InstrumentedPoolMixin:
+    """Times Pool.connect(), i.e. how long callers wait for a connection."""
+
+    def connect(self):
+        start = time.perf_counter()
+        ok = False
+        try:
+            connection = super().connect()
+            ok = True
+            return connection
+        finally:
+            self.stats.record_checkout((time.perf_counter() - start) * 1000, ok)
+
+    @property
+    def stats(self) -> PoolStats:
+        # Keyed by class so stats survive pool.recreate() on engine.dispose()
+        return _stats_by_pool_class.setdefault(type(self), PoolStats())
+
+
+_stats_by_pool_class = {}
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_snapshot(engine, config=None):
+    pool = engine.pool
+    snapshot = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        snapshot.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, _InstrumentedPoolMixin):
+        stats = pool.stats
+        snapshot.update({
+            "checkouts": stats.checkouts,
+            "checkout_failures": stats.failures,
+            "checkout_latency": stats.checkout_latency.snapshot(),
+        })
+    if config:
+        snapshot["config"] = config
+    return snapshot
@@ -0,0 +1,199 @@
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from sqlalchemy import func
+
+from ..database import SessionLocal
+from ..models import GenerationJob, Quiz
+from .embeddings import resolve_topics
+from .jobs import enqueue_prefetch, is_active, PRIORITY_PREFETCH
+from .llm import model_router
+from .ratelimit import TokenBucket
+from .telemetry import Counter, register_metric
+
+# Speculative generation of the related topics of recently viewed quizzes, so
+# the click-through to a related topic finds its quiz already stored. Off by
+# default. Prefetch jobs go on the job queue at the lowest priority and a
+# worker only starts one when nothing else is queued or running, no user
+# generation is in flight in this process, a model is healthy and the
+# prefetch LLM budget (PREFETCH_PER_MINUTE) has room. A prefetch job already
+# running is not interrupted, but any user job queued meanwhile goes first.
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "15"))
+PREFETCH_PER_MINUTE = float(os.getenv("PREFETCH_PER_MINUTE", "2"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+PREFETCH_MAX_QUEUED = int(os.getenv("PREFETCH_MAX_QUEUED", "20"))
+PREFETCH_TOPICS_PER_QUIZ = int(os.getenv("PREFETCH_TOPICS_PER_QUIZ", "3"))
+PREFETCH_RECENT = 200
+
+PREFETCH_EVENTS = register_metric(Counter(
+    "quiz_prefetch_total", "Prefetch jobs queued and started, and prefetched quizzes later served", ["event"]
+))
+
+
+class Prefetcher:
+    def __init__(self, enabled: bool = PREFETCH_ENABLED, interval: float = PREFETCH_INTERVAL,
+                 per_minute: float = PREFETCH_PER_MINUTE):
+        self.enabled = enabled
+        self.interval = interval
+        self.budget = TokenBucket(per_minute / 60.0, burst=max(int(per_minute), 1))
+        self._recent = OrderedDict() # quiz_id -> expanded yet
+        self._unserved = set() # prefetched quiz ids no user has asked for yet
+        self._served = [] # to be written to generation_jobs.served_at
+        self._busy = [] # callables: user generations in flight in this process
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Called on the request path; no DB access
+
+    def track_busy(self, fn):
+        self._busy.append(fn)
+
+    def viewed(self, quiz_id: int):
+        with self._lock:
+            if self.enabled:
+                self._recent.setdefault(quiz_id, False)
+                self._recent.move_to_end(quiz_id)
+                while len(self._recent) > PREFETCH_RECENT:
+                    self._recent.popitem(last=False)
+            served = quiz_id in self._unserved
+            if served:
+                self._unserved.discard(quiz_id)
+                self._served.append(quiz_id)
+        if served:
+            PREFETCH_EVENTS.inc("served")
+
+    # Scheduling
+
+    def idle(self, db) -> bool:
+        """No user-initiated work in flight here or waiting anywhere."""
+        if any(fn() for fn in self._busy):
+            return False
+        waiting = db.query(GenerationJob.id).filter(
+            is_active(), GenerationJob.priority > PRIORITY_PREFETCH
+        ).first()
+        return waiting is None
+
+    def may_run(self, db) -> bool:
+        """Whether a worker may start a prefetch job now."""
+        if not self.enabled or not self.budget.ready() or not models_available():
+            return False
+        running = db.query(func.count(GenerationJob.id)).filter(
+            is_active(), GenerationJob.status == "running", GenerationJob.priority <= PRIORITY_PREFETCH
+        ).scalar()
+        return running < PREFETCH_CONCURRENCY and self.idle(db)
+
+    def started(self):
+        self.budget.take()
+        PREFETCH_EVENTS.inc("started")
+
+    # Background loop (API process)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="quiz-prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                self.tick(db)
+            except Exception as e:
+                print(f"Prefetch pass failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+    def tick(self, db):
+        self.record_served(db)
+        self.refresh_unserved(db)
+        if self.idle(db):
+            self.enqueue_related(db)
+
+    def record_served(self, db):
+        with self._lock:
+            served, self._served = self._served, []
+        if served:
+            db.query(GenerationJob).filter(
+                GenerationJob.quiz_id.in_(served),
+                GenerationJob.priority <= PRIORITY_PREFETCH,
+                GenerationJob.served_at.is_(None),
+            ).update({GenerationJob.served_at: func.now()}, synchronize_session=False)
+            db.commit()
+
+    def refresh_unserved(self, db):
+        rows = db.query(GenerationJob.quiz_id).filter(
+            GenerationJob.priority <= PRIORITY_PREFETCH,
+            GenerationJob.status == "succeeded",
+            GenerationJob.served_at.is_(None),
+            GenerationJob.quiz_id.isnot(None),
+        ).order_by(GenerationJob.id.desc()).limit(1000)
+        unserved = {row.quiz_id for row in rows}
+        with self._lock:
+            self._unserved = unserved - set(self._served)
+
+    def enqueue_related(self, db):
+        """Queue the uncovered related topics of the most recently viewed quizzes."""
+        with self._lock:
+            pending = [quiz_id for quiz_id, expanded in reversed(self._recent.items()) if not expanded]
+        for quiz_id in pending:
+            q = db.get(Quiz, quiz_id)
+            with self._lock:
+                if quiz_id in self._recent:
+                    self._recent[quiz_id] = True
+            if q is None:
+                continue
+            lang = (q.canonical_key or "en:").split(":", 1)[0]
+            uncovered = [r["topic"] for r in resolve_topics(db, q) if r["quiz_id"] is None]
+            for topic in uncovered[:PREFETCH_TOPICS_PER_QUIZ]:
+                url = f"https://{lang}.wikipedia.org/wiki/{quote(topic.strip().replace(' ', '_'))}"
+                if enqueue_prefetch(db, url, PREFETCH_MAX_QUEUED) is not None:
+                    PREFETCH_EVENTS.inc("queued")
+            if queued_prefetches(db) >= PREFETCH_MAX_QUEUED:
+                return
+
+    def snapshot(self, db):
+        generated, served = db.query(
+            func.count(GenerationJob.id), func.count(GenerationJob.served_at)
+        ).filter(
+            GenerationJob.priority <= PRIORITY_PREFETCH,
+            GenerationJob.status == "succeeded",
+        ).one()
+        return {
+            "enabled": self.enabled,
+            "per_minute": PREFETCH_PER_MINUTE,
+            "concurrency": PREFETCH_CONCURRENCY,
+            "queued": queued_prefetches(db),
+            "prefetched": generated,
+            "served": served,
+            # Share of prefetched quizzes a user later asked for
+            "hit_rate": round(served / generated, 4) if generated else None,
+            "events": {e: PREFETCH_EVENTS.value(e) for e in ("queued", "started", "served")},
+            "recent_views": len(self._recent),
+        }
+
+
+def queued_prefetches(db) -> int:
+    return db.query(func.count(GenerationJob.id)).filter(
+        GenerationJob.status == "queued", GenerationJob.priority <= PRIORITY_PREFETCH
+    ).scalar()
+
+
+def models_available() -> bool:
+    """At least one model's circuit breaker is closed."""
+    return any(h.state == "closed" for h in model_router.health.values())
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,92 @@
+from ..models import Quiz, Question, RelatedTopic
+
+# Conversion between the API's question dicts and the questions /
+# related_topics tables. Kept free of the scraper/LLM imports so migrations
+# and benchmarks can use it.
+
+def fix_quiz_format(quiz_data_list):
+    """
+    Helper to accept old flat format and convert to new nested format.
+    Old: {question, A, B, C, D, ...}
+    New: {question, options: {A, B, C, D}, ...}
+    """
+    fixed = []
+    if not quiz_data_list:
+        return []
+
+    for q in quiz_data_list:
+        if "options" in q:
+            fixed.append(q)
+        else:
+            # Convert old format
+            fixed.append({
+                "question": q.get("question"),
+                "options": {
+                    "A": q.get("A"),
+                    "B": q.get("B"),
+                    "C": q.get("C"),
+                    "D": q.get("D"),
+                },
+                "answer": q.get("answer"),
+                "difficulty": q.get("difficulty"),
+                "explanation": q.get("explanation")
+            })
+    return fixed
+
+def question_rows(questions):
+    """Question rows from nested-format question dicts, in order."""
+    rows = []
+    for position, q in enumerate(questions):
+        options = q.get("options") or {}
+        rows.append(Question(
+            position=position,
+            question=q.get("question"),
+            option_a=options.get("A"),
+            option_b=options.get("B"),
+            option_c=options.get("C"),
+            option_d=options.get("D"),
+            answer=q.get("answer"),
+            difficulty=(q.get("difficulty") or "").lower() or None, # indexed; one spelling per level
+            explanation=q.get("explanation"),
+        ))
+    return rows
+
+def topic_rows(topics):
+    return [RelatedTopic(position=position, topic=topic) for position, topic in enumerate(topics or [])]
+
+def serialize_question(row: Question):
+    return {
+        "question": row.question,
+        "options": {
+            "A": row.option_a,
+            "B": row.option_b,
+            "C": row.option_c,
+            "D": row.option_d,
+        },
+        "answer": row.answer,
+        "difficulty": row.difficulty,
+        "explanation": row.explanation
+    }
+
+def quiz_questions(q: Quiz):
+    # Rows not yet moved by migrate_quiz_tables.py are still served from the blob
+    if q.questions:
+        return [serialize_question(row) for row in q.questions]
+    return fix_quiz_format(q.quiz_data)
+
+def quiz_topics(q: Quiz):
+    if q.topics:
+        return [row.topic for row in q.topics]
+    return q.related_topics or []
+
+def serialize_quiz(q: Quiz):
+    return {
+        "id": q.id,
+        "url": q.url,
+        "title": q.title,
+        "summary": q.summary,
+        "sections": q.sections,
+        "quiz": quiz_questions(q),
+        "related_topics": quiz_topics(q),
+        "created_at": q.created_at
+    }
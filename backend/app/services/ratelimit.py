@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Token-bucket rate limiting, one bucket per upstream host, so bulk work
+# doesn't hammer Wikipedia no matter how many requests run concurrently.
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token; return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def ready(self) -> bool:
+        """Whether a token is available now, without taking it."""
+        with self._lock:
+            return self.tokens + (time.monotonic() - self.updated) * self.rate >= 1
+
+    def take(self):
+        """Take a token without waiting; an empty bucket goes into debt."""
+        self._reserve()
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url: str):
+        if self.rate > 0:
+            self.bucket(url).acquire()
+
+    async def acquire_async(self, url: str):
+        if self.rate > 0:
+            await self.bucket(url).acquire_async()
@@ -0,0 +1,183 @@
+import json
+import re
+
+from .streaming import QuizStreamParser
+from .telemetry import Counter, register_metric
+
+# Repair stage for the model's quiz JSON. The strict PydanticOutputParser
+# rejects the whole answer for one bad field; here the JSON is extracted
+# tolerantly (code fences, surrounding prose, trailing commas, a truncated
+# tail), fields are normalized ("Option B" -> "B", options given as a list,
+# "Moderate" -> "medium", missing explanation) and each question is validated
+# on its own, so only the broken ones are dropped.
+
+MAX_RELATED_TOPICS = 5
+DIFFICULTY_ALIASES = {
+    "easy": "easy", "simple": "easy", "basic": "easy", "beginner": "easy",
+    "medium": "medium", "moderate": "medium", "intermediate": "medium", "normal": "medium",
+    "hard": "hard", "difficult": "hard", "challenging": "hard", "advanced": "hard",
+}
+LETTERS = ("A", "B", "C", "D")
+
+FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+ANSWER_LETTER_RE = re.compile(r"^\s*(?:(?:correct\s+)?(?:option|answer|choice)\s*[:\-]?\s*)?\(?([A-Da-d])\s*(?:[).:\-]|$|\s)", re.IGNORECASE)
+OPTION_PREFIX_RE = re.compile(r"^\s*\(?[A-Da-d][).:]\s+")
+
+REPAIR_OUTCOMES = register_metric(Counter(
+    "quiz_output_repair_total",
+    "Model answers by how they were made usable: clean, repaired, reasked (targeted re-ask) or failed",
+    ["outcome"],
+))
+REGENERATIONS_AVOIDED = register_metric(Counter(
+    "quiz_output_regenerations_avoided_total",
+    "Answers the strict parser rejected that were used anyway, instead of re-running the full prompt",
+))
+DROPPED_QUESTIONS = register_metric(Counter(
+    "quiz_output_questions_dropped_total", "Questions dropped from model answers, by reason", ["reason"]
+))
+
+
+class OutputRepairFailed(Exception):
+    pass
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start = text.find("{")
+    if start < 0:
+        start = text.find("[")
+    if start < 0:
+        return None
+    # Ignore prose after the document, then try again without trailing commas
+    for candidate in (text[start:], TRAILING_COMMA_RE.sub(r"\1", text[start:])):
+        try:
+            return json.JSONDecoder().raw_decode(candidate)[0]
+        except ValueError:
+            continue
+    return None
+
+
+def extract_document(text: str):
+    """{"quiz": [raw question, ...], "related_topics": [...]} from whatever the model wrote."""
+    text = FENCE_RE.sub("", text or "").strip()
+    document = _loads(text)
+    if isinstance(document, list):
+        document = {"quiz": document}
+    if isinstance(document, dict):
+        keys = {str(k).lower(): k for k in document}
+        questions = next((document[keys[k]] for k in ("quiz", "questions") if k in keys), [])
+        topics = next((document[keys[k]] for k in ("related_topics", "relatedtopics", "topics") if k in keys), [])
+        return {"quiz": questions if isinstance(questions, list) else [], "related_topics": topics}
+
+    # Truncated or otherwise unparseable: keep every question object that is complete
+    parser = QuizStreamParser()
+    questions = parser.feed(text)
+    if not questions:
+        questions = QuizStreamParser(array_key="questions").feed(text)
+    return {"quiz": questions, "related_topics": []}
+
+
+def _field(raw, *names):
+    for name in names:
+        for key, value in raw.items():
+            if str(key).lower() == name:
+                return value
+    return None
+
+
+def _text(value) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+def normalize_answer(answer, options) -> str:
+    """'B', 'b', 'Option B', 'B) Paris', '(b)' or the option's own text -> 'B'; '' if unknown."""
+    answer = _text(answer)
+    # Option text first: "A fire" or "c. 1500" would otherwise read as a letter
+    lowered = answer.lower()
+    for letter in LETTERS:
+        if lowered and lowered == options[letter].lower():
+            return letter
+    match = ANSWER_LETTER_RE.match(answer)
+    if match:
+        return match.group(1).upper()
+    return ""
+
+
+def normalize_question(raw):
+    """(question dict, None) in the QuizQuestionLLM shape, or (None, reason it was dropped)."""
+    if not isinstance(raw, dict):
+        return None, "not_an_object"
+    question = _text(_field(raw, "question", "text", "prompt", "q"))
+    if not question:
+        return None, "missing_question"
+
+    options = _field(raw, "options", "choices")
+    if isinstance(options, list):
+        options = dict(zip(LETTERS, options))
+    elif isinstance(options, dict):
+        options = {str(k).strip().upper()[-1:]: v for k, v in options.items()}
+    else:
+        options = {letter: _field(raw, letter.lower()) for letter in LETTERS}
+    options = {letter: OPTION_PREFIX_RE.sub("", _text(options.get(letter))) for letter in LETTERS}
+    if not all(options.values()):
+        return None, "missing_option"
+    if len({o.lower() for o in options.values()}) < len(LETTERS):
+        return None, "duplicate_options"
+
+    answer = normalize_answer(_field(raw, "answer", "correct_answer", "correct"), options)
+    if not answer:
+        return None, "bad_answer"
+
+    difficulty = DIFFICULTY_ALIASES.get(_text(_field(raw, "difficulty", "level")).lower(), "medium")
+    return {
+        "question": question,
+        **options,
+        "answer": answer,
+        "difficulty": difficulty,
+        "explanation": _text(_field(raw, "explanation", "rationale", "reason")),
+    }, None
+
+
+def normalize_topics(topics):
+    if isinstance(topics, str):
+        topics = topics.split(",")
+    if not isinstance(topics, list):
+        return []
+    cleaned = []
+    for topic in topics:
+        topic = _text(topic)
+        if topic and topic.lower() not in {t.lower() for t in cleaned}:
+            cleaned.append(topic)
+    return cleaned[:MAX_RELATED_TOPICS]
+
+
+def repair_output(text: str):
+    """(valid question dicts, related topics, {drop reason: count}) from raw model text."""
+    document = extract_document(text)
+    questions, dropped = [], {}
+    for raw in document["quiz"]:
+        question, reason = normalize_question(raw)
+        if question is None:
+            dropped[reason] = dropped.get(reason, 0) + 1
+            DROPPED_QUESTIONS.inc(reason)
+        elif not any(q["question"].lower() == question["question"].lower() for q in questions):
+            questions.append(question)
+    return questions, normalize_topics(document["related_topics"]), dropped
+
+
+def min_questions(question_count: str, default: int = 5) -> int:
+    """The lower bound of a "5 to 10" style question count."""
+    match = re.match(r"\s*(\d+)", question_count or "")
+    return int(match.group(1)) if match else default
+
+
+def repair_snapshot():
+    return {
+        "outcomes": {o: REPAIR_OUTCOMES.value(o) for o in ("clean", "repaired", "reasked", "failed")},
+        "regenerations_avoided": REGENERATIONS_AVOIDED.value(),
+        "dropped_questions": {labels[0]: value for labels, value in DROPPED_QUESTIONS.samples().items()},
+    }
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from ..models import Quiz
+from ..schemas import QuizResponse
+from .quiz_format import serialize_quiz
+
+# Quizzes never change once stored, so each one is serialized to JSON once and
+# the bytes are kept in a bounded LRU. Read endpoints send those bytes as-is,
+# with an ETag so clients that already have them get a 304 instead.
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "86400"))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag == etag or tag == "W/" + etag for tag in candidates)
+
+
+def json_response(request: Request, body: bytes, cache_control: str, etag: str = None) -> Response:
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (body, etag)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes):
+        entry = (body, make_etag(body))
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(body) for body, _ in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+quiz_cache = ResponseCache()
+
+
+def encode_quiz(q: Quiz) -> bytes:
+    # Same bytes FastAPI would produce through response_model=QuizResponse
+    return QuizResponse.model_validate(serialize_quiz(q)).model_dump_json().encode()
+
+
+def cache_quiz(q: Quiz):
+    """(body, etag) for a quiz, precomputed when it is stored."""
+    return quiz_cache.put(q.id, encode_quiz(q))
+
+
+def cached_quiz(q: Quiz):
+    return quiz_cache.get(q.id) or cache_quiz(q)
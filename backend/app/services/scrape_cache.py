@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from ..database import SessionLocal
+from ..models import ScrapedArticle
+
+# Cache of parsed articles keyed by canonical article title (plus revision when
+# the URL pins one with ?oldid=), so URL variants of the same article share an
+# entry. An in-memory LRU sits in front of the scraped_articles table; stale
+# entries are revalidated with ETag / Last-Modified instead of re-downloaded.
+
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "3600"))
+SCRAPE_CACHE_SIZE = int(os.getenv("SCRAPE_CACHE_SIZE", "256"))
+SCRAPE_CACHE_PERSIST = os.getenv("SCRAPE_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+SCRAPE_CACHE_MAX_AGE_DAYS = int(os.getenv("SCRAPE_CACHE_MAX_AGE_DAYS", "7"))
+
+REVISION_RE = re.compile(rb'"wgRevisionId":(\d+)')
+PAGE_NAME_RE = re.compile(rb'"wgPageName":"((?:[^"\\]|\\.)*)"')
+
+
+def article_key(url: str) -> str:
+    """
+    https://en.m.wikipedia.org/wiki/python_%28language%29#History -> en:Python_(language)
+    https://en.wikipedia.org/w/index.php?title=Python&oldid=123    -> en:Python@123
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    lang = host.split(".")[0] if host.endswith("wikipedia.org") else host
+    query = parse_qs(parts.query)
+
+    if "/wiki/" in parts.path:
+        title = parts.path.split("/wiki/", 1)[1]
+    else:
+        title = query.get("title", [""])[0]
+    title = unquote(title).strip().replace(" ", "_").rstrip("/")
+    # MediaWiki titles are case-sensitive except for the first letter
+    title = title[:1].upper() + title[1:]
+
+    key = f"{lang}:{title}"
+    oldid = query.get("oldid", [None])[0]
+    if oldid and oldid.isdigit():
+        key += f"@{oldid}"
+    return key
+
+
+def is_pinned(key: str) -> bool:
+    return "@" in key and key.rpartition("@")[2].isdigit()
+
+
+def alias_keys(key: str, revision_id, page_name):
+    """Other keys the same content is valid under: the canonical title and its revision."""
+    lang = key.split(":", 1)[0]
+    aliases = []
+    if page_name and not is_pinned(key) and f"{lang}:{page_name}" != key:
+        aliases.append(f"{lang}:{page_name}")
+    if revision_id and not is_pinned(key):
+        aliases.append(f"{lang}:{page_name or key.split(':', 1)[1]}@{revision_id}")
+    return aliases
+
+
+def page_metadata(html: bytes):
+    """Revision id and canonical page name from the page's embedded JS config."""
+    revision = REVISION_RE.search(html)
+    page_name = PAGE_NAME_RE.search(html)
+    return (
+        int(revision.group(1)) if revision else None,
+        page_name.group(1).decode("utf-8", "replace") if page_name else None,
+    )
+
+
+class CacheEntry:
+    def __init__(self, content, revision_id=None, etag=None, last_modified=None, fetched_at=None):
+        self.content = content
+        self.revision_id = revision_id
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+    def is_fresh(self, key: str) -> bool:
+        # A pinned revision never changes
+        return is_pinned(key) or time.time() - self.fetched_at < SCRAPE_CACHE_TTL
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ScrapeCache:
+    def __init__(self, max_entries: int = SCRAPE_CACHE_SIZE, persist: bool = SCRAPE_CACHE_PERSIST):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "evictions": 0}
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, key: str):
+        """Return (entry, fresh). entry is None on a full miss."""
+        entry = self._get_memory(key)
+        if entry is None and self.persist:
+            entry = self._load(key)
+            if entry is not None:
+                self._put_memory(key, entry)
+        if entry is None:
+            self.count("misses")
+            return None, False
+        if entry.is_fresh(key):
+            self.count("hits")
+            return entry, True
+        self.count("stale")
+        return entry, False
+
+    def revalidated(self, key: str, entry: CacheEntry):
+        """Upstream answered 304: the cached copy is current again."""
+        self.count("revalidated")
+        entry.fetched_at = time.time()
+        self._put_memory(key, entry)
+        if self.persist:
+            self._store(key, entry)
+
+    def put(self, key: str, entry: CacheEntry, aliases=()):
+        for k in (key, *aliases):
+            self._put_memory(k, entry)
+            if self.persist:
+                self._store(k, entry)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["stale"]
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                hit_rate=round((self.stats["hits"] + self.stats["revalidated"]) / lookups, 4) if lookups else 0.0,
+            )
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _load(self, key: str):
+        db = SessionLocal()
+        try:
+            row = db.query(ScrapedArticle).filter(ScrapedArticle.cache_key == key).first()
+            if row is None:
+                return None
+            fetched_at = row.fetched_at
+            if fetched_at.tzinfo is None: # SQLite drops the timezone
+                fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+            return CacheEntry(row.content, row.revision_id, row.etag, row.last_modified, fetched_at.timestamp())
+        except Exception as e:
+            print(f"Scrape cache load failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, entry: CacheEntry):
+        db = SessionLocal()
+        try:
+            row = db.query(ScrapedArticle).filter(ScrapedArticle.cache_key == key).first()
+            if row is None:
+                row = ScrapedArticle(cache_key=key)
+                db.add(row)
+            row.revision_id = entry.revision_id
+            row.etag = entry.etag
+            row.last_modified = entry.last_modified
+            row.content = entry.content
+            row.fetched_at = datetime.fromtimestamp(entry.fetched_at, timezone.utc)
+            db.commit()
+
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._prune(db)
+        except Exception as e:
+            # The cache must never fail a scrape
+            db.rollback()
+            print(f"Scrape cache store failed: {e}")
+        finally:
+            db.close()
+
+    def _prune(self, db):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=SCRAPE_CACHE_MAX_AGE_DAYS)
+        db.query(ScrapedArticle).filter(ScrapedArticle.fetched_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+
+scrape_cache = ScrapeCache()
@@ -1,22 +1,162 @@
+import asyncio
 import requests
+import httpx
 from bs4 import BeautifulSoup
 import re
+import os
 from fastapi import HTTPException
 
-def scrape_wikipedia(url: str):
+try:
+    from lxml import etree, html as lxml_html
+except ImportError: # optional; falls back to the BeautifulSoup parser
+    etree = lxml_html = None
+
+from . import wiki_api
+from .http_client import http_get, http_get_async
+from .telemetry import span
+from .scrape_cache import scrape_cache, article_key, alias_keys, page_metadata, is_pinned, CacheEntry
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# "lxml" (fast, single pass) or "bs4" (reference implementation)
+SCRAPER_PARSER = os.getenv("SCRAPER_PARSER", "lxml")
+
+# "api" (MediaWiki plain-text extracts, HTML as fallback) or "html" (full page only)
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "api")
+
+EXTRACT_HEADING_RE = re.compile(r"^(={2,6})\s*(.*?)\s*\1\s*$")
+
+def validate_wikipedia_url(url: str):
     if "wikipedia.org/wiki/" not in url:
         raise HTTPException(status_code=400, detail="Invalid Wikipedia URL")
 
+def scrape_wikipedia(url: str):
+    validate_wikipedia_url(url)
+
+    key = article_key(url)
+    entry, fresh = scrape_cache.lookup(key)
+    if fresh:
+        return entry.content
+
+    if SCRAPER_BACKEND == "api" and not is_pinned(key):
+        try:
+            return fetch_via_api(key, entry)
+        except Exception as e:
+            print(f"API fetch failed for {key}, falling back to HTML: {e}")
+
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers)
+        headers = dict(HEADERS, **(entry.validators() if entry else {}))
+        response = http_get(url, headers=headers)
+        if response.status_code == 304 and entry:
+            scrape_cache.revalidated(key, entry)
+            return entry.content
         response.raise_for_status()
     except requests.RequestException as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {str(e)}")
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    return cache_response(key, response.content, response.headers)
+
+async def scrape_wikipedia_async(url: str):
+    validate_wikipedia_url(url)
+
+    # Cache persistence is sync DB I/O, so keep it off the event loop
+    key = article_key(url)
+    entry, fresh = await asyncio.to_thread(scrape_cache.lookup, key)
+    if fresh:
+        return entry.content
+
+    if SCRAPER_BACKEND == "api" and not is_pinned(key):
+        try:
+            return await fetch_via_api_async(key, entry)
+        except Exception as e:
+            print(f"API fetch failed for {key}, falling back to HTML: {e}")
+
+    try:
+        headers = dict(HEADERS, **(entry.validators() if entry else {}))
+        response = await http_get_async(url, headers=headers)
+        if response.status_code == 304 and entry:
+            await asyncio.to_thread(scrape_cache.revalidated, key, entry)
+            return entry.content
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {str(e)}")
+
+    return await asyncio.to_thread(cache_response, key, response.content, response.headers)
+
+def split_key(key: str):
+    lang, title = key.split(":", 1)
+    return lang, title
+
+def fetch_via_api(key: str, entry):
+    lang, title = split_key(key)
+    # A stale entry only needs its revision id checked, not a new download
+    if entry is not None and entry.revision_id:
+        current = wiki_api.fetch_revisions(lang, [title]).get(title)
+        if current and current[1] == entry.revision_id:
+            scrape_cache.revalidated(key, entry)
+            return entry.content
+    canonical, revision_id, extract = wiki_api.fetch_extract(lang, title)
+    return cache_extract(key, canonical, revision_id, extract)
+
+async def fetch_via_api_async(key: str, entry):
+    lang, title = split_key(key)
+    if entry is not None and entry.revision_id:
+        current = (await wiki_api.fetch_revisions_async(lang, [title])).get(title)
+        if current and current[1] == entry.revision_id:
+            await asyncio.to_thread(scrape_cache.revalidated, key, entry)
+            return entry.content
+    canonical, revision_id, extract = await wiki_api.fetch_extract_async(lang, title)
+    return await asyncio.to_thread(cache_extract, key, canonical, revision_id, extract)
+
+def cache_extract(key: str, canonical: str, revision_id, extract: str):
+    with span("parse"):
+        content = parse_article_extract(canonical, extract)
+    entry = CacheEntry(content, revision_id=revision_id)
+    scrape_cache.put(key, entry, aliases=alias_keys(key, revision_id, canonical.replace(" ", "_")))
+    return content
+
+def parse_article_extract(title: str, extract: str):
+    """Article dict (same shape as parse_article_html) from a plain-text API extract."""
+    heading = ""
+    sections = []
+    paragraphs = []
+    for line in extract.split("\n"):
+        match = EXTRACT_HEADING_RE.match(line)
+        if match:
+            # h2/h3 become sections, like the HTML path; deeper levels stay in their parent
+            if len(match.group(1)) <= 3:
+                heading = match.group(2)
+                sections.append(heading)
+            continue
+        if line.strip():
+            paragraphs.append((heading, line))
+
+    summary = next((text.strip() for h, text in paragraphs if h == ""), "")
+    return build_article(title, summary or "No summary available.", sections, paragraphs)
+
+def cache_response(key: str, html: bytes, headers):
+    with span("parse"):
+        content = parse_article_html(html)
+    revision_id, page_name = page_metadata(html)
+    entry = CacheEntry(
+        content,
+        revision_id=revision_id,
+        etag=headers.get("ETag"),
+        last_modified=headers.get("Last-Modified"),
+    )
+    scrape_cache.put(key, entry, aliases=alias_keys(key, revision_id, page_name))
+    return content
+
+def parse_article_html(html):
+    if SCRAPER_PARSER == "lxml" and lxml_html is not None:
+        return parse_article_html_lxml(html)
+    return parse_article_html_bs4(html)
+
+def parse_article_html_bs4(html):
+    """Reference implementation; parse_article_html_lxml must produce identical output."""
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Title
     title_tag = soup.find('h1', {'id': 'firstHeading'})
@@ -33,29 +173,108 @@ def scrape_wikipedia(url: str):
                 if p.text.strip():
                     summary = p.text.strip()
                     break
-    
+
     if not summary:
         summary = "No summary available."
 
     # Section Headings
     sections = []
     for h in soup.find_all(['h2', 'h3']):
-        span = h.find('span', {'class': 'mw-headline'})
-        if span:
-            sections.append(span.text.strip())
+        headline = h.find('span', {'class': 'mw-headline'})
+        if headline:
+            sections.append(headline.text.strip())
 
     # Clean Content text (limited to avoid token limits, prioritizing query relevance)
     # We will extract text from paragraphs
-    content_text = ""
+    # Paragraphs are kept with the heading they fall under, for section-aware chunking
+    paragraphs = []
     if content_div:
-        paragraphs = content_div.find_all('p')
-        content_text = "\n".join([p.text.strip() for p in paragraphs if p.text.strip()])
-    
+        heading = ""
+        for el in content_div.find_all(['p', 'h2', 'h3']):
+            if el.name == 'p':
+                paragraphs.append((heading, el.text))
+            else:
+                heading = clean_heading(el.text)
+
+    return build_article(title, summary, sections, paragraphs)
+
+def parse_article_html_lxml(html):
+    """
+    Same output as parse_article_html_bs4, but built with lxml's C parser and
+    collected in a single walk over the tree instead of one find_all per field.
+    """
+    root = lxml_html.fromstring(html)
+
+    title = None
+    summary = ""
+    sections = []
+    paragraphs = []
+    content_div = None
+    parser_output = None
+    in_content = False
+    heading = ""
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag
+        if not isinstance(tag, str):
+            continue # comments / processing instructions
+
+        if event == "end":
+            if el is content_div:
+                in_content = False
+            continue
+
+        if tag == "p":
+            if in_content:
+                text = el.text_content()
+                paragraphs.append((heading, text))
+                if not summary and parser_output is not None and el.getparent() is parser_output:
+                    summary = text.strip()
+        elif tag == "div":
+            if content_div is None and el.get("id") == "mw-content-text":
+                content_div = el
+                in_content = True
+            elif in_content and parser_output is None and has_class(el, "mw-parser-output"):
+                parser_output = el
+        elif tag == "h2" or tag == "h3":
+            if in_content:
+                heading = clean_heading(el.text_content())
+            for headline in el.iter("span"):
+                if has_class(headline, "mw-headline"):
+                    sections.append(headline.text_content().strip())
+                    break
+        elif tag == "h1" and title is None and el.get("id") == "firstHeading":
+            title = el.text_content().strip()
+
+    if title is None:
+        title = "Unknown Title"
+    return build_article(title, summary or "No summary available.", sections, paragraphs)
+
+def has_class(el, name: str) -> bool:
+    return name in (el.get("class") or "").split()
+
+def clean_heading(text: str) -> str:
+    return re.sub(r'\[\s*edit\s*\]', '', text).strip()
+
+def build_article(title, summary, sections, paragraphs):
+    # paragraphs: (section heading, text) in document order; "" is the lead
+    section_texts = []
+    for heading, text in paragraphs:
+        text = re.sub(r'\[\d+\]', '', text.strip()) # Remove citation like [1]
+        if not text:
+            continue
+        if section_texts and section_texts[-1]["heading"] == heading:
+            section_texts[-1]["text"] += "\n" + text
+        else:
+            section_texts.append({"heading": heading, "text": text})
+
+    content_text = "\n".join([t.strip() for _, t in paragraphs if t.strip()])
+
     # Simple cleanup
     content_text = re.sub(r'\[\d+\]', '', content_text) # Remove citation like [1]
-    
+
     # Truncate content if too long (heuristic, can be adjusted)
-    max_chars = 15000 
+    max_chars = 15000
     if len(content_text) > max_chars:
         content_text = content_text[:max_chars]
 
@@ -63,5 +282,6 @@ def scrape_wikipedia(url: str):
         "title": title,
         "summary": summary,
         "sections": sections,
-        "content_text": content_text
+        "content_text": content_text,
+        "section_texts": section_texts
     }
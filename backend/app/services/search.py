@@ -0,0 +1,184 @@
+import os
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from ..models import Quiz
+from .quiz_format import quiz_questions
+
+# Full-text search over stored quizzes: title, summary, section names and
+# question text. PostgreSQL keeps a weighted tsvector per quiz in quiz_search
+# behind a GIN index; SQLite uses an FTS5 table of the same name so search can
+# be run locally. Rows are written when a quiz is stored (index_quiz) and
+# backfilled with build_search_index.py.
+
+SEARCH_MAX_TERMS = 16
+SEARCH_MAX_OFFSET = 1000
+# Only the newest N matches are ranked, so a term found in most quizzes costs
+# about as much as a rare one
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+
+PG_DDL = [
+    """CREATE TABLE IF NOT EXISTS quiz_search (
+        quiz_id INTEGER PRIMARY KEY REFERENCES quizzes (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_search_document ON quiz_search USING GIN (document)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS quiz_search "
+    "USING fts5(title, summary, sections, questions, tokenize='porter unicode61')",
+]
+
+# Title matches rank above summary, then section names, then question text
+PG_UPSERT = text("""
+    INSERT INTO quiz_search (quiz_id, document) VALUES (:id,
+        setweight(to_tsvector('english', :title), 'A') ||
+        setweight(to_tsvector('english', :summary), 'B') ||
+        setweight(to_tsvector('english', :sections), 'C') ||
+        setweight(to_tsvector('english', :questions), 'D'))
+    ON CONFLICT (quiz_id) DO UPDATE SET document = EXCLUDED.document
+""")
+
+SQLITE_UPSERT = text("""
+    INSERT OR REPLACE INTO quiz_search (rowid, title, summary, sections, questions)
+    VALUES (:id, :title, :summary, :sections, :questions)
+""")
+
+PG_SEARCH = text("""
+    WITH query AS (SELECT to_tsquery('english', :query) AS q),
+    candidates AS (
+        SELECT s.quiz_id FROM quiz_search s, query
+        WHERE s.document @@ query.q
+        ORDER BY s.quiz_id DESC
+        LIMIT :candidates
+    )
+    SELECT q.id, q.url, q.title, q.created_at, ts_rank_cd(s.document, query.q) AS rank
+    FROM candidates c
+    JOIN quiz_search s ON s.quiz_id = c.quiz_id
+    JOIN quizzes q ON q.id = c.quiz_id,
+    query
+    ORDER BY rank DESC, q.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+# bm25() is lower-is-better; negated so both dialects return higher-is-better.
+# The rowid bound is the oldest of the newest :candidates matches.
+SQLITE_SEARCH = text("""
+    SELECT q.id, q.url, q.title, q.created_at, -bm25(quiz_search, 10.0, 4.0, 2.0, 1.0) AS rank
+    FROM quiz_search
+    JOIN quizzes q ON q.id = quiz_search.rowid
+    WHERE quiz_search MATCH :query
+      AND quiz_search.rowid >= COALESCE((
+          SELECT rowid FROM quiz_search WHERE quiz_search MATCH :query
+          ORDER BY rowid DESC LIMIT 1 OFFSET :candidates - 1
+      ), 0)
+    ORDER BY rank DESC, q.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def dialect_name(conn) -> str:
+    """Works for a Connection, a Session or an AsyncSession."""
+    dialect = getattr(conn, "dialect", None) or conn.get_bind().dialect
+    return dialect.name
+
+
+def create_search_index(engine):
+    ddl = {"postgresql": PG_DDL, "sqlite": SQLITE_DDL}.get(engine.dialect.name)
+    if ddl is None:
+        print(f"Full-text search is not supported on {engine.dialect.name}")
+        return
+    try:
+        with engine.begin() as connection:
+            for statement in ddl:
+                connection.execute(text(statement))
+    except Exception as e:
+        # e.g. SQLite built without FTS5; everything except /api/search still works
+        print(f"Could not create the search index: {e}")
+
+
+def quiz_document(q: Quiz):
+    return {
+        "id": q.id,
+        "title": q.title or "",
+        "summary": q.summary or "",
+        "sections": " ".join(q.sections or []),
+        "questions": " ".join(question["question"] or "" for question in quiz_questions(q)),
+    }
+
+
+def upsert_statement(conn):
+    return {"postgresql": PG_UPSERT, "sqlite": SQLITE_UPSERT}.get(dialect_name(conn))
+
+
+def index_documents(conn, documents):
+    """Write search rows for quiz_document() dicts; the caller commits."""
+    statement = upsert_statement(conn)
+    if statement is not None and documents:
+        conn.execute(statement, documents)
+
+
+def index_quiz(db, q: Quiz):
+    # Own connection, so a failure here neither fails the generation nor
+    # rolls back (and expires) the caller's session
+    try:
+        with db.get_bind().begin() as connection:
+            index_documents(connection, [quiz_document(q)])
+    except Exception as e:
+        print(f"Failed to index quiz {q.id} for search: {e}")
+
+
+async def index_quiz_async(db, q: Quiz):
+    await index_quizzes_async(db, [q])
+
+
+async def index_quizzes_async(db, quizzes):
+    documents = [quiz_document(q) for q in quizzes]
+    try:
+        async with db.bind.begin() as connection:
+            statement = upsert_statement(connection)
+            if statement is not None and documents:
+                await connection.execute(statement, documents)
+    except Exception as e:
+        print(f"Failed to index quizzes {[q.id for q in quizzes]} for search: {e}")
+
+
+def search_terms(q: str):
+    return re.findall(r"\w+", q.lower())[:SEARCH_MAX_TERMS]
+
+
+def match_query(dialect: str, terms) -> str:
+    """All terms must match; the last one as a prefix, for search-as-you-type."""
+    if dialect == "postgresql":
+        return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+    return " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+def search_quizzes(db, q: str, limit: int, offset: int):
+    dialect = dialect_name(db)
+    statement = {"postgresql": PG_SEARCH, "sqlite": SQLITE_SEARCH}.get(dialect)
+    if statement is None:
+        raise HTTPException(status_code=501, detail="Search needs PostgreSQL or SQLite")
+    if offset > SEARCH_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"offset can be at most {SEARCH_MAX_OFFSET}")
+
+    terms = search_terms(q)
+    if not terms:
+        return {"items": [], "next_offset": None}
+
+    # Fetch one extra row to know whether there is a next page
+    rows = db.execute(statement, {
+        "query": match_query(dialect, terms),
+        "limit": limit + 1,
+        "offset": offset,
+        "candidates": SEARCH_MAX_CANDIDATES,
+    }).all()
+    has_more = len(rows) > limit and offset + limit <= SEARCH_MAX_OFFSET
+    items = [
+        {"id": r.id, "url": r.url, "title": r.title, "created_at": r.created_at, "rank": float(r.rank)}
+        for r in rows[:limit]
+    ]
+    return {"items": items, "next_offset": offset + limit if has_more else None}
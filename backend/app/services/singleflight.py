@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlsplit, urlunsplit, unquote, quote
+
+from sqlalchemy import text
+
+
+def normalize_wikipedia_url(url: str) -> str:
+    """
+    Reduce the common variants of an article URL to one key so that
+    concurrent requests for the same article share a single generation.
+    e.g. https://en.m.wikipedia.org/wiki/Python%20(language)/#History
+      -> https://en.wikipedia.org/wiki/Python_(language)
+    """
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower().replace(".m.wikipedia.org", ".wikipedia.org")
+    scheme = "https" if netloc.endswith("wikipedia.org") else parts.scheme
+    path = parts.path.rstrip("/")
+    if "/wiki/" in path:
+        prefix, _, title = path.partition("/wiki/")
+        title = unquote(title).replace(" ", "_")
+        path = prefix + "/wiki/" + quote(title, safe="_()',:!*$@;-.~/")
+    return urlunsplit((scheme, netloc, path, "", ""))
+
+
+def advisory_key(key: str) -> int:
+    # pg_advisory_lock takes a signed 64-bit integer
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+@contextmanager
+def advisory_lock(engine, key: str):
+    """
+    Cross-worker lock for one key. On PostgreSQL this holds a session-level
+    advisory lock on a dedicated connection, so other uvicorn workers asking
+    for the same key block until the holder is done. Other dialects only get
+    the in-process guarantee from SingleFlight.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    lock_id = advisory_key(key)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:k)"), {"k": lock_id})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": lock_id})
+            connection.commit()
+
+
+@asynccontextmanager
+async def async_advisory_lock(engine, key: str):
+    """advisory_lock for an AsyncEngine."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    lock_id = advisory_key(key)
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT pg_advisory_lock(:k)"), {"k": lock_id})
+        try:
+            yield
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": lock_id})
+            await connection.commit()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key within one process: the first
+    caller runs fn, everyone else arriving before it finishes waits and gets
+    the same result (or the same exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: str, fn):
+        task = self._calls.get(key)
+        if task is None:
+            # The call runs in its own task, so the caller that started it
+            # disconnecting doesn't cancel the work the others are waiting on
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        # shield: cancelling any one caller must not cancel the shared task
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncKeyLock:
+    """
+    Per-key asyncio locks on one event loop, for work that can't share a
+    result the way AsyncSingleFlight does (e.g. a streamed generation): the
+    second caller waits for the first to finish, then looks again.
+    """
+
+    def __init__(self):
+        self._locks = {} # key -> [lock, holders and waiters]
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def in_flight(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,68 @@
+import json
+
+# Incremental parser for the LLM's JSON answer. The model streams text like
+#   ```json {"quiz": [{...}, {...}], "related_topics": [...]} ```
+# and we want each question object as soon as its closing brace arrives,
+# long before the whole document is complete and parseable.
+
+
+class QuizStreamParser:
+    def __init__(self, array_key: str = "quiz"):
+        self.array_key = array_key
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None        # last string seen at the top level of the document
+        self.array_depth = None     # depth of the quiz array's contents, once found
+        self.object_start = None
+
+    def feed(self, text: str):
+        """Add streamed text; return the question dicts completed by it."""
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_key = buffer[self.string_start + 1:i]
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch in "{[":
+                if ch == "[" and self.depth == 1 and self.last_key == self.array_key and self.array_depth is None:
+                    self.array_depth = self.depth + 1
+                elif ch == "{" and self.array_depth is not None and self.depth == self.array_depth:
+                    self.object_start = i
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if ch == "}" and self.object_start is not None and self.depth == self.array_depth:
+                    try:
+                        completed.append(json.loads(buffer[self.object_start:i + 1]))
+                    except ValueError:
+                        pass # malformed object; the final full parse decides
+                    self.object_start = None
+                elif ch == "]" and self.array_depth is not None and self.depth == self.array_depth - 1:
+                    self.array_depth = -1 # array closed; don't match it again
+            i += 1
+        self.pos = i
+        return completed
+
+    @property
+    def text(self) -> str:
+        return self.buffer
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,219 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Per-stage latency tracing and Prometheus-format metrics for the generation
+# pipeline, without third-party dependencies. Stages are timed with
+#
+#     with span("fetch"):
+#         ...
+#
+# which feeds quiz_stage_duration_seconds{stage} and, on exceptions,
+# quiz_stage_errors_total{stage,error}. When a request trace is active the span
+# is also appended to it and, with TRACE_LOG=true, logged as one JSON line per
+# request. METRICS_ENABLED=false turns every span into a shared no-op.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_LOG = os.getenv("TRACE_LOG", "false").lower() in ("1", "true", "yes")
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    le = 'le="' + (bound if bound == "+Inf" else _number(float(bound))) + '"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]!r}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "quiz_stage_duration_seconds", "Time spent per generation pipeline stage", ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "quiz_stage_errors_total", "Exceptions raised per pipeline stage", ["stage", "error"]
+)
+LLM_TOKENS = Counter(
+    "quiz_llm_tokens_total", "Tokens sent to and received from each model", ["model", "direction"]
+)
+LLM_FALLBACKS = Counter(
+    "quiz_llm_fallbacks_total", "Times a model failed and the next one was tried", ["model", "reason"]
+)
+
+METRICS = [STAGE_SECONDS, STAGE_ERRORS, LLM_TOKENS, LLM_FALLBACKS]
+# Callables returning extra exposition lines at scrape time (cache and pool stats)
+COLLECTORS = []
+
+
+def register_metric(metric):
+    METRICS.append(metric)
+    return metric
+
+
+def register_collector(fn):
+    COLLECTORS.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            print(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+def counter_lines(name: str, help: str, samples, kind: str = "counter"):
+    """Exposition lines for values kept elsewhere; samples is [(labels dict, value)]."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return lines
+
+
+# Spans and traces
+
+_trace = contextvars.ContextVar("quiz_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.stage, exc_type.__name__)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((self.stage, round(elapsed * 1000, 2)))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    return _Span(stage) if METRICS_ENABLED else _NO_SPAN
+
+
+def start_trace():
+    """Collect this request's spans (also from tasks and threads it starts via to_thread)."""
+    if not (METRICS_ENABLED and TRACE_LOG):
+        return None
+    return _trace.set([])
+
+
+def finish_trace(token, name: str, **fields):
+    if token is None:
+        return
+    spans = _trace.get()
+    _trace.reset(token)
+    print(json.dumps({"trace": name, **fields, "spans": spans}, default=str))
+
+
+def record_tokens(model_name: str, input_tokens, output_tokens):
+    if not METRICS_ENABLED:
+        return
+    if input_tokens:
+        LLM_TOKENS.inc(model_name, "input", amount=input_tokens)
+    if output_tokens:
+        LLM_TOKENS.inc(model_name, "output", amount=output_tokens)
+
+
+def record_fallback(model_name: str, reason: str):
+    if METRICS_ENABLED:
+        LLM_FALLBACKS.inc(model_name, reason)
@@ -0,0 +1,114 @@
+import os
+
+from .http_client import http_get, http_get_async
+
+# Fetch backend built on the MediaWiki Action API: asks only for the article's
+# plain-text extract, canonical title and revision id, instead of downloading
+# the full rendered page with its navboxes, references and skin.
+
+# {lang} is filled from the article URL; point this at a stand-in server for testing
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://{lang}.wikipedia.org/w/api.php")
+WIKI_API_BATCH_SIZE = 50 # titles per query for revision lookups (API limit for anonymous clients)
+
+API_HEADERS = {
+    # Wikimedia asks API clients to identify themselves
+    "User-Agent": "AIWikipediaQuizGenerator/1.0 (https://github.com/NishwanthBairagoni/AI-Wikipedia-Quiz-Generator)",
+    "Accept-Encoding": "gzip",
+}
+
+
+class ArticleNotFound(Exception):
+    pass
+
+
+def extract_params(title: str):
+    return {
+        "action": "query",
+        "format": "json",
+        "formatversion": "2",
+        "redirects": "1",
+        "prop": "extracts|revisions",
+        "explaintext": "1",
+        "exsectionformat": "wiki", # keep "== Heading ==" markers for section splitting
+        "rvprop": "ids",
+        "titles": title,
+    }
+
+
+def revision_params(titles):
+    return {
+        "action": "query",
+        "format": "json",
+        "formatversion": "2",
+        "redirects": "1",
+        "prop": "revisions",
+        "rvprop": "ids",
+        "titles": "|".join(titles),
+    }
+
+
+def parse_extract_response(data):
+    """-> (canonical title, revision id, plain-text extract)"""
+    pages = data.get("query", {}).get("pages", [])
+    if not pages or pages[0].get("missing") or pages[0].get("invalid"):
+        raise ArticleNotFound("Article not found")
+    page = pages[0]
+    revisions = page.get("revisions") or [{}]
+    return page["title"], revisions[0].get("revid"), page.get("extract", "")
+
+
+def parse_revision_response(data, titles):
+    """-> {requested title: (canonical title, revision id)} for titles that exist."""
+    query = data.get("query", {})
+    # Follow normalization (underscores, case) and redirects back to what was asked for
+    renamed = {}
+    for step in query.get("normalized", []) + query.get("redirects", []):
+        renamed[step["from"]] = step["to"]
+    by_title = {
+        page["title"]: (page.get("revisions") or [{}])[0].get("revid")
+        for page in query.get("pages", [])
+        if not page.get("missing")
+    }
+    resolved = {}
+    for requested in titles:
+        title = requested
+        for _ in range(3): # normalized -> redirected -> ...
+            title = renamed.get(title, title)
+        if title in by_title:
+            resolved[requested] = (title, by_title[title])
+    return resolved
+
+
+def fetch_extract(lang: str, title: str):
+    response = http_get(WIKI_API_URL.format(lang=lang), params=extract_params(title), headers=API_HEADERS)
+    response.raise_for_status()
+    return parse_extract_response(response.json())
+
+
+async def fetch_extract_async(lang: str, title: str):
+    response = await http_get_async(WIKI_API_URL.format(lang=lang), params=extract_params(title), headers=API_HEADERS)
+    response.raise_for_status()
+    return parse_extract_response(response.json())
+
+
+def fetch_revisions(lang: str, titles):
+    """Current revision ids for many titles, WIKI_API_BATCH_SIZE per request."""
+    resolved = {}
+    titles = list(titles)
+    for i in range(0, len(titles), WIKI_API_BATCH_SIZE):
+        chunk = titles[i:i + WIKI_API_BATCH_SIZE]
+        response = http_get(WIKI_API_URL.format(lang=lang), params=revision_params(chunk), headers=API_HEADERS)
+        response.raise_for_status()
+        resolved.update(parse_revision_response(response.json(), chunk))
+    return resolved
+
+
+async def fetch_revisions_async(lang: str, titles):
+    resolved = {}
+    titles = list(titles)
+    for i in range(0, len(titles), WIKI_API_BATCH_SIZE):
+        chunk = titles[i:i + WIKI_API_BATCH_SIZE]
+        response = await http_get_async(WIKI_API_URL.format(lang=lang), params=revision_params(chunk), headers=API_HEADERS)
+        response.raise_for_status()
+        resolved.update(parse_revision_response(response.json(), chunk))
+    return resolved
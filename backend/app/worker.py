@@ -0,0 +1,39 @@
+import argparse
+import signal
+import threading
+
+from .database import SessionLocal
+from .services.jobs import JobWorkerPool, JOB_WORKERS, recover_stale_jobs
+from .services.prefetch import prefetcher
+
+# Standalone generation worker, so generation capacity can be scaled apart from
+# the API. Run the API with JOB_WORKERS=0 and start as many of these as needed:
+#   python -m app.worker --workers 4
+
+def main():
+    parser = argparse.ArgumentParser(description="Run quiz generation workers")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS or 1)
+    parser.add_argument("--recover", action="store_true",
+                        help="Requeue every 'running' job, even with a live lease (only when no other worker is alive). "
+                             "Jobs whose lease ran out are requeued automatically")
+    args = parser.parse_args()
+
+    if args.recover:
+        db = SessionLocal()
+        try:
+            recover_stale_jobs(db, force=True)
+        finally:
+            db.close()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    pool = JobWorkerPool(workers=args.workers, prefetcher=prefetcher)
+    pool.start()
+    print(f"Started {args.workers} generation workers")
+    stop.wait()
+    pool.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import os
+from sqlalchemy import create_engine, inspect, text
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BATCH_SIZE = 500
+
+# Adds quizzes.canonical_key, fills it for existing rows and then creates the
+# unique index on it. When several stored quizzes are the same article (URL
+# variants, or redirects with --resolve-redirects), the oldest keeps the key;
+# the others are left without one and stay reachable by id.
+
+def log(msg):
+    with open("migration_log.txt", "a") as f:
+        f.write(msg + "\n")
+    print(msg)
+
+def resolve_keys(keys):
+    """Map plain keys to their redirect targets, one API call per 50 titles per language."""
+    from app.services import wiki_api
+    from app.services.canonical import LANG_RE
+    from app.services.scrape_cache import is_pinned
+
+    by_lang = {}
+    for key in keys:
+        lang, title = key.split(":", 1)
+        if LANG_RE.match(lang) and not is_pinned(key):
+            by_lang.setdefault(lang, []).append(title)
+
+    resolved = {}
+    for lang, titles in by_lang.items():
+        try:
+            found = wiki_api.fetch_revisions(lang, titles)
+        except Exception as e:
+            log(f"WARNING: redirect lookup failed for {len(titles)} {lang} titles: {e}")
+            continue
+        for title, (canonical, _) in found.items():
+            resolved[f"{lang}:{title}"] = f"{lang}:{canonical.replace(' ', '_')}"
+    return resolved
+
+def backfill_canonical_keys(resolve_redirects: bool):
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    from app.services.canonical import canonical_key
+
+    engine = create_engine(DATABASE_URL)
+    columns = {c["name"] for c in inspect(engine).get_columns("quizzes")}
+    with engine.begin() as connection:
+        if "canonical_key" not in columns:
+            log("Adding 'canonical_key' column...")
+            connection.execute(text("ALTER TABLE quizzes ADD COLUMN canonical_key VARCHAR"))
+        taken = {row[0] for row in connection.execute(
+            text("SELECT canonical_key FROM quizzes WHERE canonical_key IS NOT NULL")
+        )}
+
+    last_id = 0
+    filled = duplicates = redirected = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT id, url FROM quizzes WHERE canonical_key IS NULL AND id > :last "
+                     "ORDER BY id LIMIT :n"),
+                {"last": last_id, "n": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+
+            keys = {quiz_id: canonical_key(url or "") for quiz_id, url in rows}
+            if resolve_redirects:
+                targets = resolve_keys(set(keys.values()))
+                redirected += sum(1 for k in keys.values() if targets.get(k, k) != k)
+                keys = {quiz_id: targets.get(k, k) for quiz_id, k in keys.items()}
+
+            updates = []
+            for quiz_id, key in keys.items():
+                if key in taken:
+                    duplicates += 1
+                    continue
+                taken.add(key)
+                updates.append({"id": quiz_id, "key": key})
+            if updates:
+                connection.execute(text("UPDATE quizzes SET canonical_key = :key WHERE id = :id"), updates)
+
+        last_id = rows[-1][0]
+        filled += len(updates)
+        log(f"Backfilled {filled} quizzes so far (up to id {last_id})...")
+
+    with engine.begin() as connection:
+        log("Creating unique index ix_quizzes_canonical_key...")
+        connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_quizzes_canonical_key ON quizzes (canonical_key)"))
+
+    total = filled + duplicates
+    log(f"SUCCESS: {filled} keys set, {redirected} via redirects.")
+    if total:
+        log(f"{duplicates} of {total} quizzes duplicate another quiz's article "
+            f"({duplicates / total:.1%} of these generations would have been cache hits).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolve-redirects", action="store_true",
+                        help="also fold redirect titles into their target article (MediaWiki API)")
+    args = parser.parse_args()
+    backfill_canonical_keys(args.resolve_redirects)
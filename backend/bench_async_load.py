@@ -0,0 +1,163 @@
+"""
+Load benchmark: sync (threadpool) vs async generate-quiz handlers.
+
+Runs against a local fake Wikipedia server and a fake LLM with fixed latency,
+on a throwaway SQLite database, so it needs no network or API key.
+
+    python bench_async_load.py --requests 200 --llm-latency 2.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DB_FILE = "bench_async_load.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("HTTP_RATE_PER_HOST", "0") # every request hits the same local host
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine, get_db
+from app.main import app as async_app
+from app.schemas import QuizRequest, QuizResponse
+from app.services import generation
+from app.services.llm import QuizOutputLLM, QuizQuestionLLM
+from app.services.quiz_format import serialize_quiz
+
+ARTICLE_HTML = """<html><body>
+<h1 id="firstHeading">{title}</h1>
+<div id="mw-content-text"><div class="mw-parser-output">
+<p>{title} is a benchmark article.[1]</p>
+<h2><span class="mw-headline">History</span></h2>
+<p>{body}</p>
+</div></div></body></html>"""
+
+
+def start_fake_wikipedia(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            title = self.path.rsplit("/", 1)[-1]
+            body = ARTICLE_HTML.format(title=title, body="Lorem ipsum dolor sit amet. " * 200).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_llm_output():
+    question = QuizQuestionLLM(
+        question="What is this?", A="a", B="b", C="c", D="d",
+        answer="A", difficulty="easy", explanation="Because."
+    )
+    return QuizOutputLLM(quiz=[question] * 5, related_topics=["One", "Two", "Three"])
+
+
+def install_fake_llm(latency: float):
+    def fake_sync(text):
+        time.sleep(latency)
+        return fake_llm_output()
+
+    async def fake_async(text):
+        await asyncio.sleep(latency)
+        return fake_llm_output()
+
+    generation.generate_quiz_from_text = fake_sync
+    generation.generate_quiz_from_text_async = fake_async
+
+
+def build_sync_app() -> FastAPI:
+    # The pre-async handler shape: a plain def route on the threadpool
+    app = FastAPI()
+
+    @app.post("/api/generate-quiz", response_model=QuizResponse)
+    def generate_quiz(request: QuizRequest, db: Session = Depends(get_db)):
+        return serialize_quiz(generation.generate_and_store(str(request.url), db))
+
+    @app.get("/api/history")
+    def history():
+        return []
+
+    return app
+
+
+async def run_load(app, base_url: str, n_requests: int, tag: str):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    history_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            start = time.perf_counter()
+            r = await client.post("/api/generate-quiz", json={"url": f"{base_url}/wikipedia.org/wiki/{tag}_{i}"})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+        async def probe_history():
+            # How long a cheap read waits while generations are in flight
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/history")
+                history_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.1)
+
+        prober = asyncio.create_task(probe_history())
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    return elapsed, latencies, history_latencies
+
+
+def report(name, n_requests, elapsed, latencies, history_latencies):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:>6}: {n_requests / elapsed:7.1f} req/s  "
+          f"p50 {statistics.median(latencies):6.2f}s  p95 {p95:6.2f}s  "
+          f"history max {max(history_latencies or [0]):6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--fetch-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+    Base.metadata.create_all(bind=engine)
+
+    server = start_fake_wikipedia(args.fetch_latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    install_fake_llm(args.llm_latency)
+
+    print(f"{args.requests} concurrent requests, LLM {args.llm_latency}s, fetch {args.fetch_latency}s")
+    for name, app in (("sync", build_sync_app()), ("async", async_app)):
+        elapsed, latencies, history = asyncio.run(run_load(app, base_url, args.requests, name))
+        report(name, args.requests, elapsed, latencies, history)
+
+    server.shutdown()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    main()
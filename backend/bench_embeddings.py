@@ -0,0 +1,109 @@
+"""
+Near-duplicate index check on a synthetic corpus. No database or API key needed.
+
+    python bench_embeddings.py --quizzes 100000
+
+Reports top-k search latency and memory for the in-process vector store, and
+how NEAR_DUPLICATE_THRESHOLD separates lightly edited copies of stored
+articles (should be reused) from unrelated articles (must not be).
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import string
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.embeddings import (
+    VectorStore, quiz_vector, article_vector, NEAR_DUPLICATE_THRESHOLD, EMBEDDING_DIM,
+)
+
+random.seed(11)
+VOCABULARY = list(dict.fromkeys(
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))) for _ in range(21_000)
+))[:20_000]
+# Zipf-ish weights: a few very common words, a long tail of rare ones
+CUM_WEIGHTS = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def words(n):
+    return random.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n)
+
+
+def make_article():
+    return {"title": " ".join(words(3)), "summary": " ".join(words(150))}
+
+
+def make_questions():
+    return [{"question": " ".join(words(14))} for _ in range(8)]
+
+
+def edited(article, fraction):
+    """The same article with a fraction of its words swapped, and one title word changed."""
+    summary = article["summary"].split()
+    for i in random.sample(range(len(summary)), int(len(summary) * fraction)):
+        summary[i] = words(1)[0]
+    title = article["title"].split()
+    title[random.randrange(len(title))] = words(1)[0]
+    return {"title": " ".join(title), "summary": " ".join(summary)}
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quizzes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = VectorStore()
+    articles = []
+    batch_ids, batch_vectors = [], []
+    for quiz_id in range(1, args.quizzes + 1):
+        article = make_article()
+        if len(articles) < args.queries:
+            articles.append((quiz_id, article))
+        batch_ids.append(quiz_id)
+        batch_vectors.append(quiz_vector(article["title"], article["summary"], make_questions()))
+        if len(batch_ids) == 5000:
+            store.add_many(batch_ids, batch_vectors)
+            batch_ids, batch_vectors = [], []
+    store.add_many(batch_ids, batch_vectors)
+    print(f"Embedded {len(store)} quizzes ({EMBEDDING_DIM} dims) in {time.perf_counter() - started:.1f}s, "
+          f"store is {store.nbytes / 2**20:.1f} MiB")
+
+    latencies = []
+    for _ in range(args.queries):
+        vector = article_vector(make_article())
+        start = time.perf_counter()
+        store.search(vector, 3)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"top-3 search: p50 {statistics.median(latencies):.2f} ms, p95 {percentile(latencies, 0.95):.2f} ms")
+
+    print(f"\nthreshold {NEAR_DUPLICATE_THRESHOLD}")
+    print(f"{'query':<24} {'p5 score':>9} {'p50 score':>10} {'max score':>10} {'reused':>8}")
+    cases = {
+        "exact copy": lambda a: a,
+        "10% of words edited": lambda a: edited(a, 0.1),
+        "30% of words edited": lambda a: edited(a, 0.3),
+        "unrelated article": lambda a: make_article(),
+    }
+    for name, make_query in cases.items():
+        scores, reused = [], 0
+        for quiz_id, article in articles:
+            top_id, score = store.search(article_vector(make_query(article)), 1)[0]
+            scores.append(score)
+            reused += score >= NEAR_DUPLICATE_THRESHOLD
+        print(f"{name:<24} {percentile(scores, 0.05):>9.3f} {statistics.median(scores):>10.3f} {max(scores):>10.3f} "
+              f"{reused / len(articles):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Microbenchmark: per-request LLM setup cost, rebuilding the client/prompt/parser
+on every call (the old behaviour) vs. reusing chains from LLMRegistry.
+Uses a stub chat model for the invoke timings, so no API key or network is needed.
+
+    python bench_llm_setup.py --iterations 200
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench-not-a-real-key")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import PydanticOutputParser
+
+from app.services.llm import LLMRegistry, QuizOutputLLM, build_prompt, make_chat_model
+
+STUB_RESPONSE = json.dumps({
+    "quiz": [
+        {"question": f"Question {i}?", "A": "a", "B": "b", "C": "c", "D": "d",
+         "answer": "A", "difficulty": "easy", "explanation": "Because."}
+        for i in range(5)
+    ],
+    "related_topics": ["One", "Two", "Three"],
+})
+
+
+def stub_model(model_name):
+    return FakeListChatModel(responses=[STUB_RESPONSE])
+
+
+def per_request_chain(factory, model_name):
+    # What every request used to do before running the chain
+    parser = PydanticOutputParser(pydantic_object=QuizOutputLLM)
+    prompt = build_prompt(parser)
+    return prompt | factory(model_name) | parser
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    n = args.iterations
+    inputs = {"text": "Some article text.", "question_count": "5 to 10"}
+
+    print(f"{'case':<48} {'us/request':>12}")
+
+    # Setup only, with the real Gemini client class (construction makes no network calls)
+    rebuild = timed(lambda: per_request_chain(make_chat_model, "gemini-2.0-flash"), n)
+    registry = LLMRegistry()
+    registry.get_chain("gemini-2.0-flash")
+    cached = timed(lambda: registry.get_chain("gemini-2.0-flash"), n)
+    print(f"{'setup, rebuilt per request (Gemini client)':<48} {rebuild:>12.1f}")
+    print(f"{'setup, LLMRegistry (Gemini client)':<48} {cached:>12.1f}")
+
+    # Setup + invoke + parse against the stub model
+    rebuild = timed(lambda: per_request_chain(stub_model, "stub").invoke(inputs), n)
+    stub_registry = LLMRegistry(factory=stub_model)
+    stub_registry.get_chain("stub").invoke(inputs)
+    cached = timed(lambda: stub_registry.get_chain("stub").invoke(inputs), n)
+    print(f"{'end-to-end, rebuilt per request (stub model)':<48} {rebuild:>12.1f}")
+    print(f"{'end-to-end, LLMRegistry (stub model)':<48} {cached:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
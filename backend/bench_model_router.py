@@ -0,0 +1,87 @@
+"""
+Simulate the model router against fake models with scripted failures and
+compare it with the old fixed-order fallback loop.
+
+Scenario: the preferred model is deprecated and only fails after a slow
+timeout, the second is rate-limited for the first part of the run, the third
+is healthy. No network or API key needed.
+
+    python bench_model_router.py --requests 60
+"""
+import argparse
+import json
+import time
+
+from app.services.model_router import ModelRouter
+
+
+class FakeModel:
+    def __init__(self, name, latency, fail_when=None, error="boom"):
+        self.name = name
+        self.latency = latency
+        self.fail_when = fail_when or (lambda i: False)
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, request_index):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail_when(request_index):
+            raise Exception(self.error)
+        return f"quiz from {self.name}"
+
+
+def build_models(n_requests):
+    return {
+        "deprecated-model": FakeModel("deprecated-model", 0.05, lambda i: True, "404 model is not found"),
+        "busy-model": FakeModel("busy-model", 0.01, lambda i: i < n_requests // 3, "429 quota exceeded"),
+        "healthy-model": FakeModel("healthy-model", 0.02),
+    }
+
+
+def sequential_fallback(models, i):
+    # The pre-router behaviour: walk the list in order on every request
+    errors = []
+    for name, model in models.items():
+        try:
+            return model(i)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    raise Exception(" | ".join(errors))
+
+
+def run(label, n_requests, call):
+    models = build_models(n_requests)
+    start = time.perf_counter()
+    failures = 0
+    for i in range(n_requests):
+        try:
+            call(models, i)
+        except Exception:
+            failures += 1
+    elapsed = time.perf_counter() - start
+    calls = {name: m.calls for name, m in models.items()}
+    print(f"{label:<12} {elapsed / n_requests * 1000:8.1f} ms/request  failures={failures}  calls={calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=60)
+    args = parser.parse_args()
+
+    run("sequential", args.requests, sequential_fallback)
+
+    router = None
+
+    def routed(models, i):
+        nonlocal router
+        if router is None:
+            router = ModelRouter(list(models))
+        return router.run(lambda name: models[name](i))
+
+    run("router", args.requests, routed)
+    print(json.dumps(router.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Output repair check on synthetic model answers. No database or API key needed.
+
+    python bench_output_repair.py --answers 2000
+
+Each answer is a valid quiz with one of the defects models actually produce
+(code fences, "Option B" answers, a missing explanation, trailing commas, a
+truncated tail, ...). Reports how many the strict PydanticOutputParser
+accepts, how many the repair stage makes usable without another model call,
+how many need a targeted re-ask, and the parse time of both.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from langchain_core.output_parsers import PydanticOutputParser
+
+from app.services.llm import QuizOutputLLM
+from app.services.repair import repair_output, min_questions
+
+QUESTION_COUNT = "5 to 10"
+DIFFICULTIES = ("easy", "medium", "hard")
+
+random.seed(7)
+
+
+def make_question(i):
+    return {
+        "question": f"Which statement about fact {i} is correct?",
+        "A": f"First claim {i}", "B": f"Second claim {i}", "C": f"Third claim {i}", "D": f"Fourth claim {i}",
+        "answer": random.choice("ABCD"),
+        "difficulty": random.choice(DIFFICULTIES),
+        "explanation": f"The article states fact {i} directly.",
+    }
+
+
+def make_quiz(n=8):
+    return {"quiz": [make_question(i) for i in range(n)], "related_topics": ["Topic one", "Topic two"]}
+
+
+def dump(quiz):
+    return json.dumps(quiz, indent=2)
+
+
+def fenced(quiz):
+    return "Here is the quiz:\n```json\n" + dump(quiz) + "\n```\nLet me know if you need more."
+
+
+def option_answers(quiz):
+    for q in quiz["quiz"]:
+        q["answer"] = f"Option {q['answer']}"
+    return dump(quiz)
+
+
+def missing_explanation(quiz):
+    del quiz["quiz"][2]["explanation"]
+    return dump(quiz)
+
+
+def difficulty_alias(quiz):
+    quiz["quiz"][0]["difficulty"] = "Moderate"
+    return dump(quiz)
+
+
+def trailing_commas(quiz):
+    return dump(quiz).replace('"\n    }', '",\n    }')
+
+
+def options_list(quiz):
+    for q in quiz["quiz"]:
+        q["options"] = [q.pop(letter) for letter in "ABCD"]
+    return dump(quiz)
+
+
+def truncated(quiz):
+    text = dump(quiz)
+    return text[:int(len(text) * 0.85)]
+
+
+def truncated_short(quiz):
+    # Cut off after three complete questions: needs a re-ask
+    text = dump(quiz)
+    return text[:text.index('"question"', text.index(quiz["quiz"][3]["question"]) - 40)]
+
+
+def one_bad_question(quiz):
+    quiz["quiz"][1]["answer"] = "E"
+    return dump(quiz)
+
+
+DEFECTS = {
+    "clean": dump,
+    "fences and prose": fenced,
+    "'Option B' answers": option_answers,
+    "missing explanation": missing_explanation,
+    "difficulty alias": difficulty_alias,
+    "trailing commas": trailing_commas,
+    "options as a list": options_list,
+    "one invalid question": one_bad_question,
+    "truncated tail": truncated,
+    "truncated after 3": truncated_short,
+}
+
+
+def strict_accepts(parser, text):
+    """Parsed, and every answer is a letter and every difficulty a known level.
+
+    The strict parser passes "Option B" or "Moderate" through unchanged, which
+    the frontend can't grade or filter, so those count as not accepted.
+    """
+    try:
+        output = parser.parse(text)
+    except Exception:
+        return False
+    return all(q.answer in "ABCD" and len(q.answer) == 1 and q.difficulty in DIFFICULTIES for q in output.quiz)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=2000)
+    args = parser.parse_args()
+
+    strict = PydanticOutputParser(pydantic_object=QuizOutputLLM)
+    minimum = min_questions(QUESTION_COUNT)
+    per_defect = max(args.answers // len(DEFECTS), 1)
+
+    print(f"{'defect':<22} {'strict ok':>9} {'repaired':>9} {'re-ask':>7} {'failed':>7} {'questions':>10}")
+    totals = {"strict": 0, "repaired": 0, "reask": 0, "failed": 0}
+    strict_times, repair_times = [], []
+    for name, make in DEFECTS.items():
+        counts = {"strict": 0, "repaired": 0, "reask": 0, "failed": 0}
+        kept = []
+        for _ in range(per_defect):
+            text = make(make_quiz())
+
+            start = time.perf_counter()
+            ok = strict_accepts(strict, text)
+            strict_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            questions, _, _ = repair_output(text)
+            repair_times.append(time.perf_counter() - start)
+
+            kept.append(len(questions))
+            counts["strict"] += ok
+            if len(questions) >= minimum:
+                counts["repaired"] += 1
+            elif questions:
+                counts["reask"] += 1
+            else:
+                counts["failed"] += 1
+        for key in totals:
+            totals[key] += counts[key]
+        print(f"{name:<22} {counts['strict'] / per_defect:>9.0%} {counts['repaired'] / per_defect:>9.0%} "
+              f"{counts['reask'] / per_defect:>7.0%} {counts['failed'] / per_defect:>7.0%} {statistics.mean(kept):>10.1f}")
+
+    answers = per_defect * len(DEFECTS)
+    print(f"\n{answers} answers: the strict parser accepts {totals['strict'] / answers:.0%}.")
+    print(f"With repair {totals['repaired'] / answers:.0%} are used as is, {totals['reask'] / answers:.0%} need a re-ask "
+          f"for the missing questions and {totals['failed'] / answers:.0%} fall back to the next model.")
+    print(f"Full regenerations avoided: {totals['repaired'] + totals['reask'] - totals['strict']} of "
+          f"{answers - totals['strict']} rejected answers.")
+    print(f"Parse time per answer: strict {statistics.median(strict_times) * 1000:.2f} ms, "
+          f"repair {statistics.median(repair_times) * 1000:.2f} ms (median)")
+
+
+if __name__ == "__main__":
+    main()
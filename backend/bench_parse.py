@@ -0,0 +1,95 @@
+"""
+Benchmark the article parsers over a corpus of saved Wikipedia pages and check
+that the lxml parser matches the BeautifulSoup reference output exactly.
+
+    python bench_parse.py --fetch      # download the default corpus once
+    python bench_parse.py              # compare + time both parsers
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import requests
+
+from app.services.scraper import HEADERS, parse_article_html_bs4, parse_article_html_lxml
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "bench_fixtures")
+
+# A mix of short articles and very long "List of..." pages
+DEFAULT_TITLES = [
+    "Automation",
+    "Python_(programming_language)",
+    "Artificial_intelligence",
+    "World_War_II",
+    "United_States",
+    "List_of_sovereign_states",
+    "List_of_chemical_elements",
+    "List_of_Nobel_laureates",
+    "Photosynthesis",
+    "Haiku",
+]
+
+
+def fetch_corpus(titles):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for title in titles:
+        path = os.path.join(FIXTURE_DIR, f"{title}.html")
+        if os.path.exists(path):
+            continue
+        response = requests.get(f"https://en.wikipedia.org/wiki/{title}", headers=HEADERS, timeout=30)
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            f.write(response.content)
+        print(f"saved {path} ({len(response.content) // 1024} KiB)")
+
+
+def time_parser(parser, html, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(html)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fetch", action="store_true", help="download the default corpus first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(DEFAULT_TITLES)
+
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    if not paths:
+        print(f"No fixtures in {FIXTURE_DIR}; run with --fetch first.")
+        return
+
+    mismatches = 0
+    total_bs4 = total_lxml = 0.0
+    print(f"{'article':<40} {'KiB':>6} {'bs4 ms':>9} {'lxml ms':>9} {'speedup':>8}")
+    for path in paths:
+        with open(path, "rb") as f:
+            html = f.read()
+
+        # Golden check: the fast path must be a drop-in replacement
+        if parse_article_html_lxml(html) != parse_article_html_bs4(html):
+            mismatches += 1
+            print(f"MISMATCH: {path}")
+
+        bs4_ms = time_parser(parse_article_html_bs4, html, args.repeat)
+        lxml_ms = time_parser(parse_article_html_lxml, html, args.repeat)
+        total_bs4 += bs4_ms
+        total_lxml += lxml_ms
+        name = os.path.basename(path)[:-5][:40]
+        print(f"{name:<40} {len(html) // 1024:>6} {bs4_ms:>9.1f} {lxml_ms:>9.1f} {bs4_ms / lxml_ms:>7.1f}x")
+
+    print(f"{'total':<40} {'':>6} {total_bs4:>9.1f} {total_lxml:>9.1f} {total_bs4 / total_lxml:>7.1f}x")
+    print(f"{len(paths) - mismatches}/{len(paths)} outputs identical to the bs4 reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Before/after benchmark for moving questions out of the quizzes.quiz_data JSON
+blob into the questions / related_topics tables, on a synthetic SQLite DB.
+
+    python bench_quiz_storage.py --quizzes 20000
+
+"Before" reads the blob and runs fix_quiz_format like the old read path;
+"after" reads the normalized tables. Half of the synthetic quizzes use the
+legacy flat question format.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+DB_FILE = "bench_quiz_storage.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import noload
+
+from app.database import Base, engine, SessionLocal
+from app.models import Quiz, Question, RelatedTopic
+from app.services.quiz_format import fix_quiz_format, question_rows, serialize_quiz
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def synthetic_question(i, flat):
+    q = {
+        "question": f"Synthetic question number {i} about the article?",
+        "answer": random.choice("ABCD"),
+        "difficulty": random.choice(DIFFICULTIES),
+        "explanation": "Because the article says so. " * 3,
+    }
+    options = {letter: f"Option {letter} for question {i}" for letter in "ABCD"}
+    if flat:
+        q.update(options)
+    else:
+        q["options"] = options
+    return q
+
+
+def build_db(n_quizzes, per_quiz):
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        for start in range(0, n_quizzes, 1000):
+            quizzes, questions, topics = [], [], []
+            for quiz_id in range(start + 1, min(start + 1000, n_quizzes) + 1):
+                blob = [synthetic_question(i, flat=quiz_id % 2 == 0) for i in range(per_quiz)]
+                related = [f"Topic {quiz_id}-{i}" for i in range(4)]
+                quizzes.append({
+                    "id": quiz_id,
+                    "url": f"https://en.wikipedia.org/wiki/Article_{quiz_id}",
+                    "title": f"Article {quiz_id}",
+                    "summary": "A synthetic summary. " * 20,
+                    "sections": [f"Section {i}" for i in range(8)],
+                    "quiz_data": blob,
+                    "related_topics": related,
+                })
+                for row in question_rows(fix_quiz_format(blob)):
+                    questions.append({
+                        "quiz_id": quiz_id, "position": row.position, "question": row.question,
+                        "option_a": row.option_a, "option_b": row.option_b,
+                        "option_c": row.option_c, "option_d": row.option_d,
+                        "answer": row.answer, "difficulty": row.difficulty, "explanation": row.explanation,
+                    })
+                topics.extend({"quiz_id": quiz_id, "position": i, "topic": t} for i, t in enumerate(related))
+            connection.execute(insert(Quiz), quizzes)
+            connection.execute(insert(Question), questions)
+            connection.execute(insert(RelatedTopic), topics)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quizzes", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--lookups", type=int, default=500, help="random quizzes read per detail/filter run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Building {args.quizzes} quizzes x {args.questions} questions in {DB_FILE}...")
+    build_db(args.quizzes, args.questions)
+    ids = random.sample(range(1, args.quizzes + 1), min(args.lookups, args.quizzes))
+
+    db = SessionLocal()
+    blob_only = (noload(Quiz.questions), noload(Quiz.topics))
+
+    def detail_before():
+        for quiz_id in ids:
+            q = db.query(Quiz).options(*blob_only).filter(Quiz.id == quiz_id).first()
+            _ = {"quiz": fix_quiz_format(q.quiz_data), "related_topics": q.related_topics}
+        db.expunge_all()
+
+    def detail_after():
+        for quiz_id in ids:
+            serialize_quiz(db.query(Quiz).filter(Quiz.id == quiz_id).first())
+        db.expunge_all()
+
+    def hard_before():
+        for quiz_id in ids:
+            blob = db.query(Quiz.quiz_data).filter(Quiz.id == quiz_id).scalar()
+            [q for q in fix_quiz_format(blob) if q.get("difficulty") == "hard"]
+
+    def hard_after():
+        for quiz_id in ids:
+            db.query(Question).filter(Question.quiz_id == quiz_id, Question.difficulty == "hard").all()
+        db.expunge_all()
+
+    def count_before():
+        counts = {}
+        for (blob,) in db.query(Quiz.quiz_data).yield_per(1000):
+            for q in fix_quiz_format(blob):
+                counts[q["difficulty"]] = counts.get(q["difficulty"], 0) + 1
+        return counts
+
+    def count_after():
+        return dict(db.query(Question.difficulty, func.count(Question.id)).group_by(Question.difficulty).all())
+
+    assert count_before() == count_after(), "blob and tables disagree"
+
+    print(f"{'workload':<36} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, before, after in [
+        (f"quiz detail x{len(ids)}", detail_before, detail_after),
+        (f"hard questions of {len(ids)} quizzes", hard_before, hard_after),
+        ("question count by difficulty", count_before, count_after),
+    ]:
+        b = timed(before, args.repeat)
+        a = timed(after, args.repeat)
+        print(f"{name:<36} {b:>10.1f} {a:>10.1f} {b / a:>7.1f}x")
+
+    db.close()
+    engine.dispose()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Latency check for GET /api/search over a large synthetic corpus.
+
+    python bench_search.py                                   # SQLite FTS5, 100k quizzes
+    python bench_search.py --database-url postgresql://...   # PostgreSQL tsvector + GIN (use a scratch DB)
+
+Builds the corpus, runs each query shape repeatedly through the same code
+path as the endpoint, and exits non-zero if any p95 is over --budget-ms.
+"""
+import argparse
+import itertools
+import os
+import random
+import string
+import statistics
+import sys
+import time
+
+DB_FILE = "bench_search.db"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quizzes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200, help="runs per query shape")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="p95 latency budget per query")
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{DB_FILE}"
+if not args.database_url and os.path.exists(DB_FILE):
+    os.remove(DB_FILE)
+
+from sqlalchemy import insert
+
+from app.database import Base, engine, SessionLocal
+from app.models import Quiz
+from app.services.search import create_search_index, index_documents, search_quizzes
+
+random.seed(7)
+VOCABULARY = list(dict.fromkeys(
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))) for _ in range(21_000)
+))[:20_000]
+# Zipf-ish weights: a few very common words, a long tail of rare ones
+CUM_WEIGHTS = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def words(n):
+    return " ".join(random.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=n))
+
+
+def build_corpus(n):
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    with engine.begin() as connection:
+        for start in range(1, n + 1, 2000):
+            rows, documents = [], []
+            for quiz_id in range(start, min(start + 2000, n + 1)):
+                title = words(3)
+                summary = words(60)
+                sections = [words(2) for _ in range(8)]
+                rows.append({
+                    "id": quiz_id,
+                    "url": f"https://en.wikipedia.org/wiki/Bench_{quiz_id}",
+                    "canonical_key": f"en:Bench_{quiz_id}",
+                    "title": title,
+                    "summary": summary,
+                    "sections": sections,
+                })
+                documents.append({
+                    "id": quiz_id,
+                    "title": title,
+                    "summary": summary,
+                    "sections": " ".join(sections),
+                    "questions": " ".join(words(12) for _ in range(10)),
+                })
+            connection.execute(insert(Quiz), rows)
+            index_documents(connection, documents)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main():
+    started = time.perf_counter()
+    print(f"Building {args.quizzes} quizzes on {engine.dialect.name}...")
+    build_corpus(args.quizzes)
+    print(f"  built in {time.perf_counter() - started:.1f}s")
+
+    prefixable = [w for w in VOCABULARY[:2000] if len(w) > 5]
+    shapes = {
+        "stopword-like term": lambda: random.choice(VOCABULARY[:20]), # in nearly every quiz
+        "common term": lambda: random.choice(VOCABULARY[50:300]),
+        "rare term": lambda: random.choice(VOCABULARY[5000:]),
+        "two terms": lambda: f"{random.choice(VOCABULARY[:200])} {random.choice(VOCABULARY[:2000])}",
+        "prefix": lambda: random.choice(prefixable)[:4],
+        "page 3 of common": lambda: random.choice(VOCABULARY[50:300]),
+    }
+
+    db = SessionLocal()
+    over_budget = False
+    print(f"{'query':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hits/page':>10}")
+    for name, make_query in shapes.items():
+        offset = 40 if name.startswith("page") else 0
+        samples, hits = [], []
+        for _ in range(args.queries):
+            q = make_query()
+            start = time.perf_counter()
+            page = search_quizzes(db, q, limit=20, offset=offset)
+            samples.append((time.perf_counter() - start) * 1000)
+            hits.append(len(page["items"]))
+        p95 = percentile(samples, 0.95)
+        over_budget |= p95 > args.budget_ms
+        print(f"{name:<20} {statistics.median(samples):>8.2f} {p95:>8.2f} "
+              f"{percentile(samples, 0.99):>8.2f} {statistics.mean(hits):>10.1f}")
+    db.close()
+
+    engine.dispose()
+    if not args.database_url:
+        os.remove(DB_FILE)
+    if over_budget:
+        print(f"FAIL: p95 over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print(f"OK: every p95 within {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
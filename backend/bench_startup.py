@@ -0,0 +1,136 @@
+"""
+Startup-time regression check. No API key needed.
+
+    python bench_startup.py                                   # throwaway SQLite file
+    python bench_startup.py --database-url postgresql://...   # already migrated DB
+
+Measures, in fresh interpreters:
+  - import time of app.main, and whether the LangChain stack was imported with it
+  - time from launching uvicorn to the first 200 from /health/ready
+  - time to the first real request (GET /api/history) after that
+
+and exits non-zero if a median is over its budget.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+DB_FILE = "bench_startup.db"
+HEAVY_MODULES = ("langchain_google_genai", "langchain_core", "google.genai")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--ready-budget-ms", type=float, default=3000.0)
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status
+
+
+def time_import(env):
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_first_requests(env, deadline=60.0):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if time.perf_counter() - start > deadline or server.poll() is not None:
+                raise RuntimeError("server did not become ready")
+            try:
+                if get(f"http://127.0.0.1:{port}/health/ready") == 200:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.01)
+        ready = time.perf_counter() - start
+        get(f"http://127.0.0.1:{port}/api/history", timeout=10.0)
+        return ready, time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ, DB_AUTO_MIGRATE="false", JOB_WORKERS="0", PREFETCH_ENABLED="false")
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        if os.path.exists(DB_FILE):
+            os.remove(DB_FILE)
+        env["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True, capture_output=True)
+
+    imports, heavy = [], set()
+    for _ in range(args.runs):
+        result = time_import(env)
+        imports.append(result["seconds"] * 1000)
+        heavy.update(result["heavy"])
+    readies, firsts = [], []
+    for _ in range(args.runs):
+        ready, first = time_first_requests(env)
+        readies.append(ready * 1000)
+        firsts.append(first * 1000)
+
+    if not args.database_url:
+        os.remove(DB_FILE)
+
+    import_ms, ready_ms = statistics.median(imports), statistics.median(readies)
+    print(f"import app.main:        median {import_ms:7.0f} ms  (min {min(imports):.0f}, max {max(imports):.0f})")
+    print(f"launch to /health/ready: median {ready_ms:7.0f} ms  (min {min(readies):.0f}, max {max(readies):.0f})")
+    print(f"launch to first request: median {statistics.median(firsts):7.0f} ms")
+    print(f"heavy modules imported with the app: {', '.join(sorted(heavy)) or 'none'}")
+
+    failed = False
+    if import_ms > args.import_budget_ms:
+        print(f"FAIL: import time over the {args.import_budget_ms:.0f} ms budget")
+        failed = True
+    if ready_ms > args.ready_budget_ms:
+        print(f"FAIL: time to ready over the {args.ready_budget_ms:.0f} ms budget")
+        failed = True
+    if heavy:
+        print("FAIL: the LangChain stack should only be imported on first use")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK: startup within budget")
+
+
+if __name__ == "__main__":
+    main()
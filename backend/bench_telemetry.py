@@ -0,0 +1,58 @@
+"""
+Per-call cost of a pipeline span, with metrics on, with request tracing on,
+and with METRICS_ENABLED=false. A generation makes about a dozen spans, so
+multiply by ~12 to get the per-quiz overhead. No database or API key needed.
+
+    python bench_telemetry.py --calls 200000
+"""
+import argparse
+import time
+
+from app.services import telemetry
+
+
+def per_call_ns(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with telemetry.span("fetch"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def baseline_ns(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    empty = baseline_ns(args.calls)
+    results = {}
+
+    telemetry.METRICS_ENABLED = True
+    results["metrics on"] = per_call_ns(args.calls)
+
+    telemetry.TRACE_LOG = True
+    token = telemetry.start_trace()
+    results["metrics + trace"] = per_call_ns(args.calls)
+    telemetry._trace.reset(token)
+    telemetry.TRACE_LOG = False
+
+    telemetry.METRICS_ENABLED = False
+    results["disabled"] = per_call_ns(args.calls)
+
+    print(f"{'mode':<18} {'ns/span':>10}")
+    for name, ns in results.items():
+        print(f"{name:<18} {ns - empty:>10.0f}")
+    render_start = time.perf_counter()
+    telemetry.render()
+    print(f"render() of the collected series: {(time.perf_counter() - render_start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BATCH_SIZE = 500
+
+# Writes a quiz_embeddings row for every stored quiz that has none, so older
+# quizzes take part in near-duplicate reuse and related-topic matching. Use
+# --rebuild after changing EMBEDDING_DIM or the vectorizer, then restart the
+# API so workers reload the vectors.
+
+def log(msg):
+    print(msg)
+
+def build_embedding_index(rebuild: bool):
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    from app.database import engine, SessionLocal
+    from app.models import Quiz, QuizEmbedding
+    from app.services.embeddings import quiz_embedding
+    from app.services.quiz_format import quiz_questions
+
+    QuizEmbedding.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        if rebuild:
+            deleted = db.query(QuizEmbedding).delete()
+            db.commit()
+            log(f"Deleted {deleted} existing vectors.")
+
+        last_id = 0
+        written = 0
+        while True:
+            quizzes = (
+                db.query(Quiz)
+                .outerjoin(QuizEmbedding, QuizEmbedding.quiz_id == Quiz.id)
+                .filter(QuizEmbedding.quiz_id.is_(None), Quiz.id > last_id)
+                .order_by(Quiz.id)
+                .limit(BATCH_SIZE)
+                .all()
+            )
+            if not quizzes:
+                break
+            for q in quizzes:
+                embedding = quiz_embedding(q.title or "", q.summary or "", quiz_questions(q))
+                embedding.quiz_id = q.id
+                db.add(embedding)
+            db.commit()
+            last_id = quizzes[-1].id
+            db.expunge_all()
+            written += len(quizzes)
+            log(f"Embedded {written} quizzes so far (up to id {last_id})...")
+        log(f"SUCCESS: {written} quizzes embedded.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every quiz, not only those without a vector")
+    args = parser.parse_args()
+    build_embedding_index(args.rebuild)
@@ -0,0 +1,48 @@
+import os
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BATCH_SIZE = 500
+
+# Creates the full-text search index (PostgreSQL tsvector + GIN, or SQLite FTS5)
+# and indexes every stored quiz. Quizzes stored from now on are indexed as they
+# are created; re-running this is safe and simply rewrites the rows.
+
+def log(msg):
+    print(msg)
+
+def build_search_index():
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    from app.database import engine, SessionLocal
+    from app.models import Quiz
+    from app.services.search import create_search_index, index_documents, quiz_document
+
+    log(f"Creating search index on {engine.dialect.name}...")
+    create_search_index(engine)
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        indexed = 0
+        while True:
+            quizzes = db.query(Quiz).filter(Quiz.id > last_id).order_by(Quiz.id).limit(BATCH_SIZE).all()
+            if not quizzes:
+                break
+            index_documents(db, [quiz_document(q) for q in quizzes])
+            db.commit()
+            last_id = quizzes[-1].id
+            db.expunge_all()
+            indexed += len(quizzes)
+            log(f"Indexed {indexed} quizzes so far (up to id {last_id})...")
+        log(f"SUCCESS: {indexed} quizzes indexed.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    build_search_index()
@@ -0,0 +1,92 @@
+"""
+Check the MediaWiki API fetch backend against a local stand-in server
+(no network): extract parsing, redirects, revision-based revalidation and
+the HTML fallback.
+
+    python check_wiki_api.py
+"""
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+EXTRACT = """Python is a programming language.
+It emphasizes readability.
+
+== History ==
+Python was conceived in the late 1980s.
+
+=== Early years ===
+Version 0.9 was released in 1991.
+
+== References =="""
+
+requests_seen = []
+
+
+class StandInWiki(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        requests_seen.append(params.get("prop", parts.path))
+
+        if parts.path.endswith("/w/api.php"):
+            page = {"title": "Python (programming language)", "revisions": [{"revid": 42}]}
+            if "extracts" in params.get("prop", ""):
+                page["extract"] = EXTRACT
+            body = {"query": {
+                "redirects": [{"from": "Python", "to": "Python (programming language)"}],
+                "pages": [page],
+            }}
+            self.reply(200, json.dumps(body).encode(), "application/json")
+        else:
+            self.reply(500, b"html path should not be used", "text/plain")
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def check(label, condition):
+    print(f"{'PASS' if condition else 'FAIL'}: {label}")
+    return condition
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInWiki)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["WIKI_API_URL"] = f"http://127.0.0.1:{server.server_address[1]}/{{lang}}/w/api.php"
+    os.environ["SCRAPER_BACKEND"] = "api"
+    os.environ["SCRAPE_CACHE_PERSIST"] = "false"
+    os.environ["SCRAPE_CACHE_TTL"] = "0" # every lookup is stale, to exercise revalidation
+    os.environ.setdefault("DATABASE_URL", "sqlite:///check_wiki_api.db")
+
+    from app.services.scraper import scrape_wikipedia
+
+    ok = True
+    article = scrape_wikipedia("https://en.wikipedia.org/wiki/Python")
+    ok &= check("canonical title from redirect", article["title"] == "Python (programming language)")
+    ok &= check("summary is the first lead paragraph", article["summary"] == "Python is a programming language.")
+    ok &= check("h2/h3 headings become sections", article["sections"] == ["History", "Early years", "References"])
+    ok &= check("section texts are grouped", [s["heading"] for s in article["section_texts"]] == ["", "History", "Early years"])
+    ok &= check("one extract request", requests_seen == ["extracts|revisions"])
+
+    scrape_wikipedia("https://en.m.wikipedia.org/wiki/Python#History")
+    ok &= check("stale entry revalidated by revision id only", requests_seen[1:] == ["revisions"])
+
+    server.shutdown()
+    if os.path.exists("check_wiki_api.db"):
+        os.remove("check_wiki_api.db")
+    print("ALL PASSED" if ok else "SOME CHECKS FAILED")
+
+
+if __name__ == "__main__":
+    main()
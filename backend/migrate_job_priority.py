@@ -0,0 +1,46 @@
+import os
+from sqlalchemy import create_engine, inspect, text
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Adds generation_jobs.priority and generation_jobs.served_at (used by the
+# prefetcher), generation_jobs.heartbeat_at (the running job lease) plus the
+# index workers claim jobs by. create_all() doesn't add columns to existing
+# tables, so databases created earlier need this once. Existing jobs get the
+# user priority; jobs still 'running' have no lease and are requeued by the
+# next worker that starts.
+
+def log(msg):
+    print(msg)
+
+def migrate_job_priority():
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    engine = create_engine(DATABASE_URL)
+    columns = {c["name"] for c in inspect(engine).get_columns("generation_jobs")}
+    timestamp = "TIMESTAMP WITH TIME ZONE" if engine.dialect.name == "postgresql" else "DATETIME"
+    with engine.begin() as connection:
+        if "priority" not in columns:
+            log("Adding 'priority' column...")
+            connection.execute(text("ALTER TABLE generation_jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 100"))
+        if "served_at" not in columns:
+            log("Adding 'served_at' column...")
+            connection.execute(text(f"ALTER TABLE generation_jobs ADD COLUMN served_at {timestamp}"))
+        if "heartbeat_at" not in columns:
+            log("Adding 'heartbeat_at' column...")
+            connection.execute(text(f"ALTER TABLE generation_jobs ADD COLUMN heartbeat_at {timestamp}"))
+        log("Creating index ix_generation_jobs_status_priority_id...")
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_generation_jobs_status_priority_id "
+            "ON generation_jobs (status, priority, id)"
+        ))
+    log("SUCCESS: generation_jobs is up to date.")
+
+if __name__ == "__main__":
+    migrate_job_priority()
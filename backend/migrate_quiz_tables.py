@@ -0,0 +1,90 @@
+import os
+from sqlalchemy import create_engine, select, insert, exists
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BATCH_SIZE = 500
+
+# One-shot move of quiz questions and related topics out of the quizzes.quiz_data /
+# quizzes.related_topics JSON columns into the questions and related_topics tables,
+# converting the legacy flat question format on the way. Safe to re-run: quizzes
+# that already have rows in either table are skipped. The JSON columns are left in place.
+# Legacy answers were stored as the model wrote them ("Option B", "B) Paris");
+# they are mapped to the option letter, or stored as NULL when that isn't possible.
+
+def log(msg):
+    with open("migration_log.txt", "a") as f:
+        f.write(msg + "\n")
+    print(msg)
+
+def migrate_quiz_tables():
+    if not DATABASE_URL:
+        log("ERROR: DATABASE_URL is missing.")
+        return
+
+    from app.models import Quiz, Question, RelatedTopic
+    from app.services.quiz_format import fix_quiz_format, question_rows
+    from app.services.repair import normalize_answer
+
+    engine = create_engine(DATABASE_URL)
+    log("Creating questions and related_topics tables (if missing)...")
+    Question.__table__.create(engine, checkfirst=True)
+    RelatedTopic.__table__.create(engine, checkfirst=True)
+
+    converted = exists().where(Question.quiz_id == Quiz.id) | exists().where(RelatedTopic.quiz_id == Quiz.id)
+    last_id = 0
+    quizzes = questions = topics = unmapped = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(Quiz.id, Quiz.quiz_data, Quiz.related_topics)
+                .where(Quiz.id > last_id, ~converted)
+                .order_by(Quiz.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+
+            question_values = []
+            topic_values = []
+            for quiz_id, quiz_data, related_topics in rows:
+                for row in question_rows(fix_quiz_format(quiz_data)):
+                    options = {"A": row.option_a or "", "B": row.option_b or "", "C": row.option_c or "", "D": row.option_d or ""}
+                    answer = normalize_answer(row.answer, options) or None
+                    if answer is None and row.answer:
+                        unmapped += 1
+                        log(f"Quiz {quiz_id} question {row.position}: answer {row.answer!r} is not an option, stored as NULL")
+                    question_values.append({
+                        "quiz_id": quiz_id,
+                        "position": row.position,
+                        "question": row.question or "",
+                        "option_a": row.option_a,
+                        "option_b": row.option_b,
+                        "option_c": row.option_c,
+                        "option_d": row.option_d,
+                        "answer": answer,
+                        "difficulty": row.difficulty,
+                        "explanation": row.explanation,
+                    })
+                for position, topic in enumerate(related_topics or []):
+                    topic_values.append({"quiz_id": quiz_id, "position": position, "topic": topic})
+
+            if question_values:
+                connection.execute(insert(Question), question_values)
+            if topic_values:
+                connection.execute(insert(RelatedTopic), topic_values)
+
+        last_id = rows[-1][0]
+        quizzes += len(rows)
+        questions += len(question_values)
+        topics += len(topic_values)
+        log(f"Converted {quizzes} quizzes so far (up to id {last_id})...")
+
+    log(f"SUCCESS: {quizzes} quizzes converted, {questions} questions and {topics} related topics inserted"
+        f" ({unmapped} answers could not be mapped to an option).")
+
+if __name__ == "__main__":
+    migrate_quiz_tables()
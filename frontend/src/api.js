@@ -5,7 +5,8 @@ const api = axios.create({
 });
 
 export const generateQuiz = (url) => api.post('/generate-quiz', { url });
-export const getHistory = () => api.get('/history');
+export const getHistory = (cursor) => api.get('/history', { params: { cursor } });
 export const getQuiz = (id) => api.get(`/quiz/${id}`);
+export const searchQuizzes = (q, offset) => api.get('/search', { params: { q, offset } });
 
 export default api;
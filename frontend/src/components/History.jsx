@@ -1,21 +1,27 @@
 import React, { useEffect, useState } from 'react';
-import { getHistory } from '../api';
+import { getHistory, getQuiz, searchQuizzes } from '../api';
 import QuizView from './QuizView';
-import { Loader2, ArrowRight, ExternalLink, Calendar } from 'lucide-react';
+import { Loader2, ArrowRight, ExternalLink, Calendar, Search } from 'lucide-react';
 
 export default function History() {
     const [quizzes, setQuizzes] = useState([]);
     const [loading, setLoading] = useState(true);
     const [selectedQuiz, setSelectedQuiz] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [query, setQuery] = useState('');
+    const [searchTerm, setSearchTerm] = useState('');
+    const [nextOffset, setNextOffset] = useState(null);
 
     useEffect(() => {
         fetchHistory();
     }, []);
 
-    const fetchHistory = async () => {
+    const fetchHistory = async (cursor) => {
         try {
-            const res = await getHistory();
-            setQuizzes(res.data);
+            const res = await getHistory(cursor);
+            setQuizzes((prev) => cursor ? [...prev, ...res.data.items] : res.data.items);
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             console.error("Failed to load history", err);
         } finally {
@@ -23,6 +29,74 @@ export default function History() {
         }
     };
 
+    // Searching is done server-side, ranked and paginated by offset
+    const fetchSearch = async (term, offset) => {
+        try {
+            const res = await searchQuizzes(term, offset);
+            setQuizzes((prev) => offset ? [...prev, ...res.data.items] : res.data.items);
+            setNextOffset(res.data.next_offset);
+        } catch (err) {
+            console.error("Search failed", err);
+        } finally {
+            setLoading(false);
+        }
+    };
+
+    const submitSearch = async (e) => {
+        e.preventDefault();
+        const term = query.trim();
+        setSearchTerm(term);
+        setLoading(true);
+        if (term) {
+            await fetchSearch(term);
+        } else {
+            await fetchHistory();
+        }
+    };
+
+    const loadMore = async () => {
+        setLoadingMore(true);
+        if (searchTerm) {
+            await fetchSearch(searchTerm, nextOffset);
+        } else {
+            await fetchHistory(nextCursor);
+        }
+        setLoadingMore(false);
+    };
+
+    const hasMore = searchTerm ? nextOffset !== null : !!nextCursor;
+
+    const searchForm = (
+        <form onSubmit={submitSearch} className="flex items-center gap-2 mb-6">
+            <div className="relative flex-1">
+                <Search className="w-4 h-4 text-gray-400 absolute left-3 top-1/2 -translate-y-1/2" />
+                <input
+                    type="text"
+                    value={query}
+                    onChange={(e) => setQuery(e.target.value)}
+                    placeholder="Search past quizzes..."
+                    className="w-full pl-9 pr-4 py-2 border border-gray-200 rounded-lg text-sm focus:outline-none focus:border-blue-500"
+                />
+            </div>
+            <button
+                type="submit"
+                className="px-4 py-2 bg-white border border-gray-200 rounded-lg text-sm font-medium text-gray-700 hover:border-blue-500 hover:text-blue-600 shadow-sm transition-all"
+            >
+                Search
+            </button>
+        </form>
+    );
+
+    // History only lists summaries; fetch the full quiz when one is opened
+    const openQuiz = async (id) => {
+        try {
+            const res = await getQuiz(id);
+            setSelectedQuiz(res.data);
+        } catch (err) {
+            console.error("Failed to load quiz", err);
+        }
+    };
+
     if (selectedQuiz) {
         return (
             <div>
@@ -47,14 +121,18 @@ export default function History() {
 
     if (quizzes.length === 0) {
         return (
-            <div className="text-center py-20 text-gray-500">
-                <p>No past quizzes found. Generate one!</p>
+            <div>
+                {searchTerm && searchForm}
+                <div className="text-center py-20 text-gray-500">
+                    <p>{searchTerm ? `No quizzes match "${searchTerm}".` : "No past quizzes found. Generate one!"}</p>
+                </div>
             </div>
         );
     }
 
     return (
         <div className="overflow-hidden">
+            {searchForm}
             <table className="w-full text-left border-collapse">
                 <thead>
                     <tr className="border-b border-gray-100 text-sm font-semibold text-gray-500 uppercase tracking-wider">
@@ -86,7 +164,7 @@ export default function History() {
                             </td>
                             <td className="py-4 px-4 text-right">
                                 <button
-                                    onClick={() => setSelectedQuiz(quiz)}
+                                    onClick={() => openQuiz(quiz.id)}
                                     className="inline-flex items-center gap-2 px-4 py-2 bg-white border border-gray-200 rounded-lg text-sm font-medium text-gray-700 hover:bg-white hover:border-blue-500 hover:text-blue-600 shadow-sm transition-all"
                                 >
                                     View Quiz
@@ -97,6 +175,18 @@ export default function History() {
                     ))}
                 </tbody>
             </table>
+            {hasMore && (
+                <div className="flex justify-center py-6">
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="inline-flex items-center gap-2 px-4 py-2 bg-white border border-gray-200 rounded-lg text-sm font-medium text-gray-700 hover:border-blue-500 hover:text-blue-600 shadow-sm transition-all disabled:opacity-50"
+                    >
+                        {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+                        Load more
+                    </button>
+                </div>
+            )}
         </div>
     );
 }